@@ -0,0 +1,270 @@
+"""
+Memory benchmark: bytes per email held by Email objects and by a loaded JSON store.
+
+    python -m backend.benchmarks.email_memory [COUNT]
+
+`baseline` is the earlier Email layout (plain dataclass: per-instance __dict__,
+fresh lists, eagerly parsed timestamp, un-interned strings), rebuilt here so that
+before and after are measured on the same synthetic mailbox. `lazy bodies` is the
+compact layout in a store that keeps bodies in its mmapped body file (the default);
+the other rows load the store with bodies resident.
+
+The first table is steady-state heap (tracemalloc), which leaves out mapped file
+pages. The second is resident set size of a fresh process per layout, restarting
+on a saved inbox (snapshot, body file, search index): right after startup, and
+after updating 1% of the emails and compacting, each with its peak. RSS includes
+mapped body and search index pages that were touched.
+"""
+from __future__ import annotations
+
+import gc
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List
+
+from backend.models.email import Email
+from backend.services import inbox_store
+
+CATEGORIES = ["", "important", "newsletter", "spam", "to-do", "meeting", "follow-up", "Other"]
+SOURCES = ["", "llm", "llm-batch", "rule:newsletter-sender", "model"]
+
+
+@dataclass
+class BaselineEmail:
+    """The pre-compaction Email layout, for comparison only."""
+
+    id: str
+    sender: str
+    subject: str
+    timestamp: datetime
+    body: str
+    category: str = "Other"
+    category_source: str = ""
+    action_items: List[str] = field(default_factory=list)
+    drafts: List[str] = field(default_factory=list)
+    summary: str = ""
+
+    body_ref = None  # bodies are always resident
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BaselineEmail":
+        try:
+            ts = datetime.fromisoformat(data.get("timestamp", "").replace("Z", "+00:00"))
+        except Exception:
+            ts = datetime.utcnow()
+        return cls(
+            id=data["id"],
+            sender=data.get("sender") or data.get("from") or "unknown",
+            subject=data.get("subject", "(no subject)"),
+            timestamp=ts,
+            body=data.get("body", ""),
+            category=data.get("category", "Other"),
+            category_source=data.get("category_source", ""),
+            action_items=data.get("action_items", []) or [],
+            drafts=data.get("drafts", []) or [],
+            summary=data.get("summary", ""),
+        )
+
+    @property
+    def timestamp_key(self) -> str:
+        ts = self.timestamp
+        if ts.tzinfo is not None:
+            ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+        return ts.isoformat()
+
+    def copy(self) -> "BaselineEmail":
+        return replace(self)
+
+    def to_dict(self, include_body: bool = True) -> dict:
+        data = {**self.__dict__, "timestamp": self.timestamp.isoformat()}
+        if not include_body:
+            del data["body"]
+        return data
+
+
+def synthetic_mailbox(count: int, seed: int = 0) -> List[dict]:
+    """A mailbox shaped like real ones: few senders and categories, mostly empty lists."""
+    rng = random.Random(seed)
+    senders = [
+        f"Sender {i} <user{i}@domain{i % 200}.com>" if i % 2 else f"user{i}@domain{i % 200}.com"
+        for i in range(2000)
+    ]
+    words = ["meeting", "invoice", "update", "project", "review", "budget", "launch", "team", "report", "deadline"]
+    start = datetime(2024, 1, 1)
+    emails = []
+    for i in range(count):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(30, 250)))
+        emails.append({
+            "id": f"E{i:07d}",
+            "sender": rng.choice(senders),
+            "subject": f"{rng.choice(words).title()} {rng.choice(words)} #{i}",
+            "timestamp": (start + timedelta(minutes=7 * i)).isoformat(),
+            "body": text,
+            "category": rng.choice(CATEGORIES),
+            "category_source": rng.choice(SOURCES),
+            "action_items": [f"Reply about {rng.choice(words)}"] if rng.random() < 0.2 else [],
+            "drafts": [f"Thanks, will do. ({i})"] if rng.random() < 0.1 else [],
+            "summary": f"About {rng.choice(words)}." if rng.random() < 0.2 else "",
+        })
+    return emails
+
+
+def traced_bytes(build: Callable[[], object]) -> int:
+    """Memory still allocated by what `build` returns (temporaries are freed first)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        kept = build()
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del kept
+    return size
+
+
+# name -> (Email class, lazy_bodies)
+LAYOUTS = {"baseline": (BaselineEmail, False), "compact": (Email, False), "lazy bodies": (Email, True)}
+
+
+@contextmanager
+def email_layout(email_class: type) -> Iterator[None]:
+    """The store builds its emails with the module's `Email`; swap in the layout under test."""
+    original = inbox_store.Email
+    inbox_store.Email = email_class
+    try:
+        yield
+    finally:
+        inbox_store.Email = original
+
+
+def measure(email_class: type, text: str, snapshot: Path, lazy_bodies: bool) -> Dict[str, int]:
+    objects = traced_bytes(lambda: [email_class.from_dict(raw) for raw in json.loads(text)])
+    with email_layout(email_class):
+        store = traced_bytes(lambda: inbox_store.JsonInboxStore(snapshot, lazy_bodies=lazy_bodies))
+    return {"objects": objects, "store": store}
+
+
+def rss_bytes() -> int:
+    """Current resident set size (Linux; 0 where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return 0
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size since the last `reset_peak_rss` (Linux: VmHWM)."""
+    try:
+        with open("/proc/self/status") as handle:
+            for line in handle:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def reset_peak_rss() -> None:
+    try:
+        with open("/proc/self/clear_refs", "w") as handle:
+            handle.write("5")  # resets VmHWM to the current RSS
+    except OSError:
+        pass
+
+
+def probe_rss(layout: str, directory: Path) -> Dict[str, int]:
+    """
+    Run in a fresh process (see `main`): RSS above the interpreter's own after opening
+    the saved inbox in `directory`, and after updating 1% of it and compacting.
+    """
+    email_class, lazy_bodies = LAYOUTS[layout]
+    gc.collect()
+    base = rss_bytes()
+    reset_peak_rss()
+    with email_layout(email_class):
+        store = inbox_store.JsonInboxStore(
+            directory / "inbox.json", lazy_bodies=lazy_bodies, compact_every=sys.maxsize
+        )
+        gc.collect()
+        result = {"startup": rss_bytes() - base, "startup peak": peak_rss_bytes() - base}
+        emails = store.list_all()
+        store.update({email.id: {"category": "reviewed"} for email in emails[::100]})
+        del emails
+        reset_peak_rss()
+        store.compact()
+        gc.collect()
+        result.update({"compacted": rss_bytes() - base, "compaction peak": peak_rss_bytes() - base})
+    return result
+
+
+def measure_rss(layout: str, saved: Path) -> Dict[str, int]:
+    """`probe_rss` in a child process, on a copy of the saved inbox."""
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp) / "data"
+        shutil.copytree(saved, directory)
+        output = subprocess.run(
+            [sys.executable, "-m", __spec__.name, "--rss", layout, str(directory)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main(count: int) -> None:
+    emails = synthetic_mailbox(count)
+    text = json.dumps(emails)
+    # Strings every layout must keep (one copy each): the floor for bytes per email.
+    payload = sum(
+        sys.getsizeof(raw[name]) for raw in emails for name in ("id", "subject", "body", "summary")
+    )
+    results = {}
+    rss = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        inbox = json.dumps({"revision": 0, "emails": emails})
+        for name, (email_class, lazy_bodies) in LAYOUTS.items():
+            directory = Path(tmp) / name
+            directory.mkdir()
+            snapshot = directory / "inbox.json"
+            snapshot.write_text(inbox, encoding="utf-8")
+            results[name] = measure(email_class, text, snapshot, lazy_bodies)
+        # Every process restarts on the same saved inbox: what a lazy store writes.
+        saved = Path(tmp) / "lazy bodies"
+        inbox_store.JsonInboxStore(saved / "inbox.json").close()
+        for name in LAYOUTS:
+            rss[name] = measure_rss(name, saved)
+
+    print(f"{count} emails; unique text (id, subject, body, summary): {payload / count:.0f} B/email")
+    print(f"{'layout':<12} {'Email objects':>16} {'JSON store':>16}")
+    for name, result in results.items():
+        print(f"{name:<12} {result['objects'] / count:>12.0f} B/e {result['store'] / count:>12.0f} B/e")
+    before, compact, lazy = results["baseline"], results["compact"], results["lazy bodies"]
+    print(
+        f"{'saved':<12} {(before['objects'] - compact['objects']) / count:>12.0f} B/e "
+        f"{(before['store'] - lazy['store']) / count:>12.0f} B/e"
+    )
+    if not any(rss["baseline"].values()):
+        print("RSS: not available on this platform (needs Linux /proc).")
+        return
+    columns = ("startup", "startup peak", "compacted", "compaction peak")
+    print()
+    print(f"{'RSS':<12}" + "".join(f" {column:>16}" for column in columns))
+    for name, result in rss.items():
+        print(f"{name:<12}" + "".join(f" {result[column] / count:>12.0f} B/e" for column in columns))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--rss"]:
+        print(json.dumps(probe_rss(sys.argv[2], Path(sys.argv[3]))))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
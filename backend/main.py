@@ -1,43 +1,80 @@
 """FastAPI entrypoint for the Prompt-Driven Email Productivity Agent."""
 from __future__ import annotations
 
+import os
 from pathlib import Path
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 
 from backend.routes import agent as agent_routes
 from backend.routes import drafts as drafts_routes
+from backend.routes import imports as import_routes
 from backend.routes import inbox as inbox_routes
+from backend.routes import metrics as metrics_routes
 from backend.routes import prompts as prompts_routes
 from backend.services.action_item_service import ActionItemService
 from backend.services.agent_service import AgentService
 from backend.services.auto_reply_service import AutoReplyService
 from backend.services.categorization_service import CategorizationService
+from backend.services.category_rules import CategoryRuleEngine
 from backend.services.inbox_service import InboxService
+from backend.services.inbox_store import create_inbox_store
+from backend.services.llm import LLMError
+from backend.services.local_classifier import LocalCategoryClassifier
 from backend.services.prompt_brain import PromptBrain
+from backend.services.triage_service import TriageService
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 app = FastAPI(title="Email Productivity Agent", version="0.1.0")
 
-prompt_brain = PromptBrain(BASE_DIR / "prompts.json")
-inbox_service = InboxService(BASE_DIR / "data" / "inbox.json")
-categorization_service = CategorizationService(inbox_service, prompt_brain)
+prompt_brain = PromptBrain(BASE_DIR / "prompts.json", shared=os.getenv("SHARED_STATE", "0") == "1")
+inbox_service = InboxService(create_inbox_store(BASE_DIR / "data"))
+category_rules = CategoryRuleEngine.from_file(
+    BASE_DIR / "category_rules.json",
+    CategorizationService.VALID_CATEGORIES,
+    min_confidence=float(os.getenv("CATEGORY_RULES_MIN_CONFIDENCE", "0.9")),
+)
+local_classifier = LocalCategoryClassifier(
+    BASE_DIR / "data" / "category_model.json",
+    threshold=float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.85")),
+)
+categorization_service = CategorizationService(
+    inbox_service, prompt_brain, category_rules, local_classifier
+)
 action_service = ActionItemService(inbox_service, prompt_brain)
 auto_reply_service = AutoReplyService(inbox_service, prompt_brain)
 agent_service = AgentService(inbox_service, prompt_brain)
+triage_service = TriageService(inbox_service, prompt_brain, categorization_service)
 
 app.state.prompt_brain = prompt_brain
 app.state.inbox_service = inbox_service
+app.state.category_rules = category_rules
 app.state.categorization_service = categorization_service
 app.state.action_service = action_service
 app.state.auto_reply_service = auto_reply_service
 app.state.agent_service = agent_service
+app.state.triage_service = triage_service
 
 app.include_router(inbox_routes.router)
 app.include_router(prompts_routes.router)
 app.include_router(agent_routes.router)
 app.include_router(drafts_routes.router)
+app.include_router(import_routes.router)
+app.include_router(metrics_routes.router)
+
+
+@app.exception_handler(LLMError)
+async def llm_error_handler(request: Request, exc: LLMError) -> JSONResponse:
+    """Report exhausted LLM retries as 503 so nothing half-baked gets saved."""
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+
+@app.on_event("shutdown")
+def close_inbox() -> None:
+    """Fold the inbox journal into inbox.json (or close the database) on clean shutdown."""
+    inbox_service.close()
 
 
 @app.get("/api/health")
@@ -1,23 +1,178 @@
 """Domain models for email records used by the productivity agent."""
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from datetime import datetime
-from typing import List, Any, Dict
+import re
+import sys
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence, Tuple, Union
+
+if TYPE_CHECKING:
+    from backend.services.body_store import BodyRef
+
+# Shared by every email without action items / drafts (most of them).
+EMPTY: Tuple[str, ...] = ()
+
+# Timestamps exactly as `to_dict` writes them (naive, or UTC with "Z"): the part before
+# the "Z" is already the naive-UTC `isoformat()`, so they sort and serialize unparsed.
+_CANONICAL_TIMESTAMP = re.compile(
+    r"(\d{4}-(?:0[1-9]|1[0-2])-(?:0[1-9]|[12]\d|3[01])"
+    r"T(?:[01]\d|2[0-3]):[0-5]\d:[0-5]\d(?:\.(?!0{6})\d{6})?)Z?"
+)
+
+
+def _interned(value: str) -> str:
+    """One shared copy of a frequently repeated string (sender, category, ...)."""
+    return sys.intern(value) if type(value) is str else value
+
+
+def _compact(items: Sequence[str]) -> Tuple[str, ...]:
+    """Tuple of the items; empty sequences become the shared EMPTY."""
+    return tuple(items) if items else EMPTY
+
+
+def _parse_timestamp(raw: str) -> datetime:
+    """Safe timestamp parsing: ISO 8601 (with "Z" accepted), else now."""
+    try:
+        return datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    except Exception:
+        return datetime.utcnow()
 
 
-@dataclass
 class Email:
-    """Represents an email stored in the mock inbox."""
+    """
+    Represents an email stored in the mock inbox.
+    Stores keep one per email, so the layout is compact:
+    - `__slots__` instead of a per-instance `__dict__`
+    - Sender, category and category source are interned (few distinct values, many emails)
+    - Action items and drafts are tuples; empty ones share EMPTY
+    - `timestamp` keeps the raw string until first read, then the parsed datetime;
+      `timestamp_key` and `to_dict` use raw strings in `to_dict` form as they are
+    - `body` may be a BodyRef into a store's body file, loaded each time it is read
+    Assigning `category`, `action_items`, ... applies the same normalization.
+    """
+
+    __slots__ = (
+        "id", "sender", "subject", "summary",
+        "_body", "_timestamp", "_category", "_category_source", "_action_items", "_drafts",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        sender: str,
+        subject: str,
+        timestamp: Union[datetime, str],
+        body: Union[str, "BodyRef"],
+        category: str = "Other",
+        category_source: str = "",  # which path decided the category: "llm", "llm-batch", "llm-triage", "llm-fallback", "rule:<name>", "model"
+        action_items: Sequence[str] = EMPTY,
+        drafts: Sequence[str] = EMPTY,
+        summary: str = "",
+    ) -> None:
+        self.id = id
+        self.sender = _interned(sender)
+        self.subject = subject
+        self.summary = summary
+        self._body = body
+        self._timestamp = timestamp
+        self._category = _interned(category)
+        self._category_source = _interned(category_source)
+        self._action_items = _compact(action_items)
+        self._drafts = _compact(drafts)
+
+    # ---------------------------------------------------------
+    # NORMALIZED FIELDS
+    # ---------------------------------------------------------
+    @property
+    def timestamp(self) -> datetime:
+        value = self._timestamp
+        if type(value) is str:
+            value = self._timestamp = _parse_timestamp(value)
+        return value
+
+    @timestamp.setter
+    def timestamp(self, value: Union[datetime, str]) -> None:
+        self._timestamp = value
+
+    @property
+    def timestamp_key(self) -> str:
+        """
+        Naive-UTC ISO string of `timestamp`, which sorts like the datetimes (aware and
+        naive alike). Stores order emails by it, so loading one parses no timestamps.
+        """
+        value = self._timestamp
+        if type(value) is str:
+            match = _CANONICAL_TIMESTAMP.fullmatch(value)
+            if match:
+                return match.group(1)
+            value = self.timestamp
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.isoformat()
+
+    @property
+    def body(self) -> str:
+        value = self._body
+        return value if type(value) is str else value.load()
 
-    id: str
-    sender: str
-    subject: str
-    timestamp: datetime
-    body: str
-    category: str = "Other"
-    action_items: List[str] = field(default_factory=list)
-    drafts: List[str] = field(default_factory=list)
+    @body.setter
+    def body(self, value: Union[str, "BodyRef"]) -> None:
+        self._body = value
+
+    @property
+    def body_ref(self) -> Optional["BodyRef"]:
+        """Where the body is kept when it is not in memory, else None."""
+        value = self._body
+        return None if type(value) is str else value
+
+    @property
+    def category(self) -> str:
+        return self._category
+
+    @category.setter
+    def category(self, value: str) -> None:
+        self._category = _interned(value)
+
+    @property
+    def category_source(self) -> str:
+        return self._category_source
+
+    @category_source.setter
+    def category_source(self, value: str) -> None:
+        self._category_source = _interned(value)
+
+    @property
+    def action_items(self) -> Tuple[str, ...]:
+        return self._action_items
+
+    @action_items.setter
+    def action_items(self, value: Sequence[str]) -> None:
+        self._action_items = _compact(value)
+
+    @property
+    def drafts(self) -> Tuple[str, ...]:
+        return self._drafts
+
+    @drafts.setter
+    def drafts(self, value: Sequence[str]) -> None:
+        self._drafts = _compact(value)
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    __hash__ = None  # mutable, like the dataclass it replaced
+
+    def copy(self) -> "Email":
+        """A copy sharing every field value (they are strings, tuples, datetimes or a BodyRef)."""
+        clone = self.__class__.__new__(self.__class__)
+        for name in self.__slots__:
+            setattr(clone, name, getattr(self, name))
+        return clone
+
+    def __repr__(self) -> str:
+        return f"Email(id={self.id!r}, sender={self.sender!r}, subject={self.subject!r}, category={self.category!r})"
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "Email":
@@ -28,33 +183,47 @@ class Email:
         if not sender:
             sender = "unknown"
 
-        # FIX 2: Safe timestamp parsing
+        # FIX 2: Safe timestamp parsing (deferred to the first read of `timestamp`)
         raw_ts = data.get("timestamp", "")
-        try:
-            ts = datetime.fromisoformat(raw_ts.replace("Z", "+00:00"))
-        except Exception:
-            ts = datetime.utcnow()
+        if not isinstance(raw_ts, str):
+            raw_ts = ""
 
         return cls(
             id=data["id"],
             sender=sender,
             subject=data.get("subject", "(no subject)"),
-            timestamp=ts,
+            timestamp=raw_ts,
             body=data.get("body", ""),
             category=data.get("category", "Other"),
+            category_source=data.get("category_source", ""),
             action_items=data.get("action_items", []) or [],
             drafts=data.get("drafts", []) or [],
+            summary=data.get("summary", ""),
         )
 
-    def to_dict(self) -> dict:
-        """Serialize the Email model back into a JSON-compatible dictionary."""
-        return {
+    def to_dict(self, include_body: bool = True) -> dict:
+        """
+        Serialize the Email model back into a JSON-compatible dictionary.
+        Without `include_body` the body is left out (and not read from a body file).
+        """
+        data = {
             "id": self.id,
             "sender": self.sender,
             "subject": self.subject,
-            "timestamp": self.timestamp.isoformat().replace("+00:00", "Z"),
-            "body": self.body,
+            "timestamp": self._timestamp_text(),
+            "body": self.body if include_body else None,
             "category": self.category,
-            "action_items": self.action_items,
-            "drafts": self.drafts,
+            "category_source": self.category_source,
+            "action_items": list(self.action_items),
+            "drafts": list(self.drafts),
+            "summary": self.summary,
         }
+        if not include_body:
+            del data["body"]
+        return data
+
+    def _timestamp_text(self) -> str:
+        value = self._timestamp
+        if type(value) is str and _CANONICAL_TIMESTAMP.fullmatch(value):
+            return value  # what the parsed datetime would serialize to
+        return self.timestamp.isoformat().replace("+00:00", "Z")
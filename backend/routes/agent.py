@@ -2,12 +2,15 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional # Import Optional
+from typing import List, Optional # Import Optional
 
+from backend.routes.streaming import sse_response
 from backend.services.action_item_service import ActionItemService
 from backend.services.agent_service import AgentService
 from backend.services.categorization_service import CategorizationService
+from backend.services.triage_service import TriageService
 
 router = APIRouter(prefix="/api", tags=["agent"])
 
@@ -24,10 +27,18 @@ def get_agent_service(request: Request) -> AgentService:
     return request.app.state.agent_service
 
 
+def get_triage_service(request: Request) -> TriageService:
+    return request.app.state.triage_service
+
+
 class EmailRequest(BaseModel):
     email_id: str
 
 
+class BatchCategorizeRequest(BaseModel):
+    email_ids: Optional[List[str]] = None  # None categorizes the whole inbox
+
+
 # CRITICAL FIX: Update schema to accept optional email_id
 class AgentQueryRequest(BaseModel):
     query_type: str
@@ -40,20 +51,58 @@ async def categorize_email(
     service: CategorizationService = Depends(get_categorization_service),
 ) -> dict:
     """Categorize the selected email."""
-    category = service.categorize_email(payload.email_id)
+    category = await service.categorize_email_async(payload.email_id)
     return {"email_id": payload.email_id, "category": category}
 
 
+@router.post("/categorize_batch")
+async def categorize_batch(
+    payload: BatchCategorizeRequest,
+    service: CategorizationService = Depends(get_categorization_service),
+) -> dict:
+    """Categorize many emails with as few LLM calls as the token budget allows."""
+    categories = await service.categorize_batch_async(payload.email_ids)
+    return {"categories": categories}
+
+
+@router.get("/classifier")
+def classifier_report(
+    service: CategorizationService = Depends(get_categorization_service),
+) -> dict:
+    """Report accuracy/coverage of the local categorizer on held-out LLM labels."""
+    return service.classifier_report()
+
+
+@router.post("/classifier/retrain", status_code=202)
+def retrain_classifier(
+    service: CategorizationService = Depends(get_categorization_service),
+) -> dict:
+    """
+    Start retraining the local categorizer from categories the LLM already assigned.
+    Runs in the background; poll GET /api/classifier until `training` is false.
+    """
+    return service.start_classifier_retrain()
+
+
 @router.post("/extract_actions")
 async def extract_actions(
     payload: EmailRequest,
     service: ActionItemService = Depends(get_action_service),
 ) -> dict:
     """Extract and persist action items."""
-    actions = service.extract(payload.email_id)
+    actions = await service.extract_async(payload.email_id)
     return {"email_id": payload.email_id, "action_items": actions}
 
 
+@router.post("/triage")
+async def triage_email(
+    payload: EmailRequest,
+    service: TriageService = Depends(get_triage_service),
+) -> dict:
+    """Categorize, extract actions and summarize an email in a single LLM call."""
+    return await service.triage_async(payload.email_id)
+
+
 @router.post("/agent_query")
 async def agent_query(
     payload: AgentQueryRequest,
@@ -61,5 +110,15 @@ async def agent_query(
 ) -> dict:
     """Run a higher-level inbox query."""
     # CRITICAL FIX: Pass the email_id to the service layer
-    response = service.run_query(payload.query_type, payload.email_id) 
-    return {"query_type": payload.query_type, "response": response}
\ No newline at end of file
+    response = await service.run_query_async(payload.query_type, payload.email_id)
+    return {"query_type": payload.query_type, "response": response}
+
+
+@router.post("/agent_query/stream")
+def agent_query_stream(
+    payload: AgentQueryRequest,
+    service: AgentService = Depends(get_agent_service),
+) -> StreamingResponse:
+    """Stream the agent's answer as Server-Sent Events."""
+    chunks = service.stream_query(payload.query_type, payload.email_id)
+    return sse_response(chunks, "response", {"query_type": payload.query_type})
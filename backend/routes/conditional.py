@@ -0,0 +1,33 @@
+"""ETag / If-None-Match helpers shared by the polled listing routes."""
+from __future__ import annotations
+
+from typing import Optional
+
+from fastapi import Request, Response
+
+# Clients may keep a response but must revalidate it (cheaply, via If-None-Match) before reuse.
+CACHE_CONTROL = "no-cache"
+
+
+def make_etag(resource: str, revision: int) -> str:
+    """Strong ETag for a resource at a revision (revisions only ever increase)."""
+    return f'"{resource}-{revision}"'
+
+
+def etag_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """
+    A 304 response if the client's If-None-Match already names `etag`, else None.
+    - Weak comparison, as RFC 9110 specifies for If-None-Match (W/"x" matches "x")
+    - Call it before building the body: a match must cost almost nothing
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    tags = [tag.strip() for tag in header.split(",")]
+    if "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags):
+        return Response(status_code=304, headers=etag_headers(etag))
+    return None
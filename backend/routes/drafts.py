@@ -1,7 +1,9 @@
 from __future__ import annotations
 from typing import Optional
 from fastapi import APIRouter, Depends, Request , HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from backend.routes.streaming import sse_response
 from backend.services.auto_reply_service import AutoReplyService
 
 router = APIRouter(prefix="/api", tags=["drafts"])
@@ -29,7 +31,7 @@ async def generate_reply(
     service: AutoReplyService = Depends(get_auto_reply_service),
 ) -> dict:
     """Generate a draft reply for the selected email."""
-    draft = service.generate_reply(payload.email_id, payload.persona)
+    draft = await service.generate_reply_async(payload.email_id, payload.persona)
     return {"email_id": payload.email_id, "draft": draft}
 
 
@@ -39,16 +41,36 @@ async def draft_email(
     service: AutoReplyService = Depends(get_auto_reply_service),
 ) -> dict:
     """Create a draft based on custom instructions."""
-    draft = service.create_custom_draft(payload.email_id, payload.instructions)
+    draft = await service.create_custom_draft_async(payload.email_id, payload.instructions)
     return {"email_id": payload.email_id, "draft": draft}
 
+
+@router.post("/generate_reply/stream")
+def generate_reply_stream(
+    payload: ReplyRequest,
+    service: AutoReplyService = Depends(get_auto_reply_service),
+) -> StreamingResponse:
+    """Stream a draft reply as Server-Sent Events; the draft is saved when complete."""
+    chunks = service.stream_reply(payload.email_id, payload.persona)
+    return sse_response(chunks, "draft", {"email_id": payload.email_id})
+
+
+@router.post("/draft_email/stream")
+def draft_email_stream(
+    payload: CustomDraftRequest,
+    service: AutoReplyService = Depends(get_auto_reply_service),
+) -> StreamingResponse:
+    """Stream a custom draft as Server-Sent Events; the draft is saved when complete."""
+    chunks = service.stream_custom_draft(payload.email_id, payload.instructions)
+    return sse_response(chunks, "draft", {"email_id": payload.email_id})
+
 class DeleteDraftRequest(BaseModel):
     email_id: str
     draft_index: int  # The index of the draft to delete (e.g., 0 for Draft 1)
 
 # Add the new DELETE route
 @router.delete("/drafts")
-async def delete_draft_route(
+def delete_draft_route(
     payload: DeleteDraftRequest,
     service: AutoReplyService = Depends(get_auto_reply_service),
 ) -> dict:
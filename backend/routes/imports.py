@@ -0,0 +1,124 @@
+"""Streaming mailbox import route."""
+from __future__ import annotations
+
+from typing import Callable, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+from backend.routes.inbox import get_inbox_service
+from backend.services.inbox_import import DEFAULT_BATCH_SIZE, IMPORT_FORMATS, InboxImporter
+from backend.services.inbox_service import InboxService
+
+router = APIRouter(prefix="/api", tags=["import"])
+
+# Raw-body uploads: Content-Type -> import format.
+CONTENT_TYPE_FORMATS = {
+    b"application/json": "json",
+    b"application/jsonl": "jsonl",
+    b"application/x-ndjson": "jsonl",
+    b"application/mbox": "mbox",
+}
+
+# multipart/form-data field that carries the file.
+FILE_FIELD = "file"
+
+
+class _MultipartFile:
+    """
+    Feeds the `file` field of a multipart/form-data body to an importer as it streams by,
+    using python-multipart's push parser (nothing is spooled to memory or disk).
+    """
+
+    def __init__(self, boundary: bytes, start: Callable[[str], InboxImporter]) -> None:
+        self._start = start
+        self.importer: Optional[InboxImporter] = None
+        self._headers: List[List[bytes]] = []
+        self._in_file = False
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def write(self, chunk: bytes) -> None:
+        self._parser.write(chunk)
+
+    def _on_part_begin(self) -> None:
+        self._headers = []
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        # Called again for each new header (after a value), or with more of the same name.
+        if not self._headers or self._headers[-1][1]:
+            self._headers.append([b"", b""])
+        self._headers[-1][0] += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._headers[-1][1] += data[start:end]
+
+    def _on_headers_finished(self) -> None:
+        headers = {name.strip().lower(): value.strip() for name, value in self._headers}
+        _, options = parse_options_header(headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        self._in_file = name == FILE_FIELD and self.importer is None
+        if self._in_file:
+            self.importer = self._start(options.get(b"filename", b"").decode("utf-8", "replace"))
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            self.importer.feed(data[start:end])
+
+    def _on_part_end(self) -> None:
+        self._in_file = False
+
+
+@router.post("/import")
+async def import_mailbox(
+    request: Request,
+    fmt: Optional[str] = Query(None, alias="format"),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=10000),
+    inbox: InboxService = Depends(get_inbox_service),
+) -> dict:
+    """
+    Stream a mailbox export (JSON array, JSON Lines or mbox) into the inbox, batch by batch.
+    - Send it as the `file` field of a multipart/form-data upload, or as the raw request body
+    - The format is `format=`, else the upload's file name or Content-Type, else sniffed
+    - Emails whose id already exists are replaced
+    Returns counts and the first rejected records; 400 if the input cannot be parsed
+    any further (batches written before that stay imported).
+    """
+    if fmt is not None and fmt not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(IMPORT_FORMATS)}")
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    importers: List[InboxImporter] = []
+
+    def start(filename: str = "") -> InboxImporter:
+        importers.append(InboxImporter(inbox, fmt or CONTENT_TYPE_FORMATS.get(content_type), filename, batch_size))
+        return importers[-1]
+
+    if content_type == b"multipart/form-data":
+        if not options.get(b"boundary"):
+            raise HTTPException(status_code=400, detail="multipart/form-data upload without a boundary.")
+        upload = _MultipartFile(options[b"boundary"], start)
+        write = upload.write
+    else:
+        write = start().feed
+
+    try:
+        # Parsing and store writes block, so they run off the event loop, one chunk at a time.
+        async for chunk in request.stream():
+            await run_in_threadpool(write, chunk)
+        if not importers:
+            raise HTTPException(status_code=400, detail=f"No '{FILE_FIELD}' field in the upload.")
+        result = await run_in_threadpool(importers[0].finish)
+    except ValueError as e:
+        imported = importers[0].result.imported if importers else 0
+        raise HTTPException(status_code=400, detail=f"{e} ({imported} emails were imported before this.)")
+    finally:
+        for importer in importers:
+            await run_in_threadpool(importer.close)
+    return {**result.to_dict(), "format": importers[0].format, "revision": inbox.revision}
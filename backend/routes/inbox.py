@@ -1,32 +1,219 @@
 """Inbox-related API routes."""
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, Request
+from typing import Callable, Dict, List, Optional, Sequence
 
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response
+
+from backend.models.email import Email
+from backend.routes.conditional import etag_headers, make_etag, not_modified
 from backend.services.inbox_service import InboxService
 
 router = APIRouter(prefix="/api", tags=["inbox"])
 
+# Characters of body kept in the summary view's `preview`.
+PREVIEW_CHARS = 160
+
+# Every field a client can ask for with `fields=`; only requested ones are computed.
+FIELD_GETTERS: Dict[str, Callable[[Email], object]] = {
+    "id": lambda email: email.id,
+    "sender": lambda email: email.sender,
+    "subject": lambda email: email.subject,
+    "timestamp": lambda email: email.timestamp.isoformat(),
+    "body": lambda email: email.body,
+    "preview": lambda email: _preview(email.body),
+    "category": lambda email: email.category,
+    "category_source": lambda email: email.category_source,
+    "action_items": lambda email: email.action_items,
+    "drafts": lambda email: email.drafts,
+    "draft_count": lambda email: len(email.drafts),
+    "summary": lambda email: email.summary,
+}
+
+FULL_FIELDS = (
+    "id", "sender", "subject", "timestamp", "body", "category",
+    "category_source", "action_items", "drafts", "summary",
+)
+SUMMARY_FIELDS = ("id", "sender", "subject", "timestamp", "category", "category_source", "preview", "draft_count")
+
 
 def get_inbox_service(request: Request) -> InboxService:
     """Resolve the inbox service from application state."""
     return request.app.state.inbox_service
 
 
+def _preview(body: str) -> str:
+    """First PREVIEW_CHARS of the body on one line."""
+    text = " ".join(body[:PREVIEW_CHARS * 2].split())
+    return text if len(text) <= PREVIEW_CHARS else text[:PREVIEW_CHARS - 1].rstrip() + "…"
+
+
+def resolve_fields(fields: Optional[str], view: str) -> Sequence[str]:
+    """Pick the projected fields from `fields=a,b` or `view=full|summary` (400 on unknown names)."""
+    if fields:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in names if name not in FIELD_GETTERS]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(FIELD_GETTERS)}",
+            )
+        return list(dict.fromkeys(["id", *names]))
+    if view == "summary":
+        return SUMMARY_FIELDS
+    if view == "full":
+        return FULL_FIELDS
+    raise HTTPException(status_code=400, detail="view must be 'full' or 'summary'.")
+
+
+def project(emails: List[Email], names: Sequence[str]) -> List[dict]:
+    """Serialize only the requested fields of each email."""
+    getters = [(name, FIELD_GETTERS[name]) for name in names]
+    return [{name: getter(email) for name, getter in getters} for email in emails]
+
+
 @router.get("/load_inbox")
-async def load_inbox(inbox: InboxService = Depends(get_inbox_service)) -> list[dict]:
-    """Return the current inbox snapshot."""
-    emails = inbox.list_emails()
-    return [
-        {
-            "id": email.id,
-            "sender": email.sender,
-            "subject": email.subject,
-            "timestamp": email.timestamp.isoformat(),
-            "body": email.body,
-            "category": email.category,
-            "action_items": email.action_items,
-            "drafts": email.drafts,
-        }
-        for email in emails
-    ]
+def load_inbox(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    view: str = "full",
+    inbox: InboxService = Depends(get_inbox_service),
+) -> Response:
+    """
+    Return the inbox, newest first.
+    - `view=summary` sends list-view fields with a short body `preview`; `fields=a,b` picks exact fields
+    - With `limit`, return one page; `before` / `after` take the cursors sent back in the
+      X-Next-Cursor (older emails) and X-Prev-Cursor (newer emails) headers
+    - Sends an ETag of the inbox revision; If-None-Match with it gets an empty 304
+    """
+    names = resolve_fields(fields, view)
+    etag = make_etag("inbox", inbox.revision)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    headers: Dict[str, str] = etag_headers(etag)
+    if limit is None:
+        if before or after:
+            raise HTTPException(status_code=400, detail="'before' / 'after' require 'limit'.")
+        emails = inbox.list_emails()
+    else:
+        try:
+            emails, next_cursor, prev_cursor = inbox.list_page(limit, before=before, after=after)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        if prev_cursor:
+            headers["X-Prev-Cursor"] = prev_cursor
+    return JSONResponse(project(emails, names), headers=headers)
+
+
+@router.get("/emails")
+def filter_emails(
+    request: Request,
+    category: List[str] = Query([]),
+    sender: List[str] = Query([]),
+    domain: List[str] = Query([]),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    before: Optional[str] = None,
+    fields: Optional[str] = None,
+    view: str = "full",
+    inbox: InboxService = Depends(get_inbox_service),
+) -> Response:
+    """
+    Return emails matching every filter, newest first (case-insensitive).
+    - Repeat a filter to match any of its values: `?category=important&category=to-do`
+    - `sender` is a full address, `domain` the part after "@"
+    - `limit` / `before` page through the matches like /load_inbox (X-Next-Cursor header)
+    - ETag / If-None-Match as for /load_inbox
+    """
+    names = resolve_fields(fields, view)
+    if before and limit is None:
+        raise HTTPException(status_code=400, detail="'before' requires 'limit'.")
+    etag = make_etag("inbox", inbox.revision)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    try:
+        emails, next_cursor = inbox.filter_emails(category, sender, domain, limit=limit, before=before)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = etag_headers(etag)
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return JSONResponse(project(emails, names), headers=headers)
+
+
+@router.get("/search")
+def search(
+    request: Request,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=200),
+    fields: Optional[str] = None,
+    view: str = "summary",
+    inbox: InboxService = Depends(get_inbox_service),
+) -> Response:
+    """
+    Full-text search over subject, sender and body, best match first (no LLM call).
+    - `budget` word, `bud*` prefix, `"quarterly budget"` phrase; every term must match
+    - Each result carries its BM25 `score`; `view` / `fields` project it like /load_inbox
+    - ETag / If-None-Match as for /load_inbox
+    """
+    names = resolve_fields(fields, view)
+    etag = make_etag("inbox", inbox.revision)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    results = inbox.search(q, limit)
+    rows = project([email for email, _ in results], names)
+    for row, (_, score) in zip(rows, results):
+        row["score"] = round(score, 4)
+    return JSONResponse(rows, headers=etag_headers(etag))
+
+
+@router.get("/inbox/changes")
+def inbox_changes(
+    since: Optional[int] = Query(None, ge=0),
+    limit: int = Query(1000, ge=1, le=10000),
+    fields: Optional[str] = None,
+    view: str = "full",
+    inbox: InboxService = Depends(get_inbox_service),
+) -> JSONResponse:
+    """
+    Incremental sync: what changed since the client's copy at revision `since`.
+    - Returns `revision` (send it as the next `since`) and the `upserts`
+    - `resync: true` means `upserts` is the whole inbox, newest first, to replace the copy with;
+      sent without `since`, when the store cannot diff from it, or past `limit` changes
+    - `view` / `fields` project the upserted emails like /load_inbox
+    """
+    names = resolve_fields(fields, view)
+    revision, resync, upserts = inbox.changes(since, limit)
+    return JSONResponse({
+        "revision": revision,
+        "resync": resync,
+        "upserts": project(upserts, names),
+    })
+
+
+@router.get("/emails/{email_id}")
+def get_email(
+    request: Request,
+    email_id: str,
+    fields: Optional[str] = None,
+    inbox: InboxService = Depends(get_inbox_service),
+) -> Response:
+    """Return one email (all fields unless `fields=` narrows them); ETag as for /load_inbox."""
+    names = resolve_fields(fields, "full")
+    etag = make_etag("inbox", inbox.revision)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    try:
+        email = inbox.get_email(email_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Email {email_id} not found")
+    return JSONResponse(project([email], names)[0], headers=etag_headers(etag))
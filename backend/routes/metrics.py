@@ -0,0 +1,27 @@
+"""Prometheus metrics endpoint for LLM usage."""
+from __future__ import annotations
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from backend.services.llm import get_cache_stats, get_limiter_stats, get_metrics
+from backend.services.llm_metrics import render_stats
+
+router = APIRouter(prefix="/api", tags=["metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Stats that only ever grow (until a restart), exported as `_total` counters; the rest are gauges.
+CACHE_COUNTERS = ("hits", "disk_hits", "misses", "evictions")
+LIMITER_COUNTERS = ("calls", "retries", "throttled", "failures", "queue_wait_seconds_total")
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    """Per-intent latency/token/error metrics plus cache and rate limiter state."""
+    body = (
+        get_metrics().render_prometheus()
+        + render_stats("llm_response_cache", get_cache_stats(), "LLM response cache stats.", CACHE_COUNTERS)
+        + render_stats("llm_rate_limiter", get_limiter_stats(), "LLM rate limiter stats.", LIMITER_COUNTERS)
+    )
+    return PlainTextResponse(body, media_type=PROMETHEUS_CONTENT_TYPE)
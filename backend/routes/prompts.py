@@ -1,9 +1,11 @@
 """Prompt management routes."""
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
+from backend.routes.conditional import etag_headers, make_etag, not_modified
 from backend.services.prompt_brain import PromptBrain
 
 router = APIRouter(prefix="/api", tags=["prompts"])
@@ -24,13 +26,17 @@ class PromptPayload(BaseModel):
 
 
 @router.get("/prompts")
-async def list_prompts(prompt_brain: PromptBrain = Depends(get_prompt_brain)) -> list[dict]:
-    """Return all prompts so the UI can display/edit them."""
-    return [prompt.to_dict() for prompt in prompt_brain.list_prompts()]
+def list_prompts(request: Request, prompt_brain: PromptBrain = Depends(get_prompt_brain)) -> Response:
+    """Return all prompts so the UI can display/edit them (ETag / If-None-Match as for /load_inbox)."""
+    etag = make_etag("prompts", prompt_brain.revision)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    return JSONResponse([prompt.to_dict() for prompt in prompt_brain.list_prompts()], headers=etag_headers(etag))
 
 
 @router.put("/prompts/{prompt_id}")
-async def upsert_prompt(
+def upsert_prompt(
     prompt_id: str,
     payload: PromptPayload,
     prompt_brain: PromptBrain = Depends(get_prompt_brain),
@@ -38,17 +44,23 @@ async def upsert_prompt(
     """Update an existing prompt template (Handles both Create and Edit)."""
     if prompt_id != payload.id:
         raise HTTPException(status_code=400, detail="Prompt id mismatch")
-    prompt = prompt_brain.upsert_prompt(payload.dict())
+    try:
+        prompt = prompt_brain.upsert_prompt(payload.dict())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return prompt.to_dict()
 
 
 @router.delete("/prompts/{prompt_id}")
-async def delete_prompt_route(
+def delete_prompt_route(
     prompt_id: str,
     prompt_brain: PromptBrain = Depends(get_prompt_brain),
 ) -> dict:
-    """Delete a prompt by its ID."""
-    success = prompt_brain.delete_prompt(prompt_id) 
+    """Delete a prompt by its ID (400 for the built-in prompts)."""
+    try:
+        success = prompt_brain.delete_prompt(prompt_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     if not success:
         raise HTTPException(status_code=404, detail=f"Prompt ID '{prompt_id}' not found")
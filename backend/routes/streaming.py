@@ -0,0 +1,41 @@
+"""Server-Sent Events helpers shared by the streaming routes."""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterator
+
+from fastapi.responses import StreamingResponse
+
+from backend.services.llm import LLMError
+
+
+def _format_event(data: Dict[str, Any], event: str | None = None) -> str:
+    """Encode one SSE frame; JSON keeps multi-line text on a single data line."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+def sse_response(chunks: Iterator[str], result_key: str, extra: Dict[str, Any]) -> StreamingResponse:
+    """
+    Wrap a text chunk iterator as an SSE response:
+    - one `data: {"delta": ...}` frame per chunk
+    - a final `event: done` frame carrying the full text under `result_key`
+    - or an `event: error` frame if the LLM fails mid-stream
+    """
+
+    def events() -> Iterator[str]:
+        parts = []
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                yield _format_event({"delta": chunk})
+        except LLMError as e:
+            yield _format_event({**extra, "detail": str(e)}, event="error")
+            return
+        yield _format_event({**extra, result_key: "".join(parts).strip()}, event="done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
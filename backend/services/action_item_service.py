@@ -2,11 +2,37 @@
 from __future__ import annotations
 
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 
+from starlette.concurrency import run_in_threadpool
+
+from backend.models.email import Email
 from backend.services.inbox_service import InboxService
 from backend.services.prompt_brain import PromptBrain
-from backend.services.llm import generate_llm_output
+from backend.services.prompt_template import CompiledTemplate
+from backend.services.llm import agenerate_llm_output, generate_llm_output
+from backend.services.single_flight import SingleFlight
+
+
+def format_action_items(parsed: List[Dict[str, Any]]) -> List[str]:
+    """
+    Convert structured {task, deadline} objects into human-friendly action strings.
+    Models often send null (or numbers) for either field; items that are not objects or have no task are skipped.
+    """
+    items_for_ui: List[str] = []
+    for obj in parsed:
+        if not isinstance(obj, dict):
+            continue
+        task = str(obj.get("task") or "").strip()
+        deadline = str(obj.get("deadline") or "").strip()
+        if not task:
+            continue
+
+        if deadline:
+            items_for_ui.append(f"{task} (deadline: {deadline})")
+        else:
+            items_for_ui.append(task)
+    return items_for_ui
 
 
 class ActionItemService:
@@ -15,43 +41,68 @@ class ActionItemService:
     def __init__(self, inbox_service: InboxService, prompt_brain: PromptBrain) -> None:
         self._inbox = inbox_service
         self._prompts = prompt_brain
+        self._inflight = SingleFlight()
 
     def extract(self, email_id: str) -> List[str]:
         """
         Extracts structured action items using the LLM.
         Persists a simple list of human-readable action strings for UI display.
+        Concurrent calls for the same email share one LLM request.
         """
+        return self._inflight.do(self._flight_key(email_id), lambda: self._extract(email_id))
+
+    async def extract_async(self, email_id: str) -> List[str]:
+        """Same as `extract`, without blocking the event loop."""
+        return await self._inflight.do_async(
+            self._flight_key(email_id), lambda: self._extract_async(email_id)
+        )
+
+    def _prepare(self, email_id: str) -> Tuple[Email, CompiledTemplate, Dict[str, Any]]:
+        """The email, the stored "actions" template and its context."""
         email = self._inbox.get_email(email_id)
-        template = self._prompts.get_template("actions")
+        return email, self._prompts.get_compiled("actions"), self._build_context(email)
+
+    def _extract(self, email_id: str) -> List[str]:
+        email, template, context = self._prepare(email_id)
 
         # Call LLM with the correct intent
-        raw_json = generate_llm_output(
-            template,
-            {
-                "email_body": email.body,
-                "subject": email.subject,
-                "_intent": "actions",
-            },
-        )
+        raw_json = generate_llm_output(template, context)
+        return self._save(email, raw_json)
+
+    async def _extract_async(self, email_id: str) -> List[str]:
+        # Store reads/writes run in the threadpool, the LLM call on the LLM worker pool.
+        email, template, context = await run_in_threadpool(self._prepare, email_id)
+
+        raw_json = await agenerate_llm_output(template, context)
+        return await run_in_threadpool(self._save, email, raw_json)
+
+    def _flight_key(self, email_id: str) -> tuple:
+        """In-flight dedup key: (operation, email id, prompt version)."""
+        return ("actions", email_id, self._prompts.get_version("actions"))
+
+    @staticmethod
+    def _build_context(email: Email) -> Dict[str, Any]:
+        """Template variables for the actions prompt."""
+        return {
+            "email_body": email.body,
+            "subject": email.subject,
+            "_intent": "actions",
+        }
 
+    def _save(self, email: Email, raw_json: str) -> List[str]:
+        """Parse the LLM's JSON output and persist UI-friendly action strings."""
         # Attempt to parse JSON from the LLM output
         try:
             cleaned = raw_json.strip("` \n")  # remove markdown fences if present
             parsed: List[Dict[str, Any]] = json.loads(cleaned)
+            if not isinstance(parsed, list):
+                raise ValueError("expected a JSON array")
         except Exception:
             # Fallback: Store a descriptive error instead of raw text if JSON fails
             parsed = [{"task": "Extraction failed: LLM output was not valid JSON.", "deadline": ""}]
 
         # Convert structured JSON into human-friendly action strings
-        items_for_ui: List[str] = []
-        for obj in parsed:
-            task = obj.get("task", "").strip()
-            deadline = obj.get("deadline", "").strip()
-
-            if deadline:
-                items_for_ui.append(f"{task} (deadline: {deadline})")
-            else:
-                items_for_ui.append(task)
+        items_for_ui = format_action_items(parsed)
 
         # Persist to inbox.json
         self._inbox.save_actions(email.id, items_for_ui)
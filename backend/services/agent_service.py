@@ -1,16 +1,25 @@
 """Agent service that answers higher-level queries over the inbox."""
 from __future__ import annotations
 
-from typing import Dict, List, Any, Optional # Import Optional
+from typing import Dict, Iterator, List, Any, Optional, Tuple # Import Optional
+
+from starlette.concurrency import run_in_threadpool
 
 from backend.services.inbox_service import InboxService
 from backend.services.prompt_brain import PromptBrain
-from backend.services.llm import generate_llm_output
+from backend.services.llm import agenerate_llm_output, generate_llm_output, stream_llm_output
 
 
 class AgentService:
     """Gemini-powered inbox agent that provides summaries, insights, and task analysis."""
 
+    # Quick queries answered from a category slice of the inbox (via the inbox's
+    # category index) instead of every email: query_type -> (categories, description).
+    SCOPED_QUERIES: Dict[str, Tuple[Tuple[str, ...], str]] = {
+        "urgent": (("important", "to-do", "todo"), "the important and to-do emails in the inbox."),
+        "followups": (("follow-up",), "the follow-up emails in the inbox."),
+    }
+
     def __init__(self, inbox_service: InboxService, prompt_brain: PromptBrain) -> None:
         self._inbox = inbox_service
         self._prompts = prompt_brain
@@ -26,8 +35,28 @@ class AgentService:
         - The user's stored 'agent' prompt
         - The query string typed by the user
         """
-        template = self._prompts.get_template("agent")
+        template = self._prompts.get_compiled("agent")
+        return generate_llm_output(template, self._build_context(user_query, email_id))
+
+    async def run_query_async(self, user_query: str, email_id: Optional[str] = None) -> str:
+        """
+        Same as `run_query`, without blocking the event loop: the inbox is read and
+        serialized in the threadpool, the LLM call runs on the LLM worker pool.
+        """
+        template, context = await run_in_threadpool(self._prepare, user_query, email_id)
+        return await agenerate_llm_output(template, context)
 
+    def _prepare(self, user_query: str, email_id: Optional[str]) -> Tuple[Any, Dict[str, Any]]:
+        """The stored "agent" template and the context for this query."""
+        return self._prompts.get_compiled("agent"), self._build_context(user_query, email_id)
+
+    def stream_query(self, user_query: str, email_id: Optional[str] = None) -> Iterator[str]:
+        """Streams the agent's answer chunk by chunk."""
+        template = self._prompts.get_compiled("agent")
+        return stream_llm_output(template, self._build_context(user_query, email_id))
+
+    def _build_context(self, user_query: str, email_id: Optional[str]) -> Dict[str, Any]:
+        """Select the email scope and build the template variables for the agent prompt."""
         # --- CRITICAL CONTEXT SWITCHING LOGIC ---
         if email_id:
             # Case 1: Single Email Context (e.g., "Summarize this email")
@@ -36,27 +65,32 @@ class AgentService:
             context_description = "the currently selected email."
         else:
             # Case 2: Inbox-Wide Context (e.g., "Show me urgent emails")
-            emails_serialized = [
-                self._serialize(email)
-                for email in self._inbox.list_emails()
-            ]
-            context_description = "the entire inbox."
+            emails, context_description = self._scoped_emails(user_query)
+            emails_serialized = [self._serialize(email) for email in emails]
         
         # Format the serialized list for the LLM prompt
         email_context_str = "\n".join([f"- {e}" for e in emails_serialized])
 
-        # Call Gemini via the LLM wrapper
-        result = generate_llm_output(
-            template,
-            {
-                "query_type": user_query,   
-                "emails": email_context_str, # Pass the formatted string
-                "_intent": "agent",
-                "context_description": context_description, # Optional: helps LLM understand the scope
-            },
-        )
+        return {
+            "query_type": user_query,
+            "emails": email_context_str, # Pass the formatted string
+            "_intent": "agent",
+            "context_description": context_description, # Optional: helps LLM understand the scope
+        }
 
-        return result
+    def _scoped_emails(self, user_query: str) -> Tuple[List[Any], str]:
+        """
+        Emails an inbox-wide query should see:
+        - Scoped quick queries get their categories, if any email has one yet
+        - Everything else (and uncategorized inboxes) gets the entire inbox
+        """
+        scope = self.SCOPED_QUERIES.get(user_query)
+        if scope is not None:
+            categories, description = scope
+            emails, _ = self._inbox.filter_emails(categories=categories)
+            if emails:
+                return emails, description
+        return self._inbox.list_emails(), "the entire inbox."
 
     # ---------------------------------------------------------
     #   INTERNAL SERIALIZATION
@@ -70,6 +104,6 @@ class AgentService:
             "subject": email.subject,
             "body": email.body,
             "category": email.category,
-            "action_items": email.action_items,
+            "action_items": list(email.action_items),
             "timestamp": email.timestamp.isoformat(),
         }
\ No newline at end of file
@@ -1,9 +1,15 @@
 """Service for generating reply drafts."""
 from __future__ import annotations
 
+from typing import Callable, Iterator, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from backend.models.email import Email
 from backend.services.inbox_service import InboxService
 from backend.services.prompt_brain import PromptBrain
-from backend.services.llm import generate_llm_output
+from backend.services.prompt_template import CompiledTemplate
+from backend.services.llm import agenerate_llm_output, generate_llm_output, stream_llm_output
 
 
 class AutoReplyService:
@@ -24,24 +30,56 @@ class AutoReplyService:
         - The user's chosen persona (optional)
         """
         email = self._inbox.get_email(email_id)
-        template = self._prompts.get_template("draft")
+        template = self._prompts.get_compiled("draft")
 
         # Prepare context for the LLM
-        draft_text = generate_llm_output(
-            template,
-            {
-                "email_body": email.body,
-                "subject": email.subject,
-                "sender": email.sender,
-                "persona": persona or "Email Agent",
-                "_intent": "draft",
-            },
-        )
+        draft_text = generate_llm_output(template, self._reply_context(email, persona))
 
         # Save as a draft (never send automatically)
         self._inbox.append_draft(email.id, draft_text)
         return draft_text
 
+    async def generate_reply_async(self, email_id: str, persona: str | None = None) -> str:
+        """Same as `generate_reply`, without blocking the event loop."""
+        email, template, context = await run_in_threadpool(
+            self._prepare, email_id, lambda email: self._reply_context(email, persona)
+        )
+
+        draft_text = await agenerate_llm_output(template, context)
+
+        await run_in_threadpool(self._inbox.append_draft, email.id, draft_text)
+        return draft_text
+
+    def _prepare(self, email_id: str, build_context: Callable[[Email], dict]) -> Tuple[Email, CompiledTemplate, dict]:
+        """
+        The email, the stored "draft" template and the context `build_context` makes for it.
+        The async variants run this (store read + body load) in the threadpool.
+        """
+        email = self._inbox.get_email(email_id)
+        return email, self._prompts.get_compiled("draft"), build_context(email)
+
+    def stream_reply(self, email_id: str, persona: str | None = None) -> Iterator[str]:
+        """
+        Streams the reply draft chunk by chunk.
+        The completed text is saved as a draft once the stream finishes.
+        """
+        email = self._inbox.get_email(email_id)
+        template = self._prompts.get_compiled("draft")
+
+        chunks = stream_llm_output(template, self._reply_context(email, persona))
+        return self._save_when_done(email, chunks)
+
+    @staticmethod
+    def _reply_context(email: Email, persona: str | None) -> dict:
+        """Template variables for a standard auto-reply."""
+        return {
+            "email_body": email.body,
+            "subject": email.subject,
+            "sender": email.sender,
+            "persona": persona or "Email Agent",
+            "_intent": "draft",
+        }
+
     # ---------------------------------------------------------
     #   CUSTOM REPLY DRAFT (Ad-hoc instructions)
     # ---------------------------------------------------------
@@ -53,20 +91,50 @@ class AutoReplyService:
         "respond only with bullet points").
         """
         email = self._inbox.get_email(email_id)
-        template = self._prompts.get_template("draft")
-
-        draft_text = generate_llm_output(
-            template,
-            {
-                "subject": email.subject,
-                "email_body": email.body,
-                "instructions": instructions,
-                "_intent": "custom_draft",
-            },
-        )
+        template = self._prompts.get_compiled("draft")
+
+        draft_text = generate_llm_output(template, self._custom_context(email, instructions))
 
         self._inbox.append_draft(email.id, draft_text)
         return draft_text
+
+    async def create_custom_draft_async(self, email_id: str, instructions: str) -> str:
+        """Same as `create_custom_draft`, without blocking the event loop."""
+        email, template, context = await run_in_threadpool(
+            self._prepare, email_id, lambda email: self._custom_context(email, instructions)
+        )
+
+        draft_text = await agenerate_llm_output(template, context)
+
+        await run_in_threadpool(self._inbox.append_draft, email.id, draft_text)
+        return draft_text
+
+    def stream_custom_draft(self, email_id: str, instructions: str) -> Iterator[str]:
+        """Streaming variant of `create_custom_draft`."""
+        email = self._inbox.get_email(email_id)
+        template = self._prompts.get_compiled("draft")
+
+        chunks = stream_llm_output(template, self._custom_context(email, instructions))
+        return self._save_when_done(email, chunks)
+
+    @staticmethod
+    def _custom_context(email: Email, instructions: str) -> dict:
+        """Template variables for an instruction-driven draft."""
+        return {
+            "subject": email.subject,
+            "email_body": email.body,
+            "instructions": instructions,
+            "_intent": "custom_draft",
+        }
+
+    def _save_when_done(self, email: Email, chunks: Iterator[str]) -> Iterator[str]:
+        """Pass chunks through and append the joined text as a draft at the end."""
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        self._inbox.append_draft(email.id, "".join(parts).strip())
+
     # ---------------------------------------------------------
     #   DRAFT DELETION
     # ---------------------------------------------------------
@@ -75,10 +143,4 @@ class AutoReplyService:
         Deletes a specific draft from an email's draft list by index.
         Returns True if deletion was successful, False otherwise.
         """
-        email = self._inbox.get_email(email_id)
-        if 0 <= draft_index < len(email.drafts):
-            # Remove the draft at the specified index
-            del email.drafts[draft_index]
-            self._inbox.update_email(email)
-            return True
-        return False
\ No newline at end of file
+        return self._inbox.remove_draft(email_id, draft_index)
\ No newline at end of file
@@ -0,0 +1,91 @@
+"""Append-only body file: email bodies kept on disk and read back on demand through mmap."""
+from __future__ import annotations
+
+import mmap
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional
+
+
+def random_access(view: mmap.mmap) -> None:
+    """Turn off readahead for a map read at scattered offsets, so reads fault in only their own pages."""
+    if hasattr(mmap, "MADV_RANDOM"):  # Python 3.8+ on Linux / BSD
+        view.madvise(mmap.MADV_RANDOM)
+
+
+class BodyRef:
+    """Where one body lives in a BodyFile; `load()` reads it back."""
+
+    __slots__ = ("file", "offset", "length")
+
+    def __init__(self, file: "BodyFile", offset: int, length: int) -> None:
+        self.file = file
+        self.offset = offset
+        self.length = length
+
+    def load(self) -> str:
+        return self.file.read(self.offset, self.length)
+
+    def __repr__(self) -> str:
+        return f"BodyRef(offset={self.offset}, length={self.length})"
+
+
+class BodyFile:
+    """
+    Email bodies written end to end in one file, so only a BodyRef stays in memory:
+    - `append` writes a body's UTF-8 bytes at the end of the file (nothing is ever rewritten)
+    - `read` slices them out of a read-only mmap, remapping once the file has grown past it
+    Without a `path` the file is an anonymous temp file in `directory`, private to the
+    process and gone with the last reference to it. With one it is a named file that
+    outlives the process (the JSON store's `inbox.bodies.<n>`, which its snapshot and
+    journal reference by offset); several processes may append to it as long as they
+    take turns (the store's cross-process lock), since each append starts at the current end.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, path: Optional[Path] = None, read_only: bool = False) -> None:
+        self.path = path
+        if path is None:
+            self._file = tempfile.TemporaryFile(prefix="inbox-bodies-", dir=directory, buffering=0)
+        else:
+            self._file = path.open("rb" if read_only else "a+b", buffering=0)
+        self._map: Optional[mmap.mmap] = None
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        """Bytes in the file, live or not (including other processes' appends)."""
+        return os.fstat(self._file.fileno()).st_size
+
+    def append(self, text: str) -> BodyRef:
+        # surrogatepass: JSON input may carry lone surrogates; they must round-trip.
+        data = text.encode("utf-8", "surrogatepass")
+        with self._lock:
+            offset = self.size
+            view = memoryview(data)
+            while view:
+                view = view[self._file.write(view):]
+        return BodyRef(self, offset, len(data))
+
+    def ref(self, offset: int, length: int) -> BodyRef:
+        """A ref to bytes appended earlier (e.g. by a previous run), checked against the file size."""
+        if offset < 0 or length <= 0 or offset + length > self.size:
+            raise ValueError(f"Body ({offset}, {length}) is outside {self.path or 'the body file'}.")
+        return BodyRef(self, offset, length)
+
+    def read(self, offset: int, length: int) -> str:
+        end = offset + length
+        view = self._map
+        if view is None or len(view) < end:
+            with self._lock:
+                if self._map is None or len(self._map) < end:
+                    # Readers may still hold the old map; it is released when they drop it.
+                    self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                    random_access(self._map)
+                view = self._map
+        return view[offset:end].decode("utf-8", "surrogatepass")
+
+    def sync(self) -> None:
+        """fsync appended bodies, before a snapshot or journal record that references them."""
+        os.fsync(self._file.fileno())
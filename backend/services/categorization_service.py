@@ -1,9 +1,21 @@
 """Service to categorize emails using stored prompts."""
 from __future__ import annotations
 
+import asyncio
+import json
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from backend.services.category_rules import CategoryRuleEngine
 from backend.services.inbox_service import InboxService
+from backend.services.local_classifier import LocalCategoryClassifier
 from backend.services.prompt_brain import PromptBrain
-from backend.services.llm import generate_llm_output
+from backend.services.prompt_template import CompiledTemplate
+from backend.models.email import Email
+from backend.services.llm import agenerate_llm_output, generate_llm_output
+from backend.services.single_flight import SingleFlight
 
 
 class CategorizationService:
@@ -21,9 +33,31 @@ class CategorizationService:
         "other",
     }
 
-    def __init__(self, inbox_service: InboxService, prompt_brain: PromptBrain) -> None:
+    # Source of the "other" saved when the LLM names no valid category; it is not an
+    # LLM label, so the local classifier never trains on it.
+    FALLBACK_SOURCE = "llm-fallback"
+
+    # Batch mode: rough token budget per request (~4 chars/token) and a cap
+    # on how much of each body is sent.
+    BATCH_TOKEN_BUDGET = 6000
+    BATCH_BODY_CHARS = 1500
+
+    def __init__(
+        self,
+        inbox_service: InboxService,
+        prompt_brain: PromptBrain,
+        rules: Optional[CategoryRuleEngine] = None,
+        classifier: Optional[LocalCategoryClassifier] = None,
+    ) -> None:
         self._inbox = inbox_service
         self._prompts = prompt_brain
+        self._rules = rules
+        self._classifier = classifier
+        self._inflight = SingleFlight()
+        self._retrain_lock = threading.Lock()
+        self._retrain_thread: Optional[threading.Thread] = None
+        # Why the last background retrain trained nothing (too few labels, an error), if it did.
+        self._retrain_skipped: Optional[str] = None
 
     # ---------------------------------------------------------
     #   SINGLE EMAIL CATEGORIZATION
@@ -31,51 +65,289 @@ class CategorizationService:
     def categorize_email(self, email_id: str) -> str:
         """
         Categorizes one email using:
-        - The user's stored "categorize" prompt
-        - Gemini output via the LLM layer
+        - Confident rule matches first, then the local model (no LLM call)
+        - Otherwise the user's stored "categorize" prompt + Gemini
         - Safe normalization + fallback category
+        Concurrent calls for the same email share one LLM request.
+        """
+        decided = self._try_fast_paths(email_id)
+        if decided is not None:
+            return decided
+        return self._inflight.do(self._flight_key(email_id), lambda: self._categorize(email_id))
+
+    async def categorize_email_async(self, email_id: str) -> str:
+        """
+        Same as `categorize_email`, without blocking the event loop: store reads/writes
+        and the fast paths run in the threadpool, the LLM call on the LLM worker pool.
         """
+        decided = await run_in_threadpool(self._try_fast_paths, email_id)
+        if decided is not None:
+            return decided
+        return await self._inflight.do_async(
+            self._flight_key(email_id), lambda: self._categorize_async(email_id)
+        )
+
+    def _try_fast_paths(self, email_id: str) -> Optional[str]:
+        return self._apply_fast_paths(self._inbox.get_email(email_id))
+
+    def _prepare(self, email_id: str) -> Tuple[Email, CompiledTemplate, dict]:
+        """The email, the stored "categorize" template and its context."""
         email = self._inbox.get_email(email_id)
-        template = self._prompts.get_template("categorize")
+        return email, self._prompts.get_compiled("categorize"), self._build_context(email)
+
+    def _categorize(self, email_id: str) -> str:
+        email, template, context = self._prepare(email_id)
 
         # Ask LLM to categorize
-        raw_category = generate_llm_output(
-            template,
-            {
-                "email_body": email.body,
-                "subject": email.subject,
-                "_intent": "categorize",
-            },
-        )
+        raw_category = generate_llm_output(template, context)
+        return self._save(email, raw_category)
+
+    async def _categorize_async(self, email_id: str) -> str:
+        email, template, context = await run_in_threadpool(self._prepare, email_id)
 
-        cleaned_category = self._normalize_category(raw_category)
+        raw_category = await agenerate_llm_output(template, context)
+        return await run_in_threadpool(self._save, email, raw_category)
 
-        # Save to inbox.json
-        self._inbox.save_category(email.id, cleaned_category)
+    def _flight_key(self, email_id: str) -> tuple:
+        """In-flight dedup key: (operation, email id, prompt version)."""
+        return ("categorize", email_id, self._prompts.get_version("categorize"))
+
+    @staticmethod
+    def _build_context(email: Email) -> dict:
+        """Template variables for the categorize prompt."""
+        return {
+            "email_body": email.body,
+            "subject": email.subject,
+            "_intent": "categorize",
+        }
+
+    def _save(self, email: Email, raw_category: str) -> str:
+        """Normalize the LLM output and persist it to inbox.json."""
+        cleaned_category = self.match_category(raw_category)
+        if cleaned_category is None:
+            self._inbox.save_category(email.id, "other", source=self.FALLBACK_SOURCE)
+            return "other"
+        self._inbox.save_category(email.id, cleaned_category, source="llm")
         return cleaned_category
 
+    def _apply_fast_paths(self, email: Email) -> Optional[str]:
+        """Save and return the category if a rule or the local model decides it."""
+        decision = self._fast_decision(email)
+        if decision is None:
+            return None
+        category, source = decision
+        self._inbox.save_category(email.id, category, source=source)
+        return category
+
+    def _fast_decision(self, email: Email) -> Optional[Tuple[str, str]]:
+        """(category, source) from a confident rule or local prediction, else None."""
+        if self._rules is not None:
+            match = self._rules.classify(email)
+            if match is not None:
+                return match.category, f"rule:{match.rule}"
+
+        if self._classifier is not None:
+            prediction = self._classifier.predict(email)
+            if prediction is not None and prediction[1] >= self._classifier.threshold:
+                return prediction[0], "model"
+        return None
+
+    # ---------------------------------------------------------
+    #   LOCAL MODEL TRAINING
+    # ---------------------------------------------------------
+    def retrain_classifier(self) -> dict:
+        """Retrain the local categorizer on LLM-labeled emails and return its report."""
+        if self._classifier is None:
+            return {"trained": False, "reason": "Local classifier is disabled."}
+        return self._classifier.retrain(self._inbox.list_emails())
+
+    def start_classifier_retrain(self) -> dict:
+        """
+        Retrain in a background thread (training is CPU-bound and can take several
+        seconds) and return the current report; `classifier_report` shows the new one
+        once `training` is false. A retrain already running is not started twice.
+        """
+        if self._classifier is None:
+            return {"trained": False, "reason": "Local classifier is disabled."}
+        with self._retrain_lock:
+            if not self._is_retraining():
+                self._retrain_thread = threading.Thread(
+                    target=self._retrain_in_background, name="classifier-retrain", daemon=True
+                )
+                self._retrain_thread.start()
+        return self.classifier_report()
+
+    def _retrain_in_background(self) -> None:
+        try:
+            result = self.retrain_classifier()
+            self._retrain_skipped = None if result.get("trained") else str(result.get("reason", ""))
+        except Exception as e:
+            self._retrain_skipped = f"Retraining failed: {e}"
+            print(f"WARNING: Local classifier retraining failed. Error: {e}")
+
+    def _is_retraining(self) -> bool:
+        thread = self._retrain_thread
+        return thread is not None and thread.is_alive()
+
+    def classifier_report(self) -> dict:
+        """Accuracy/coverage report from the last local model training, plus whether one is running."""
+        if self._classifier is None:
+            return {"trained": False, "reason": "Local classifier is disabled."}
+        report = {**self._classifier.report(), "training": self._is_retraining()}
+        if self._retrain_skipped and not report["training"]:
+            report["last_retrain"] = self._retrain_skipped
+        return report
+
     # ---------------------------------------------------------
-    #   BULK CATEGORIZATION (OPTIONAL, helpful later)
+    #   BULK CATEGORIZATION
     # ---------------------------------------------------------
     def categorize_all(self) -> None:
         """Categorizes every email in the inbox."""
-        for email in self._inbox.list_emails():
-            self.categorize_email(email.id)
+        self.categorize_batch()
+
+    def categorize_batch(
+        self,
+        email_ids: Optional[Iterable[str]] = None,
+        token_budget: Optional[int] = None,
+    ) -> Dict[str, str]:
+        """
+        Categorizes many emails with one LLM call per token-budgeted batch:
+        - Rules / the local model decide first (one inbox write for all of them)
+        - The rest go through the user's stored "categorize_batch" prompt
+        - Each batch returns a JSON map of id -> category
+        - Results are normalized and saved with one inbox write per batch
+        - Ids missing from the response fall back to per-email calls
+        """
+        results, batches = self._plan(email_ids, token_budget)
+        template = self._prompts.get_compiled("categorize_batch")
+        for batch in batches:
+            raw = generate_llm_output(template, self._build_batch_context(batch))
+            results.update(self._save_batch(batch, raw))
+
+            for email in batch:
+                if email.id not in results:
+                    results[email.id] = self.categorize_email(email.id)
+        return results
+
+    async def categorize_batch_async(
+        self,
+        email_ids: Optional[Iterable[str]] = None,
+        token_budget: Optional[int] = None,
+    ) -> Dict[str, str]:
+        """
+        Same as `categorize_batch`, without blocking the event loop: lookups, fast paths,
+        prompt building and saves run in the threadpool, LLM calls on the LLM worker pool.
+        """
+        results, batches = await run_in_threadpool(self._plan, email_ids, token_budget)
+        template = await run_in_threadpool(self._prompts.get_compiled, "categorize_batch")
+        for batch in batches:
+            context = await run_in_threadpool(self._build_batch_context, batch)
+            raw = await agenerate_llm_output(template, context)
+            results.update(await run_in_threadpool(self._save_batch, batch, raw))
+
+            missing = [email.id for email in batch if email.id not in results]
+            fallbacks = await asyncio.gather(*(self.categorize_email_async(i) for i in missing))
+            results.update(zip(missing, fallbacks))
+        return results
+
+    def _plan(
+        self, email_ids: Optional[Iterable[str]], token_budget: Optional[int]
+    ) -> Tuple[Dict[str, str], List[List[Email]]]:
+        """Save what the fast paths decide; group the rest into LLM batches."""
+        results, remaining = self._apply_fast_paths_bulk(self._resolve(email_ids))
+        return results, self._plan_batches(remaining, token_budget)
+
+    def _resolve(self, email_ids: Optional[Iterable[str]]) -> List[Email]:
+        """Look up the requested emails (every email when `email_ids` is None)."""
+        if email_ids is None:
+            return self._inbox.list_emails()
+        return [self._inbox.get_email(email_id) for email_id in dict.fromkeys(email_ids)]
+
+    def _apply_fast_paths_bulk(self, emails: List[Email]) -> Tuple[Dict[str, str], List[Email]]:
+        """Decide what rules/local model can in one write; return the rest for the LLM."""
+        categories: Dict[str, str] = {}
+        sources: Dict[str, str] = {}
+        remaining: List[Email] = []
+        for email in emails:
+            decision = self._fast_decision(email)
+            if decision is None:
+                remaining.append(email)
+            else:
+                categories[email.id], sources[email.id] = decision
+
+        if categories:
+            self._inbox.save_categories(categories, sources)
+        return categories, remaining
+
+    def _plan_batches(self, emails: List[Email], token_budget: Optional[int]) -> List[List[Email]]:
+        """Group emails into batches whose estimated prompt size fits the budget."""
+        budget = token_budget or self.BATCH_TOKEN_BUDGET
+        batches: List[List[Email]] = []
+        current: List[Email] = []
+        used = 0
+        for email in emails:
+            cost = len(self._format_batch_entry(email)) // 4 + 1
+            if current and used + cost > budget:
+                batches.append(current)
+                current, used = [], 0
+            current.append(email)
+            used += cost
+        if current:
+            batches.append(current)
+        return batches
+
+    def _format_batch_entry(self, email: Email) -> str:
+        """One email as it appears inside the batch prompt."""
+        return (
+            f"Email id: {email.id}\n"
+            f"Subject: {email.subject}\n"
+            f"Body:\n{email.body[:self.BATCH_BODY_CHARS]}\n"
+            "---"
+        )
+
+    def _build_batch_context(self, batch: List[Email]) -> dict:
+        """Template variables for the batch prompt."""
+        return {
+            "emails": "\n".join(self._format_batch_entry(email) for email in batch),
+            "_intent": "categorize_batch",
+        }
+
+    def _save_batch(self, batch: List[Email], raw_json: str) -> Dict[str, str]:
+        """
+        Parse the id -> category map, normalize it and persist it in one write.
+        Ids without a valid category are left out (the caller retries them one by one).
+        """
+        try:
+            parsed = json.loads(raw_json)
+        except Exception:
+            parsed = {}
+        if not isinstance(parsed, dict):
+            parsed = {}
+
+        requested = {email.id for email in batch}
+        categories = {}
+        for email_id, category in parsed.items():
+            matched = self.match_category(str(category)) if str(email_id) in requested else None
+            if matched is not None:
+                categories[str(email_id)] = matched
+        if categories:
+            self._inbox.save_categories(categories, {email_id: "llm-batch" for email_id in categories})
+        return categories
 
     # ---------------------------------------------------------
     #   NORMALIZATION + FALLBACK
     # ---------------------------------------------------------
-    def _normalize_category(self, category: str) -> str:
+    def match_category(self, category: str) -> Optional[str]:
         """
         Cleans the LLM's output:
         - Lowercase
         - Trim whitespace
         - Remove punctuation
         - Match to allowed categories
+        Returns None when it names no valid category.
         """
-
         if not category:
-            return "other"
+            return None
 
         cat = category.lower().strip()
 
@@ -87,6 +359,5 @@ class CategorizationService:
         for valid in self.VALID_CATEGORIES:
             if valid in cat:
                 return valid.replace(" ", "-")
+        return None
 
-        # Fallback
-        return "other"
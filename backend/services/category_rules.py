@@ -0,0 +1,151 @@
+"""Rule-based fast path that categorizes obvious emails without the LLM."""
+from __future__ import annotations
+
+import json
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Pattern
+
+from backend.models.email import Email
+
+# Shipped defaults; a `category_rules.json` file ({"rules": [...]}) replaces them.
+DEFAULT_RULES: List[dict] = [
+    {
+        "name": "newsletter-sender",
+        "category": "newsletter",
+        "confidence": 0.95,
+        "sender": [r"^(newsletter|news|digest|updates|weekly)@"],
+    },
+    {
+        "name": "newsletter-unsubscribe-footer",
+        "category": "newsletter",
+        "confidence": 0.9,
+        "body": [r"\bunsubscribe\b", r"manage (your )?(email )?preferences"],
+    },
+    {
+        "name": "calendar-invite",
+        "category": "meeting",
+        "confidence": 0.95,
+        "sender": [r"^(calendar|calendar-notification)@"],
+        "subject": [r"^(updated )?invitation:"],
+    },
+    {
+        "name": "meeting-subject",
+        "category": "meeting",
+        "confidence": 0.9,
+        "subject": [r"\b(meeting|stand-?up|all-hands|sync)\b"],
+    },
+    {
+        "name": "prize-spam",
+        "category": "spam",
+        "confidence": 0.95,
+        "subject": [r"you('ve| have)? won", r"\b(lottery|jackpot)\b", r"claim your (prize|reward)"],
+    },
+]
+
+
+@dataclass
+class RuleMatch:
+    """A rule decision for one email."""
+
+    rule: str
+    category: str
+    confidence: float
+
+
+class CategoryRule:
+    """
+    One rule: every condition it defines (sender, domain, subject, body)
+    must match; a condition matches if any of its regexes does.
+    """
+
+    CONDITIONS = ("sender", "domain", "subject", "body")
+
+    def __init__(self, name: str, category: str, confidence: float, patterns: Dict[str, List[Pattern]]) -> None:
+        self.name = name
+        self.category = category
+        self.confidence = confidence
+        self.patterns = patterns
+
+    @classmethod
+    def from_dict(cls, data: dict, valid_categories: set) -> "CategoryRule":
+        """Validate and compile a rule definition."""
+        category = data["category"].lower()
+        if category not in valid_categories:
+            raise ValueError(f"Rule '{data.get('name')}' uses unknown category '{category}'.")
+
+        patterns = {
+            condition: [re.compile(p, re.IGNORECASE) for p in data[condition]]
+            for condition in cls.CONDITIONS
+            if data.get(condition)
+        }
+        if not patterns:
+            raise ValueError(f"Rule '{data.get('name')}' has no conditions.")
+
+        return cls(
+            name=data.get("name", category),
+            category=category,
+            confidence=float(data.get("confidence", 1.0)),
+            patterns=patterns,
+        )
+
+    def matches(self, fields: Dict[str, str]) -> bool:
+        return all(
+            any(p.search(fields[condition]) for p in patterns)
+            for condition, patterns in self.patterns.items()
+        )
+
+
+class CategoryRuleEngine:
+    """Evaluates rules in order and returns the most confident match above the threshold."""
+
+    def __init__(self, rules: List[CategoryRule], min_confidence: float = 0.9) -> None:
+        self._rules = rules
+        self._min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self._hits: Dict[str, int] = {rule.name: 0 for rule in rules}
+        self._misses = 0
+
+    @classmethod
+    def from_file(
+        cls,
+        path: Path,
+        valid_categories: set,
+        min_confidence: float = 0.9,
+    ) -> "CategoryRuleEngine":
+        """Load rules from `path`, falling back to DEFAULT_RULES if it does not exist."""
+        definitions = DEFAULT_RULES
+        if path.exists():
+            definitions = json.loads(path.read_text(encoding="utf-8")).get("rules", [])
+        rules = [CategoryRule.from_dict(item, valid_categories) for item in definitions]
+        return cls(rules, min_confidence)
+
+    def classify(self, email: Email) -> Optional[RuleMatch]:
+        """Return a confident rule decision, or None to defer to the LLM."""
+        fields = {
+            "sender": email.sender,
+            "domain": email.sender.rpartition("@")[2],
+            "subject": email.subject,
+            "body": email.body,
+        }
+
+        best: Optional[CategoryRule] = None
+        for rule in self._rules:
+            if rule.confidence < self._min_confidence:
+                continue
+            if (best is None or rule.confidence > best.confidence) and rule.matches(fields):
+                best = rule
+
+        with self._lock:
+            if best is None:
+                self._misses += 1
+                return None
+            self._hits[best.name] += 1
+        return RuleMatch(rule=best.name, category=best.category, confidence=best.confidence)
+
+    def stats(self) -> Dict[str, object]:
+        """Per-rule hit counts plus how many emails fell through to the LLM."""
+        with self._lock:
+            return {"hits": dict(self._hits), "misses": self._misses}
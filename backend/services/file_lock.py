@@ -0,0 +1,75 @@
+"""Cross-process file locking for state shared by several uvicorn workers."""
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+
+try:  # POSIX; elsewhere the lock only serializes threads of one process.
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+FileSignature = Optional[Tuple[int, int, int]]
+
+
+def file_signature(path: Path) -> FileSignature:
+    """(inode, mtime_ns, size) of `path`, or None if it does not exist; changes on any rewrite."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class FileLock:
+    """
+    Exclusive advisory lock on a side file (e.g. `inbox.lock`):
+    - `flock` serializes processes; an RLock serializes threads in this one
+    - Re-entrant within a thread, usable as a context manager
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+        if fcntl is None:
+            print(f"WARNING: fcntl is unavailable; {path} only locks within this process.")
+
+    def acquire(self) -> None:
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._fd = self._lock_file()
+            except BaseException:
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+
+    def _lock_file(self) -> int:
+        fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            except BaseException:
+                os.close(fd)
+                raise
+        return fd
+
+    def release(self) -> None:
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._thread_lock.release()
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.release()
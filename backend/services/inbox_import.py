@@ -0,0 +1,503 @@
+"""Streaming import of mailbox exports (JSON array, JSON Lines, mbox) into the inbox."""
+from __future__ import annotations
+
+import codecs
+import hashlib
+import json
+import re
+import sys
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from email import policy
+from email.errors import HeaderParseError
+from email.header import decode_header, make_header
+from email.message import Message
+from email.parser import BytesParser
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from backend.models.email import Email
+
+if TYPE_CHECKING:  # the JSON store reads its snapshot with JsonArrayParser
+    from backend.services.inbox_service import InboxService
+
+IMPORT_FORMATS = ("json", "jsonl", "mbox")
+DEFAULT_BATCH_SIZE = 500
+# Bytes read per chunk when importing from a file.
+READ_CHUNK = 1 << 20
+# A single record (JSON element, line or message) larger than this is treated as malformed,
+# which caps what a parser ever buffers.
+MAX_RECORD_BYTES = 64 << 20
+# Bytes buffered (at most, or up to the first full line) to detect the format from.
+DETECT_BYTES = 64 << 10
+# Rejected records listed individually in an ImportResult; the rest are only counted.
+MAX_REPORTED_ERRORS = 20
+
+_EXTENSIONS = {".json": "json", ".jsonl": "jsonl", ".ndjson": "jsonl", ".mbox": "mbox", ".mbx": "mbox"}
+
+# (where in the input, raw record) pairs produced by a parser.
+ParsedRecords = List[Tuple[str, object]]
+
+
+@dataclass
+class ImportResult:
+    """Outcome of one import."""
+
+    imported: int = 0
+    rejected: int = 0
+    batches: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def reject(self, where: str, reason: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"{where}: {reason}")
+
+    def to_dict(self) -> dict:
+        return {
+            "imported": self.imported,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "errors": self.errors,
+        }
+
+
+def detect_format(filename: str = "", head: bytes = b"") -> str:
+    """Import format from the file extension, else from the first bytes of the data."""
+    suffix = Path(filename).suffix.lower() if filename else ""
+    if suffix in _EXTENSIONS:
+        return _EXTENSIONS[suffix]
+    text = head.lstrip(b"\xef\xbb\xbf \t\r\n")
+    if text.startswith(b"From "):
+        return "mbox"
+    if text.startswith(b"["):
+        return "json"
+    if text.startswith(b"{"):
+        try:
+            first = json.loads(text.split(b"\n", 1)[0])
+        except ValueError:
+            return "json"
+        return "json" if isinstance(first, dict) and "emails" in first else "jsonl"
+    raise ValueError("Cannot tell the import format; use a .json, .jsonl or .mbox file or pass `format`.")
+
+
+# ---------------------------------------------------------
+#   PARSERS: feed(bytes) / close() -> ParsedRecords
+# ---------------------------------------------------------
+class JsonArrayParser:
+    """
+    Elements of a JSON array, or of the "emails" array of an inbox.json-style object:
+    - Each element is decoded on its own with `raw_decode`; only unread text is buffered
+    - An element cut off at the end of a chunk is retried once the buffer has doubled,
+      so large elements arriving in small chunks are not re-parsed over and over
+    - With `keep_members`, the object's other members (before and after the array) are
+      kept as text and decoded by `members` (the JSON store's snapshot header)
+    """
+
+    _EMAILS_KEY = re.compile(r'"emails"\s*:\s*\[')
+
+    def __init__(self, keep_members: bool = False) -> None:
+        self._text = codecs.getincrementaldecoder("utf-8-sig")()
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._state = "start"  # start -> items -> done
+        self._retry_at = 0
+        self._index = 0
+        self._keep_members = keep_members
+        self._head = ""
+        self._tail: List[str] = []
+
+    def feed(self, chunk: bytes) -> ParsedRecords:
+        self._buffer += self._text.decode(chunk)
+        return self._drain(final=False)
+
+    def close(self) -> ParsedRecords:
+        self._buffer += self._text.decode(b"", final=True)
+        records = self._drain(final=True)
+        if self._state != "done":
+            raise ValueError("JSON input ended before its array of emails was closed.")
+        return records
+
+    def members(self) -> dict:
+        """The enclosing object's members other than "emails" (`keep_members`, after `close`)."""
+        head = self._head.strip()[1:]  # drop the opening brace
+        tail = "".join(self._tail).strip()[:-1]  # and the closing one
+        parts = [part.strip().strip(",").strip() for part in (head, tail)]
+        return json.loads("{" + ",".join(part for part in parts if part) + "}")
+
+    def _drain(self, final: bool) -> ParsedRecords:
+        records: ParsedRecords = []
+        buffer = self._buffer
+        pos = 0
+        if self._state == "done":
+            if self._keep_members:
+                self._tail.append(buffer)
+            self._buffer = ""
+            return records
+        if self._state == "start":
+            stripped = buffer.lstrip()
+            if not stripped:
+                return records
+            if stripped[0] == "[":
+                pos = buffer.index("[") + 1
+            elif stripped[0] == "{":
+                match = self._EMAILS_KEY.search(buffer)
+                if match is None:
+                    if final or len(buffer) > MAX_RECORD_BYTES:
+                        raise ValueError('JSON object has no "emails" array.')
+                    return records
+                pos = match.end()
+                if self._keep_members:
+                    self._head = buffer[:match.start()]
+            else:
+                raise ValueError('JSON input must be an array of emails or an object with an "emails" array.')
+            self._state = "items"
+
+        while self._state == "items":
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buffer):
+                break
+            if buffer[pos] == "]":
+                self._state = "done"
+                break
+            if not final and len(buffer) - pos < self._retry_at:
+                break
+            try:
+                record, pos = self._decoder.raw_decode(buffer, pos)
+            except ValueError as e:
+                if final:
+                    raise ValueError(f"Malformed JSON at element {self._index + 1}: {e}")
+                if len(buffer) - pos > MAX_RECORD_BYTES:
+                    raise ValueError(f"JSON element {self._index + 1} is malformed or larger than {MAX_RECORD_BYTES} bytes.")
+                # Most likely cut off by the chunk boundary: wait for more text.
+                self._retry_at = 2 * (len(buffer) - pos)
+                break
+            self._retry_at = 0
+            self._index += 1
+            records.append((f"element {self._index}", record))
+
+        if self._state == "done":
+            # Whatever follows the array (other inbox.json members) is only kept if asked for.
+            if self._keep_members:
+                self._tail.append(buffer[pos + 1:])
+            self._buffer = ""
+        else:
+            self._buffer = buffer[pos:]
+        return records
+
+
+class _JsonLinesParser:
+    """One JSON document per line; a bad line only rejects that record."""
+
+    def __init__(self) -> None:
+        # Pieces of the unfinished last line, joined once its newline arrives.
+        self._tail: List[bytes] = []
+        self._tail_size = 0
+        self._line = 0
+
+    def feed(self, chunk: bytes) -> ParsedRecords:
+        if b"\n" not in chunk:
+            self._tail.append(chunk)
+            self._tail_size += len(chunk)
+            if self._tail_size > MAX_RECORD_BYTES:
+                raise ValueError(f"Line {self._line + 1} is longer than {MAX_RECORD_BYTES} bytes.")
+            return []
+        lines = b"".join([*self._tail, chunk]).split(b"\n")
+        last = lines.pop()
+        self._tail, self._tail_size = [last], len(last)
+        return self._records(lines)
+
+    def close(self) -> ParsedRecords:
+        tail, self._tail = b"".join(self._tail), []
+        return self._records([tail])
+
+    def _records(self, lines: List[bytes]) -> ParsedRecords:
+        records: ParsedRecords = []
+        for line in lines:
+            self._line += 1
+            if line.strip():
+                records.append((f"line {self._line}", line))
+        return records
+
+
+class _MboxParser:
+    """
+    Messages of an mbox file, split on "From " separator lines:
+    - Only the message being read is buffered
+    - mboxrd-escaped body lines (">From ...") are unescaped
+    """
+
+    _ESCAPED_FROM = re.compile(rb"^>+From ")
+
+    def __init__(self) -> None:
+        self._tail = b""
+        self._lines: List[bytes] = []
+        self._size = 0
+        self._count = 0
+
+    def feed(self, chunk: bytes) -> ParsedRecords:
+        lines = (self._tail + chunk).split(b"\n")
+        self._tail = lines.pop()
+        return self._records(lines)
+
+    def close(self) -> ParsedRecords:
+        tail, self._tail = self._tail, b""
+        records = self._records([tail] if tail else [])
+        if self._lines:
+            records.append(self._message())
+        return records
+
+    def _records(self, lines: List[bytes]) -> ParsedRecords:
+        records: ParsedRecords = []
+        for line in lines:
+            if line.startswith(b"From "):
+                if self._lines:
+                    records.append(self._message())
+                self._lines = [b""]  # marks "inside a message" even before its first header
+                self._size = 0
+                continue
+            if not self._lines:
+                if line.strip():
+                    raise ValueError("mbox input must start with a 'From ' separator line.")
+                continue
+            if self._ESCAPED_FROM.match(line):
+                line = line[1:]
+            self._lines.append(line)
+            self._size += len(line) + 1
+            if self._size > MAX_RECORD_BYTES:
+                raise ValueError(f"Message {self._count + 1} is larger than {MAX_RECORD_BYTES} bytes.")
+        return records
+
+    def _message(self) -> Tuple[str, object]:
+        raw = b"\n".join(self._lines[1:])
+        self._lines = []
+        self._count += 1
+        return f"message {self._count}", raw
+
+
+# ---------------------------------------------------------
+#   RECORD -> EMAIL
+# ---------------------------------------------------------
+# Record fields that must be strings / lists of strings when present (the store
+# tokenizes, lowercases and joins them, so any other type would fail there instead).
+_TEXT_FIELDS = ("id", "sender", "from", "subject", "body", "summary", "category", "category_source")
+_LIST_FIELDS = ("action_items", "drafts")
+
+
+def _email_from_record(record: object) -> Email:
+    """Validate one decoded JSON record, field types included, through `Email.from_dict`."""
+    if not isinstance(record, dict):
+        raise ValueError("expected a JSON object")
+    if record.get("id") in (None, ""):
+        raise ValueError("missing 'id'")
+    for name in _TEXT_FIELDS:
+        if name in record and not isinstance(record[name], str):
+            raise ValueError(f"'{name}' must be a string")
+    for name in _LIST_FIELDS:
+        value = record.get(name)
+        # null means "none", as in `Email.from_dict`.
+        if value is not None and not (isinstance(value, list) and all(isinstance(item, str) for item in value)):
+            raise ValueError(f"'{name}' must be a list of strings")
+    return Email.from_dict(record)
+
+
+def _email_from_line(line: object) -> Email:
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        raise ValueError(f"invalid JSON ({e})")
+    return _email_from_record(record)
+
+
+_TAG = re.compile(r"<[^>]+>")
+
+
+def _email_from_message(raw: object) -> Email:
+    """
+    Map an RFC 5322 message onto the inbox fields:
+    - Parsed with the compat32 policy (raw header strings), decoding only the headers
+      used; the default policy's structured headers cost several times more per message
+    - Body: the first inline text/plain part, else text/html with the tags stripped
+    """
+    message = BytesParser(policy=policy.compat32).parsebytes(raw)
+    message_id = _header(message, "Message-ID").strip().strip("<>")
+    timestamp = ""
+    date = _header(message, "Date")
+    if date:
+        try:
+            timestamp = parsedate_to_datetime(date).isoformat()
+        except (TypeError, ValueError):
+            pass
+    return _email_from_record({
+        # Messages without a Message-ID get a stable id, so re-importing replaces them.
+        "id": message_id or "mbox-" + hashlib.sha1(raw).hexdigest()[:16],
+        "sender": _header(message, "From"),
+        "subject": _header(message, "Subject") or "(no subject)",
+        "timestamp": timestamp,
+        "body": _text_body(message).strip(),
+    })
+
+
+def _header(message: Message, name: str) -> str:
+    """Header value with RFC 2047 encoded words decoded ("" if absent)."""
+    value = message.get(name)
+    if value is None:
+        return ""
+    try:
+        return str(make_header(decode_header(str(value))))
+    except (HeaderParseError, LookupError, UnicodeError):
+        return str(value)
+
+
+def _text_body(message: Message) -> str:
+    html = None
+    for part in message.walk():
+        if part.get_content_maintype() != "text" or part.get_content_disposition() == "attachment":
+            continue
+        payload = part.get_payload(decode=True) or b""
+        try:
+            text = payload.decode(part.get_content_charset() or "utf-8", "replace")
+        except LookupError:  # unknown charset
+            text = payload.decode("utf-8", "replace")
+        if part.get_content_subtype() == "plain":
+            return text
+        if html is None and part.get_content_subtype() == "html":
+            html = _TAG.sub(" ", text)
+    return html or ""
+
+
+_FORMATS: Dict[str, Tuple[Callable[[], object], Callable[[object], Email]]] = {
+    "json": (JsonArrayParser, _email_from_record),
+    "jsonl": (_JsonLinesParser, _email_from_line),
+    "mbox": (_MboxParser, _email_from_message),
+}
+
+
+# ---------------------------------------------------------
+#   IMPORTER
+# ---------------------------------------------------------
+class InboxImporter:
+    """
+    Push-style import: `feed` bytes as they arrive, then `finish`:
+    - Records are parsed incrementally and validated through `Email.from_dict`
+    - Valid emails are written `batch_size` at a time (one store write each), so memory is
+      bounded by the batch and the record being parsed, not by the size of the file
+    - Invalid records are counted in the result; input that cannot be parsed any further
+      raises ValueError (batches written before that stay imported)
+    - Emails whose id already exists are replaced
+    Without `fmt`, the format is detected from `filename` or the first chunk.
+    Always `close` (safe after `finish`) to leave the store's bulk mode.
+    """
+
+    def __init__(
+        self,
+        inbox: InboxService,
+        fmt: Optional[str] = None,
+        filename: str = "",
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        if fmt is not None and fmt not in IMPORT_FORMATS:
+            raise ValueError(f"Unknown import format '{fmt}'. Use one of: {', '.join(IMPORT_FORMATS)}")
+        self._inbox = inbox
+        self._fmt = fmt
+        self._filename = filename
+        self._parser = None
+        self._head = b""
+        self._convert: Callable[[object], Email] = _email_from_record
+        self._batch: List[Email] = []
+        self._batch_size = max(1, batch_size)
+        self.result = ImportResult()
+        self._bulk = ExitStack()
+        self._bulk.enter_context(inbox.bulk())
+
+    @property
+    def format(self) -> Optional[str]:
+        return self._fmt
+
+    def feed(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        if self._parser is None:
+            self._head += chunk
+            if b"\n" not in self._head.lstrip() and len(self._head) < DETECT_BYTES:
+                return
+            chunk, self._head = self._head, b""
+            self._start(chunk)
+        self._accept(self._parser.feed(chunk))
+
+    def finish(self) -> ImportResult:
+        """Parse what is left, write the last batch and leave bulk mode."""
+        if self._parser is None and self._head:
+            self._start(self._head)
+            self._accept(self._parser.feed(self._head))
+        if self._parser is not None:
+            self._accept(self._parser.close())
+        self._write()
+        self.close()
+        return self.result
+
+    def close(self) -> None:
+        self._bulk.close()
+
+    def _start(self, head: bytes) -> None:
+        if self._fmt is None:
+            self._fmt = detect_format(self._filename, head)
+        parser_class, self._convert = _FORMATS[self._fmt]
+        self._parser = parser_class()
+
+    def _accept(self, records: ParsedRecords) -> None:
+        for where, record in records:
+            try:
+                email = self._convert(record)
+            except Exception as e:  # anything a malformed record can raise, incl. email header parsing
+                self.result.reject(where, str(e) or type(e).__name__)
+                continue
+            self._batch.append(email)
+            if len(self._batch) >= self._batch_size:
+                self._write()
+
+    def _write(self) -> None:
+        if not self._batch:
+            return
+        self._inbox.import_emails(self._batch)
+        self.result.imported += len(self._batch)
+        self.result.batches += 1
+        self._batch = []
+
+
+def import_file(
+    inbox: InboxService,
+    path: Path,
+    fmt: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> ImportResult:
+    """Stream a file into the inbox in READ_CHUNK reads (see InboxImporter)."""
+    importer = InboxImporter(inbox, fmt, filename=path.name, batch_size=batch_size)
+    try:
+        with path.open("rb") as handle:
+            for chunk in iter(lambda: handle.read(READ_CHUNK), b""):
+                importer.feed(chunk)
+        return importer.finish()
+    finally:
+        importer.close()
+
+
+# ---------------------------------------------------------
+#   CLI: python -m backend.services.inbox_import FILE [json|jsonl|mbox]
+# ---------------------------------------------------------
+if __name__ == "__main__":
+    from backend.services.inbox_service import InboxService
+    from backend.services.inbox_store import create_inbox_store
+
+    if len(sys.argv) < 2:
+        print("Usage: python -m backend.services.inbox_import FILE [json|jsonl|mbox]")
+        sys.exit(2)
+    data_dir = Path(__file__).resolve().parent.parent.parent / "data"
+    service = InboxService(create_inbox_store(data_dir))
+    try:
+        outcome = import_file(service, Path(sys.argv[1]), sys.argv[2] if len(sys.argv) > 2 else None)
+    finally:
+        service.close()
+    print(json.dumps(outcome.to_dict(), indent=2))
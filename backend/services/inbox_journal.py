@@ -0,0 +1,93 @@
+"""Append-only mutation journal that sits next to the inbox snapshot."""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+
+# One journal record: (revision, op, payload). op is "put" (payload = email dict).
+JournalRecord = Tuple[int, str, dict]
+
+
+class InboxJournal:
+    """
+    Line-delimited JSON journal of inbox mutations:
+    - Each record carries a monotonically increasing revision
+    - Appends cost O(record), independent of inbox size
+    - Replay stops at a torn (half-written) last line and truncates it away
+    """
+
+    def __init__(self, path: Path, fsync: bool = False) -> None:
+        self._path = path
+        self._fsync = fsync
+        self._lock = threading.Lock()
+        self.records = 0
+        self.bytes = path.stat().st_size if path.exists() else 0
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def replay(self, start: int = 0) -> Iterator[JournalRecord]:
+        """
+        Yield every intact record from byte offset `start` on, dropping a torn tail.
+        `start=self.bytes` picks up records appended by other processes since the last replay.
+        """
+        if not self._path.exists():
+            return
+        good_offset = start
+        count = 0
+        with self._path.open("rb") as handle:
+            handle.seek(start)
+            for line in handle:
+                if not line.endswith(b"\n"):
+                    # Crashed mid-append: the last record was never terminated.
+                    break
+                try:
+                    entry = json.loads(line)
+                    record = (int(entry["rev"]), entry["op"], entry["data"])
+                except (ValueError, KeyError, TypeError):
+                    print(
+                        f"WARNING: Journal {self._path} has a damaged record at byte {good_offset}; "
+                        "discarding it and everything after it."
+                    )
+                    break
+                good_offset += len(line)
+                count += 1
+                yield record
+
+        if good_offset < self._path.stat().st_size:
+            with self._path.open("r+b") as handle:
+                handle.truncate(good_offset)
+        self.records = (self.records if start else 0) + count
+        self.bytes = good_offset
+
+    def append(self, records: Iterable[JournalRecord]) -> None:
+        """Append records in one write (a batch lands together or is torn at the tail)."""
+        lines: List[str] = [
+            json.dumps({"rev": rev, "op": op, "data": data}, separators=(",", ":")) + "\n"
+            for rev, op, data in records
+        ]
+        if not lines:
+            return
+        payload = "".join(lines).encode("utf-8")
+        with self._lock:
+            with self._path.open("ab") as handle:
+                handle.write(payload)
+                handle.flush()
+                if self._fsync:
+                    os.fsync(handle.fileno())
+            self.records += len(lines)
+            self.bytes += len(payload)
+
+    def reset(self) -> None:
+        """Drop all records (after they have been compacted into the snapshot)."""
+        with self._lock:
+            with self._path.open("wb") as handle:
+                handle.flush()
+                if self._fsync:
+                    os.fsync(handle.fileno())
+            self.records = 0
+            self.bytes = 0
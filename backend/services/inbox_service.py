@@ -1,78 +1,182 @@
 """Inbox service responsible for loading mock data, categorization, and drafts."""
 from __future__ import annotations
 
-import json
-from pathlib import Path
-from typing import Dict, List, Optional
+from typing import ContextManager, Dict, List, Optional, Sequence, Tuple
 
 from backend.models.email import Email
+from backend.services.inbox_store import InboxStore, decode_cursor, encode_cursor, order_key
 
 
 class InboxService:
-    """Manages inbox persistence and higher-level operations."""
-
-    def __init__(self, inbox_path: Path) -> None:
-        self._path = inbox_path
-        self._emails: Dict[str, Email] = {}
-        self._load()
-
-    def _load(self) -> None:
-        """Load the inbox dataset from disk."""
-        if not self._path.exists():
-            raise FileNotFoundError(f"Inbox file not found: {self._path}")
-        with self._path.open("r", encoding="utf-8") as handle:
-            payload = json.load(handle)
-        self._emails = {
-            raw["id"]: Email.from_dict(raw)
-            for raw in payload.get("emails", [])
-        }
-
-    def _persist(self) -> None:
-        """Persist current inbox state to disk."""
-        data = {
-            "emails": [email.to_dict() for email in self._emails.values()]
-        }
-        with self._path.open("w", encoding="utf-8") as handle:
-            json.dump(data, handle, indent=2)
+    """Manages inbox persistence (through a pluggable store) and higher-level operations."""
+
+    def __init__(self, store: InboxStore) -> None:
+        self._store = store
+
+    @property
+    def revision(self) -> int:
+        """Revision of the latest applied mutation."""
+        return self._store.revision
+
+    def flush(self) -> None:
+        """Make every accepted change durable (matters in write-behind mode)."""
+        self._store.flush()
+
+    def close(self) -> None:
+        """Flush the store on shutdown."""
+        self._store.close()
 
     def list_emails(self) -> List[Email]:
         """Return all emails sorted by timestamp descending."""
-        return sorted(self._emails.values(), key=lambda e: e.timestamp, reverse=True)
+        return self._store.list_all()
+
+    def list_page(
+        self,
+        limit: int,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+    ) -> Tuple[List[Email], Optional[str], Optional[str]]:
+        """
+        Return one page of the newest-first listing plus cursors:
+        - `before`: continue with older emails; `after`: the page just newer than the cursor
+        - The next cursor (older) is None at the end; the previous cursor (newer) is None at the top
+        Raises ValueError for malformed cursors.
+        """
+        if before and after:
+            raise ValueError("Use either 'before' or 'after', not both.")
+        before_key = decode_cursor(before) if before else None
+        after_key = decode_cursor(after) if after else None
+
+        # Fetch one extra email to learn whether another page exists in that direction.
+        emails = self._store.page(limit + 1, before=before_key, after=after_key)
+        has_more = len(emails) > limit
+        if after_key is not None:
+            emails = emails[-limit:] if has_more else emails
+            has_newer, has_older = has_more, True
+        else:
+            emails = emails[:limit]
+            has_newer, has_older = before_key is not None, has_more
+
+        next_cursor = encode_cursor(order_key(emails[-1])) if emails and has_older else None
+        prev_cursor = encode_cursor(order_key(emails[0])) if emails and has_newer else None
+        return emails, next_cursor, prev_cursor
 
     def get_email(self, email_id: str) -> Email:
         """Return an email by id."""
-        if email_id not in self._emails:
+        email = self._store.get(email_id)
+        if email is None:
             raise KeyError(f"Email {email_id} not found")
-        return self._emails[email_id]
+        return email
 
     def update_email(self, email: Email) -> None:
         """Persist updates to a single email record."""
-        self._emails[email.id] = email
-        self._persist()
-
-    def save_category(self, email_id: str, category: str) -> Email:
-        """Update the category field for an email."""
-        email = self.get_email(email_id)
-        email.category = category
-        self.update_email(email)
-        return email
+        self._store.put([email])
+
+    def import_emails(self, emails: List[Email]) -> None:
+        """Insert (or replace) a batch of emails with a single write."""
+        self._store.put(emails)
+
+    def bulk(self) -> ContextManager[None]:
+        """Context for many consecutive writes; the store defers housekeeping until it ends."""
+        return self._store.bulk()
+
+    def save_category(self, email_id: str, category: str, source: str = "") -> Email:
+        """Update the category field (and the path that decided it) for an email."""
+        return self._update(email_id, category=category, category_source=source)
+
+    def save_categories(self, categories: Dict[str, str], sources: Dict[str, str]) -> None:
+        """Update the category of several emails with a single write."""
+        self._store.update({
+            email_id: {"category": category, "category_source": sources.get(email_id, "")}
+            for email_id, category in categories.items()
+        })
 
     def save_actions(self, email_id: str, actions: List[str]) -> Email:
         """Update extracted action items for an email."""
-        email = self.get_email(email_id)
-        email.action_items = actions
-        self.update_email(email)
-        return email
+        return self._update(email_id, action_items=actions)
+
+    def save_triage(
+        self,
+        email_id: str,
+        category: str,
+        source: str,
+        actions: List[str],
+        summary: str,
+    ) -> Email:
+        """Update category, action items and summary together with a single write."""
+        return self._update(
+            email_id,
+            category=category,
+            category_source=source,
+            action_items=actions,
+            summary=summary,
+        )
 
     def append_draft(self, email_id: str, draft_text: str) -> Email:
         """Append a new draft to the email's draft list."""
-        email = self.get_email(email_id)
-        email.drafts.append(draft_text)
-        self.update_email(email)
-        return email
+        return self._update(email_id, drafts=lambda drafts: [*drafts, draft_text])
+
+    def remove_draft(self, email_id: str, draft_index: int) -> bool:
+        """Remove the draft at `draft_index`; returns False if there is no such draft."""
+        removed: List[str] = []
+
+        def drop(drafts: List[str]) -> List[str]:
+            if 0 <= draft_index < len(drafts):
+                removed.append(drafts[draft_index])
+                return drafts[:draft_index] + drafts[draft_index + 1:]
+            return drafts
+
+        self._update(email_id, drafts=drop)
+        return bool(removed)
 
     def search_by_category(self, category: Optional[str] = None) -> List[Email]:
         """Filter emails by category."""
         if not category:
             return self.list_emails()
-        return [email for email in self._emails.values() if email.category == category]
+        return self._store.filter(categories=[category])
+
+    def filter_emails(
+        self,
+        categories: Sequence[str] = (),
+        senders: Sequence[str] = (),
+        domains: Sequence[str] = (),
+        limit: Optional[int] = None,
+        before: Optional[str] = None,
+    ) -> Tuple[List[Email], Optional[str]]:
+        """
+        Return emails matching all filters (any value within one filter), newest first:
+        - Served from the store's category / sender / domain indexes
+        - With `limit`, also the cursor of the next (older) page, else None
+        Raises ValueError for a malformed cursor.
+        """
+        before_key = decode_cursor(before) if before else None
+        fetch = limit + 1 if limit is not None else None
+        emails = self._store.filter(categories, senders, domains, limit=fetch, before=before_key)
+        if limit is None or len(emails) <= limit:
+            return emails, None
+        emails = emails[:limit]
+        return emails, encode_cursor(order_key(emails[-1]))
+
+    def changes(self, since: Optional[int], limit: int) -> Tuple[int, bool, List[Email]]:
+        """
+        Return (revision, resync, upserts) for a client whose copy is at revision `since`:
+        - Normally the emails written since then
+        - `resync=True` with every email (newest first) when there is no `since`, the store cannot
+          diff from it, or more than `limit` records changed; the client replaces its copy
+        """
+        delta = self._store.changes(since, limit) if since is not None else None
+        if delta is not None:
+            revision, upserts = delta
+            return revision, False, upserts
+        # Read the revision first: the listing is at least that new, and replaying
+        # changes the client then asks for is harmless.
+        revision = self._store.revision
+        return revision, True, self._store.list_all()
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[Email, float]]:
+        """Full-text search over subject, sender and body, best BM25 match first."""
+        return self._store.search(query, limit)
+
+    def _update(self, email_id: str, **fields: object) -> Email:
+        """Change some fields of one email in a single store write."""
+        return self._store.update({email_id: fields})[email_id]
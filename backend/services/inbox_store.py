@@ -0,0 +1,1192 @@
+"""Storage engines behind InboxService: JSON snapshot + journal, or SQLite."""
+from __future__ import annotations
+
+import base64
+import binascii
+import heapq
+import json
+import os
+import sqlite3
+import sys
+import threading
+from bisect import bisect_left, bisect_right, insort
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from email.utils import parseaddr
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from backend.models.email import Email
+from backend.services.body_store import BodyFile
+from backend.services.file_lock import FileLock, FileSignature, file_signature
+from backend.services.inbox_import import READ_CHUNK, JsonArrayParser, ParsedRecords
+from backend.services.inbox_journal import InboxJournal, JournalRecord
+from backend.services.search_index import SearchIndex, parse_query
+
+# Email fields `InboxStore.update` may change (everything except the message itself).
+MUTABLE_FIELDS = {"category", "category_source", "action_items", "drafts", "summary"}
+
+# Position of an email in the timeline: (naive-UTC ISO timestamp, id). Listings are
+# newest first, i.e. descending by this key; pagination cursors encode it.
+OrderKey = Tuple[str, str]
+
+# Secondary index keys of an email: (category, sender address, sender domain), lowercased.
+IndexKeys = Tuple[str, str, str]
+
+# What changed after a revision: (current revision, emails written since).
+ChangeSet = Tuple[int, List[Email]]
+
+
+class InboxStore:
+    """
+    Interface every inbox storage engine implements.
+    Emails returned by a store may be mutated freely; changes only persist
+    through `put` / `update`, each of which is a single atomic write.
+    """
+
+    name = "base"
+
+    @property
+    def revision(self) -> int:
+        """Revision of the latest applied mutation."""
+        raise NotImplementedError
+
+    def get(self, email_id: str) -> Optional[Email]:
+        raise NotImplementedError
+
+    def list_all(self) -> List[Email]:
+        """All emails, newest first."""
+        raise NotImplementedError
+
+    def filter(
+        self,
+        categories: Sequence[str] = (),
+        senders: Sequence[str] = (),
+        domains: Sequence[str] = (),
+        limit: Optional[int] = None,
+        before: Optional[OrderKey] = None,
+    ) -> List[Email]:
+        """
+        Emails matching every given filter, newest first (case-insensitive):
+        - Several values of one filter match any of them (category=a OR category=b)
+        - Different filters must all match (category AND sender AND domain)
+        - At most `limit` emails older than `before` when those are given
+        """
+        raise NotImplementedError
+
+    def page(self, limit: int, before: Optional[OrderKey] = None, after: Optional[OrderKey] = None) -> List[Email]:
+        """
+        Up to `limit` emails, newest first: the newest ones older than `before`,
+        or the oldest ones newer than `after` (the page just above that cursor).
+        """
+        raise NotImplementedError
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[Email, float]]:
+        """
+        Full-text search over subject, sender and body (see `search_index.parse_query`
+        for the syntax): the best `limit` (email, BM25 score) pairs, best first.
+        """
+        raise NotImplementedError
+
+    def changes(self, since: int, limit: int) -> Optional[ChangeSet]:
+        """
+        Emails written after revision `since`, for incremental sync.
+        None when the store cannot tell (`since` is older than the change history it
+        keeps, or newer than its revision) or more than `limit` records changed; the
+        caller then needs the full listing instead.
+        """
+        raise NotImplementedError
+
+    def put(self, emails: Iterable[Email]) -> None:
+        """Insert or replace whole records."""
+        raise NotImplementedError
+
+    def update(self, changes: Dict[str, Dict[str, object]]) -> Dict[str, Email]:
+        """
+        Apply {email_id: {field: value}} changes together and return the updated emails.
+        A callable value is applied to the field's current value inside the write
+        (read-modify-write without lost updates). Raises KeyError (and changes
+        nothing) if any id is unknown.
+        """
+        raise NotImplementedError
+
+    @contextmanager
+    def bulk(self) -> Iterator[None]:
+        """Hint that many writes follow (an import); stores may defer housekeeping until the end."""
+        yield
+
+    def flush(self) -> None:
+        """Block until every accepted write is on disk (no-op for write-through stores)."""
+
+    def close(self) -> None:
+        """Flush and release resources on shutdown."""
+
+
+def order_key(email: Email) -> OrderKey:
+    """Timeline position: naive-UTC ISO timestamp (see `Email.timestamp_key`), then id."""
+    return email.timestamp_key, email.id
+
+
+def sender_address(sender: str) -> str:
+    """Bare, lowercased address of a sender ("Ann <ann@x.com>" -> "ann@x.com")."""
+    sender = sender.strip()
+    if "<" in sender or " " in sender:
+        # Only display-name forms need the (slow) RFC 5322 parser.
+        sender = parseaddr(sender)[1] or sender
+    return sender.lower()
+
+
+def sender_domain(sender: str) -> str:
+    """Lowercased domain of a sender address ("" if it has none)."""
+    return _domain_of(sender_address(sender))
+
+
+def _domain_of(address: str) -> str:
+    return address.rpartition("@")[2] if "@" in address else ""
+
+
+def index_keys(email: Email) -> IndexKeys:
+    """
+    Category / sender / domain keys under which the secondary indexes file an email.
+    Interned: the JSON store keeps them per email, and few distinct values repeat a lot.
+    """
+    address = sender_address(email.sender)
+    return sys.intern(email.category.strip().lower()), sys.intern(address), sys.intern(_domain_of(address))
+
+
+def encode_cursor(key: OrderKey) -> str:
+    """Opaque, URL-safe pagination cursor for a timeline position."""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> OrderKey:
+    """Inverse of `encode_cursor`; raises ValueError for malformed cursors."""
+    try:
+        ts, email_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        datetime.fromisoformat(ts)
+    except (ValueError, TypeError, binascii.Error, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    return str(ts), str(email_id)
+
+
+def _check_fields(changes: Dict[str, Dict[str, object]]) -> None:
+    for fields in changes.values():
+        unknown = set(fields) - MUTABLE_FIELDS
+        if unknown:
+            raise ValueError(f"Cannot update email field(s): {', '.join(sorted(unknown))}")
+
+
+# ---------------------------------------------------------
+#   JSON SNAPSHOT + JOURNAL
+# ---------------------------------------------------------
+class JsonInboxStore(InboxStore):
+    """
+    All emails in memory, persisted as:
+    - `inbox.json`: a snapshot tagged with the journal revision it contains
+    - `inbox.journal`: every mutation since, appended instead of rewriting the snapshot
+    The journal is folded into the snapshot every `compact_every` records. The snapshot
+    is read and written one email at a time, so neither needs the whole file in memory.
+
+    Stored emails are never changed in place (`update` replaces them with changed
+    copies), which lets `compact` write them out without holding `_lock`.
+
+    With `write_behind`, mutations are applied in memory and queued; a background
+    thread appends them as one group commit once `flush_every` records are queued
+    or the oldest has waited `flush_interval` seconds (and on `flush` / `close`).
+
+    A full-text index is maintained alongside and saved with every snapshot as
+    `inbox.search.json`; startup loads it and re-indexes only emails that differ (none,
+    without reading any text, when it was saved with the snapshot being loaded).
+
+    For `changes`, the revision of each email's latest write is kept in revision
+    order and saved in the snapshot.
+
+    With `lazy_bodies`, only headers and metadata stay resident: bodies are appended to
+    `inbox.bodies.<generation>` next to the snapshot and read through mmap when
+    `Email.body` is touched. Snapshot and journal records carry a `body_ref`
+    ([generation, offset, length]) instead of the text, so loading reads no bodies and
+    compaction copies none. Compaction repacks the live bodies into a new generation
+    once replaced ones make the files `BODY_FILE_SLACK` times larger, and deletes
+    generations the new snapshot no longer references. Without `lazy_bodies`, refs are
+    read back into memory and snapshots carry the text again.
+
+    With `shared`, several processes (uvicorn workers) can use the same files:
+    every operation holds `inbox.lock` and first catches up on journal records or
+    snapshots written by other processes.
+
+    With `read_only`, the files are only ever read: mutations raise ValueError, and
+    neither opening, `compact` nor `close` rewrites the snapshot (e.g. a migration source).
+    """
+
+    name = "json"
+
+    # Body file size / live body bytes above which compaction rewrites it.
+    BODY_FILE_SLACK = 2
+
+    def __init__(
+        self,
+        path: Path,
+        compact_every: int = 1000,
+        fsync: bool = False,
+        write_behind: bool = False,
+        flush_every: int = 256,
+        flush_interval: float = 1.0,
+        shared: bool = False,
+        lazy_bodies: bool = True,
+        read_only: bool = False,
+    ) -> None:
+        if shared and write_behind:
+            raise ValueError("Write-behind cannot be combined with a shared (multi-worker) inbox.")
+        if read_only and write_behind:
+            raise ValueError("Write-behind cannot be combined with a read-only inbox.")
+        self._path = path
+        self._read_only = read_only
+        self._emails: Dict[str, Email] = {}
+        # Timestamp index: order keys ascending, kept in sync by `_set`.
+        self._timeline: List[OrderKey] = []
+        self._order_keys: Dict[str, OrderKey] = {}
+        # Secondary indexes: category / sender / domain -> that bucket's order keys
+        # ascending (a per-bucket timeline), also maintained by `_set`.
+        self._index_keys: Dict[str, IndexKeys] = {}
+        self._indexes: Tuple[Dict[str, List[OrderKey]], ...] = ({}, {}, {})
+        self._search = SearchIndex()
+        self._search_path = path.with_suffix(".search.json")
+        self._lazy_bodies = lazy_bodies
+        # Body files referenced so far (generation -> file), and the one new bodies go to:
+        # the newest generation, or a private temp file when read-only.
+        self._body_files: Dict[int, BodyFile] = {}
+        self._bodies: Optional[BodyFile] = None
+        self._fsync = fsync
+        # Change feed: id -> revision of its latest write, ascending by revision.
+        # `changes` can answer for any revision from `_changes_floor` on.
+        self._changed: Dict[str, int] = {}
+        self._changes_floor = 0
+        self._journal = InboxJournal(path.with_suffix(".journal"), fsync=fsync)
+        self._compact_every = max(1, compact_every)
+        self._revision = 0
+        self._snapshot_signature: FileSignature = None
+        # Lock order: `_file_lock` (shared mode) -> `_io_lock` -> `_lock`.
+        # `_lock` guards in-memory state and the queue; `_io_lock` orders disk writes.
+        self._file_lock = FileLock(path.with_suffix(".lock")) if shared else None
+        self._lock = threading.RLock()
+        self._io_lock = threading.RLock()
+        self._wake = threading.Condition(self._lock)
+        self._pending: List[JournalRecord] = []
+        self._pending_since = 0.0
+        self._flush_every = max(1, flush_every)
+        self._flush_interval = flush_interval
+        self._bulk_depth = 0
+        self._closed = False
+        with self._cross_process():
+            self._load()
+
+        self._flusher: Optional[threading.Thread] = None
+        if write_behind:
+            self._flusher = threading.Thread(target=self._flush_loop, name="inbox-flush", daemon=True)
+            self._flusher.start()
+
+    @property
+    def revision(self) -> int:
+        with self._synced():
+            return self._revision
+
+    # ---------------------------------------------------------
+    # LOAD + PERSIST
+    # ---------------------------------------------------------
+    def _load(self) -> None:
+        """Load the snapshot, then replay journal records newer than it."""
+        if not self._path.exists():
+            raise FileNotFoundError(f"Inbox file not found: {self._path}")
+        with self._lock:
+            self._snapshot_signature = file_signature(self._path)
+            # Body files are reopened: emails handed out earlier keep reading the old handles.
+            self._body_files = {}
+            self._bodies = None
+            self._emails = {}
+            parser = JsonArrayParser(keep_members=True)
+            moved = 0
+            with self._path.open("rb") as handle:
+                for chunk in iter(lambda: handle.read(READ_CHUNK), b""):
+                    moved += self._load_records(parser.feed(chunk))
+                moved += self._load_records(parser.close())
+            if self._bodies is None and self._body_files and self._lazy_bodies and not self._read_only:
+                self._bodies = self._body_files[max(self._body_files)]
+            # The snapshot's other members: revision, changes_floor, changes.
+            payload = parser.members()
+            self._order_keys = {email_id: order_key(email) for email_id, email in self._emails.items()}
+            self._timeline = sorted(self._order_keys.values())
+            self._index_keys = {email_id: index_keys(email) for email_id, email in self._emails.items()}
+            self._indexes = ({}, {}, {})
+            for email_id, keys in self._index_keys.items():
+                for index, value in zip(self._indexes, keys):
+                    index.setdefault(value, []).append(self._order_keys[email_id])
+            for index in self._indexes:
+                for bucket in index.values():
+                    bucket.sort()
+            self._revision = int(payload.get("revision", 0))
+            self._load_changes(payload)
+            self._search = SearchIndex()
+            self._search.load(self._search_path)
+            # An index saved with this snapshot matches it; only hand-added or -removed ids differ.
+            self._search.sync(self._emails.values(), check_text=self._search.revision != self._revision)
+            self._replay(start=0)
+            if not self._lazy_bodies:
+                self._body_files = {}  # every body was read into memory
+
+        # Bodies that came as text (an older or hand-written snapshot) are now in a body
+        # file; a snapshot referencing them spares the next start from moving them again.
+        due = self._journal.records >= self._compact_every or (moved and self._bodies is not None)
+        if due and not self._read_only:
+            self.compact()
+
+    def _load_records(self, records: ParsedRecords) -> int:
+        """
+        Add snapshot records as they are parsed, moving each body that comes as text to
+        the body file right away. Returns how many did.
+        """
+        moved = 0
+        for _, raw in records:
+            email = self._from_record(raw)
+            if self._lazy_bodies and email.body_ref is None and email.body:
+                self._offload(email)
+                moved += 1
+            self._emails[email.id] = email
+        return moved
+
+    def _from_record(self, data: dict) -> Email:
+        """An email from a snapshot or journal record, whose body may be a `body_ref`."""
+        email = Email.from_dict(data)
+        ref = data.get("body_ref")
+        if ref is not None:
+            generation, offset, length = ref
+            body = self._body_file(int(generation)).ref(int(offset), int(length))
+            email.body = body if self._lazy_bodies else body.load()
+        return email
+
+    def _record(self, email: Email) -> dict:
+        """The snapshot / journal record of an email: its body as a `body_ref` when it is in a body file."""
+        ref = email.body_ref
+        if ref is None or ref.file.path is None:
+            return email.to_dict()
+        record = email.to_dict(include_body=False)
+        record["body_ref"] = [_body_generation(ref.file.path), ref.offset, ref.length]
+        return record
+
+    def _body_path(self, generation: int) -> Path:
+        return self._path.with_suffix(f".bodies.{generation}")
+
+    def _body_file(self, generation: int) -> BodyFile:
+        """The body file of a generation referenced by a record (opened once per load)."""
+        bodies = self._body_files.get(generation)
+        if bodies is None:
+            path = self._body_path(generation)
+            if not path.exists():
+                raise FileNotFoundError(f"Body file not found: {path}")
+            writable = self._lazy_bodies and not self._read_only
+            bodies = self._body_files[generation] = BodyFile(path=path, read_only=not writable)
+        return bodies
+
+    def _new_body_file(self) -> BodyFile:
+        """Start the next generation (or a private temp file when read-only) for new bodies."""
+        if self._read_only:
+            self._bodies = BodyFile(self._path.parent)
+            return self._bodies
+        on_disk = [_body_generation(path) for path in self._body_generations_on_disk()]
+        generation = max([*on_disk, *self._body_files], default=0) + 1
+        self._bodies = self._body_files[generation] = BodyFile(path=self._body_path(generation))
+        return self._bodies
+
+    def _body_generations_on_disk(self) -> List[Path]:
+        prefix = self._path.stem + ".bodies."
+        return [
+            path for path in self._path.parent.glob(prefix + "*")
+            if path.name[len(prefix):].isdigit()
+        ]
+
+    def _load_changes(self, payload: dict) -> None:
+        """Restore the change feed saved with the snapshot (a snapshot without one starts it afresh)."""
+        saved = payload.get("changes")
+        if not isinstance(saved, dict):
+            self._changes_floor = self._revision
+            self._changed = dict.fromkeys(self._emails, 0)
+            return
+        self._changes_floor = int(payload.get("changes_floor", 0))
+        # Emails added to the file by hand have no entry; they predate every tracked change.
+        self._changed = {email_id: 0 for email_id in self._emails if email_id not in saved}
+        # Ids missing from the snapshot (removed by hand) have nothing left to sync.
+        self._changed.update(
+            (email_id, int(revision)) for email_id, revision in saved.items() if email_id in self._emails
+        )
+
+    def _replay(self, start: int) -> None:
+        """Apply journal records from byte offset `start` that are newer than our state."""
+        # Records at or below the snapshot revision were compacted already
+        # (a crash between snapshot rename and journal reset leaves them behind).
+        for revision, op, data in self._journal.replay(start):
+            if revision <= self._revision:
+                continue
+            if op == "put":
+                self._set(self._from_record(data), revision)
+            self._revision = revision
+
+    def _set(self, email: Email, revision: int) -> None:
+        """
+        Insert or replace an email, moving it in the timeline / indexes only if its keys changed.
+        Everything that can fail on a malformed email (keys, tokenizing, the body write) runs
+        before the first index changes, so a failure leaves every structure as it was.
+        """
+        key = order_key(email)
+        keys = index_keys(email)
+        old = self._emails.get(email.id)
+        # Metadata-only updates keep the text (and body ref), so the body need not be read.
+        search_doc = None if old is not None and _same_text(old, email) else self._search.prepare(email)
+        self._offload(email)
+
+        old_key = self._order_keys.get(email.id)
+        if old_key != key:
+            if old_key is not None:
+                del self._timeline[bisect_left(self._timeline, old_key)]
+            insort(self._timeline, key)
+            self._order_keys[email.id] = key
+        self._reindex(email.id, old_key, key, keys)
+        if search_doc is not None:
+            self._search.commit(search_doc)
+        self._emails[email.id] = email
+        self._touch(email.id, revision)
+
+    def _offload(self, email: Email) -> None:
+        """Move the body into a body file, unless it is in one of ours already (or empty)."""
+        if not self._lazy_bodies:
+            return
+        ref = email.body_ref
+        if ref is not None and (ref.file is self._bodies or ref.file in self._body_files.values()):
+            return
+        body = email.body
+        if body:
+            email.body = (self._bodies or self._new_body_file()).append(body)
+
+    def _repack_bodies(self) -> None:
+        """
+        Copy the live bodies into a new generation, once replaced ones dominate the body
+        files. Each body is copied over through its old ref, one at a time. Caller holds `_lock`.
+        """
+        if not self._body_files:
+            return
+        live = sum(email.body_ref.length for email in self._emails.values() if email.body_ref is not None)
+        if sum(bodies.size for bodies in self._body_files.values()) <= self.BODY_FILE_SLACK * live:
+            return
+        self._body_files = {}
+        bodies = self._new_body_file()
+        for email in self._emails.values():
+            if email.body_ref is not None:
+                email.body = bodies.append(email.body)
+
+    def _drop_body_files(self, keep: Set[int]) -> None:
+        """Delete body file generations not in `keep` (none is referenced any more). Caller holds `_lock`."""
+        for path in self._body_generations_on_disk():
+            if _body_generation(path) not in keep:
+                try:
+                    path.unlink()
+                except OSError as e:
+                    print(f"WARNING: Could not delete old body file {path}. Error: {e}")
+
+    def _touch(self, email_id: str, revision: int) -> None:
+        """Move an id to the (newest) end of the change feed."""
+        self._changed.pop(email_id, None)
+        self._changed[email_id] = revision
+
+    def _reindex(self, email_id: str, old_key: Optional[OrderKey], key: OrderKey, keys: IndexKeys) -> None:
+        """Move an email's order key between index buckets."""
+        old_keys = self._index_keys.get(email_id)
+        for position, index in enumerate(self._indexes):
+            old = old_keys[position] if old_keys else None
+            new = keys[position]
+            if old == new and old_key == key:
+                continue
+            if old is not None:
+                bucket = index[old]
+                del bucket[bisect_left(bucket, old_key)]
+                if not bucket:
+                    del index[old]
+            insort(index.setdefault(new, []), key)
+        self._index_keys[email_id] = keys
+
+    def _catch_up(self) -> None:
+        """Reload if another process replaced the snapshot, else replay what it appended."""
+        if file_signature(self._path) != self._snapshot_signature:
+            self._load()
+            return
+        journal = file_signature(self._journal.path)
+        if journal is not None and journal[2] != self._journal.bytes:
+            with self._lock:
+                self._replay(start=self._journal.bytes)
+
+    @contextmanager
+    def _cross_process(self) -> Iterator[None]:
+        """Hold the cross-process lock in shared mode (no-op otherwise)."""
+        if self._file_lock is None:
+            yield
+            return
+        with self._file_lock:
+            yield
+
+    @contextmanager
+    def _synced(self) -> Iterator[None]:
+        """Cross-process lock plus catch-up, so the caller sees every worker's writes."""
+        with self._cross_process():
+            if self._file_lock is not None:
+                self._catch_up()
+            yield
+
+    def _queue(self, emails: Iterable[Email]) -> None:
+        """Apply updates in memory and queue their journal records. Caller holds `_lock`."""
+        was_idle = not self._pending
+        if was_idle:
+            self._pending_since = time.monotonic()
+        for email in emails:
+            # The revision is only taken once the email is applied (`_set` may reject it).
+            self._set(email, self._revision + 1)
+            self._revision += 1
+            self._pending.append((self._revision, "put", self._record(email)))
+        if self._flusher is not None and (was_idle or len(self._pending) >= self._flush_every):
+            # Wake the flusher to start the age timer, or to flush a full batch.
+            self._wake.notify()
+
+    def _check_writable(self) -> None:
+        if self._read_only:
+            raise ValueError(f"Inbox {self._path} was opened read-only.")
+
+    def _after_queue(self) -> None:
+        """Write-through mode flushes right away (outside `_lock`, per the lock order)."""
+        if self._flusher is None:
+            self.flush()
+
+    def flush(self) -> None:
+        """Append every queued record to the journal in one write, compacting if it grew too long."""
+        with self._cross_process(), self._io_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                bodies = self._bodies if self._fsync else None
+            if bodies is not None and batch:
+                bodies.sync()  # the records reference these bodies
+            self._journal.append(batch)
+            if self._journal.records >= self._compact_every and not self._bulk_depth:
+                self.compact()
+
+    @contextmanager
+    def bulk(self) -> Iterator[None]:
+        """
+        Skip compaction until the block ends, then compact once if due: an import of n
+        emails writes one snapshot instead of one per `compact_every` records.
+        """
+        with self._lock:
+            self._bulk_depth += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._bulk_depth -= 1
+            self.flush()
+
+    def _flush_loop(self) -> None:
+        """Background group commit: flush on queue size or age."""
+        while True:
+            with self._lock:
+                while not self._closed:
+                    if self._pending:
+                        age = time.monotonic() - self._pending_since
+                        if len(self._pending) >= self._flush_every or age >= self._flush_interval:
+                            break
+                        self._wake.wait(self._flush_interval - age)
+                    else:
+                        self._wake.wait()
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"WARNING: Inbox write-behind flush failed, will retry. Error: {e}")
+                time.sleep(self._flush_interval)
+
+    def compact(self) -> None:
+        """
+        Write a fresh snapshot atomically (temp file + fsync + rename), then reset the journal.
+        Under `_lock` only the list of emails, the change feed and the search index are
+        copied; both files are written after it, so readers are not held up by disk I/O.
+        The search index is written first, so it is never older than the snapshot, and
+        the body files are fsynced before it. Body file generations the new snapshot does
+        not reference are deleted after it. A read-only store has nothing to write.
+        """
+        if self._read_only:
+            return
+        with self._cross_process(), self._io_lock:
+            with self._lock:
+                # The snapshot covers every queued record, so they need no journal write.
+                self._repack_bodies()
+                emails = list(self._emails.values())
+                revision, changes_floor, changes = self._revision, self._changes_floor, dict(self._changed)
+                self._pending = []
+                search = self._search.snapshot(self._revision)
+                # Only a lazy store appends to (and so has to fsync) its body files.
+                body_files = list(self._body_files.values()) if self._lazy_bodies else []
+            saved = search.write(self._search_path)
+            with self._lock:
+                self._search.rebase(search, saved)
+            for bodies in body_files:
+                bodies.sync()
+            referenced: Set[int] = set()
+            tmp_path = self._path.with_suffix(".json.tmp")
+            with tmp_path.open("w", encoding="utf-8") as handle:
+                _write_snapshot(handle, revision, changes_floor, self._records(emails, referenced), changes)
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(tmp_path, self._path)
+            self._journal.reset()
+            with self._lock:
+                # Generations still open may be appended to (or referenced) by newer records.
+                self._drop_body_files(referenced | set(self._body_files))
+                self._snapshot_signature = file_signature(self._path)
+
+    def _records(self, emails: Iterable[Email], referenced: Set[int]) -> Iterator[dict]:
+        """`_record` of each email, noting the body file generations they reference."""
+        for email in emails:
+            record = self._record(email)
+            if "body_ref" in record:
+                referenced.add(record["body_ref"][0])
+            yield record
+
+    def close(self) -> None:
+        """Stop the flusher, then fold everything into the snapshot."""
+        with self._lock:
+            self._closed = True
+            self._wake.notify_all()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._synced():
+            self.compact()
+
+    # ---------------------------------------------------------
+    # QUERIES + MUTATIONS
+    # ---------------------------------------------------------
+    def get(self, email_id: str) -> Optional[Email]:
+        with self._synced():
+            return self._emails.get(email_id)
+
+    def list_all(self) -> List[Email]:
+        with self._synced():
+            with self._lock:
+                return [self._emails[email_id] for _, email_id in reversed(self._timeline)]
+
+    def page(self, limit: int, before: Optional[OrderKey] = None, after: Optional[OrderKey] = None) -> List[Email]:
+        with self._synced():
+            with self._lock:
+                timeline = self._timeline
+                if after is not None:
+                    start = bisect_right(timeline, after)
+                    keys = timeline[start:start + limit]
+                else:
+                    end = bisect_left(timeline, before) if before is not None else len(timeline)
+                    keys = timeline[max(0, end - limit):end]
+                return [self._emails[email_id] for _, email_id in reversed(keys)]
+
+    def filter(
+        self,
+        categories: Sequence[str] = (),
+        senders: Sequence[str] = (),
+        domains: Sequence[str] = (),
+        limit: Optional[int] = None,
+        before: Optional[OrderKey] = None,
+    ) -> List[Email]:
+        """
+        Intersect the filters through the indexes:
+        - The filter with the fewest emails drives: its buckets are merged newest first
+        - Each candidate is checked against the other filters with O(1) lookups
+        - Stops after `limit` matches, so a page costs ~limit * (driver size / matches)
+        """
+        wanted = (
+            {category.strip().lower() for category in categories},
+            {sender_address(sender) for sender in senders},
+            {domain.strip().lstrip("@").lower() for domain in domains},
+        )
+        with self._synced():
+            with self._lock:
+                active = [position for position, values in enumerate(wanted) if values]
+                if not active:
+                    return self.page(limit, before=before) if limit is not None else self.list_all()
+
+                def size(position: int) -> int:
+                    index = self._indexes[position]
+                    return sum(len(index.get(value, ())) for value in wanted[position])
+
+                driver = min(active, key=size)
+                checks = [(position, wanted[position]) for position in active if position != driver]
+                index_keys_by_id = self._index_keys
+                matches: List[Email] = []
+                for _, email_id in self._newest_in(driver, wanted[driver], before):
+                    keys = index_keys_by_id[email_id]
+                    if all(keys[position] in values for position, values in checks):
+                        matches.append(self._emails[email_id])
+                        if len(matches) == limit:
+                            break
+                return matches
+
+    def _newest_in(self, position: int, values: Set[str], before: Optional[OrderKey]) -> Iterator[OrderKey]:
+        """Order keys of the given buckets of one index, newest first, older than `before`. Caller holds `_lock`."""
+        index = self._indexes[position]
+        runs = []
+        for value in values:
+            bucket = index.get(value)
+            if bucket:
+                end = bisect_left(bucket, before) if before is not None else len(bucket)
+                runs.append(map(bucket.__getitem__, range(end - 1, -1, -1)))
+        if len(runs) == 1:
+            return runs[0]
+        return heapq.merge(*runs, reverse=True)
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[Email, float]]:
+        with self._synced():
+            with self._lock:
+                return [(self._emails[email_id], score) for email_id, score in self._search.search(query, limit)]
+
+    def changes(self, since: int, limit: int) -> Optional[ChangeSet]:
+        with self._synced():
+            with self._lock:
+                if not self._changes_floor <= since <= self._revision:
+                    return None
+                upserts: List[Email] = []
+                # Newest first, stopping at the first id last changed at or before `since`.
+                for email_id in reversed(self._changed):
+                    if self._changed[email_id] <= since:
+                        break
+                    if len(upserts) == limit:
+                        return None
+                    upserts.append(self._emails[email_id])
+                return self._revision, upserts
+
+    def put(self, emails: Iterable[Email]) -> None:
+        self._check_writable()
+        with self._synced():
+            with self._lock:
+                self._queue(emails)
+            self._after_queue()
+
+    def update(self, changes: Dict[str, Dict[str, object]]) -> Dict[str, Email]:
+        self._check_writable()
+        _check_fields(changes)
+        with self._synced():
+            with self._lock:
+                missing = [email_id for email_id in changes if email_id not in self._emails]
+                if missing:
+                    raise KeyError(f"Email {missing[0]} not found")
+                updated = {}
+                for email_id, fields in changes.items():
+                    # A changed copy: `compact` may be writing out the stored one right now.
+                    email = self._emails[email_id].copy()
+                    for field_name, value in fields.items():
+                        if callable(value):
+                            value = value(getattr(email, field_name))
+                        setattr(email, field_name, value)
+                    updated[email_id] = email
+                self._queue(updated.values())
+            self._after_queue()
+        return updated
+
+
+def _same_text(old: Email, new: Email) -> bool:
+    """Whether `new` has the indexed text of `old` (a body in a body file must be the same ref)."""
+    if old.subject != new.subject or old.sender != new.sender:
+        return False
+    ref = new.body_ref
+    if ref is not None:
+        return ref is old.body_ref
+    return old.body_ref is None and old.body == new.body
+
+
+def _body_generation(path: Path) -> int:
+    """Generation of a body file (`inbox.bodies.<generation>`)."""
+    return int(path.suffix[1:])
+
+
+def _write_snapshot(
+    handle, revision: int, changes_floor: int, records: Iterable[dict], changes: Dict[str, int]
+) -> None:
+    """
+    Write a JSON snapshot one email record (and one change feed entry) per line, so only
+    one record is ever serialized at a time. The change feed follows the emails, which
+    keeps what precedes the "emails" array small for JsonArrayParser.
+    """
+    handle.write(f'{{"revision": {revision}, "changes_floor": {changes_floor}, "emails": [')
+    separator = "\n  "
+    for record in records:
+        handle.write(separator)
+        handle.write(json.dumps(record))
+        separator = ",\n  "
+    handle.write('\n],\n"changes": {')
+    separator = "\n  "
+    for email_id, email_revision in changes.items():
+        handle.write(f"{separator}{json.dumps(email_id)}: {email_revision}")
+        separator = ",\n  "
+    handle.write("\n}}\n")
+
+
+# ---------------------------------------------------------
+#   SQLITE
+# ---------------------------------------------------------
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS emails (
+    id              TEXT PRIMARY KEY,
+    sender          TEXT NOT NULL,
+    subject         TEXT NOT NULL,
+    timestamp       TEXT NOT NULL,
+    sort_ts         TEXT NOT NULL,
+    body            TEXT NOT NULL,
+    category        TEXT NOT NULL,
+    category_source TEXT NOT NULL DEFAULT '',
+    action_items    TEXT NOT NULL DEFAULT '[]',
+    drafts          TEXT NOT NULL DEFAULT '[]',
+    summary         TEXT NOT NULL DEFAULT '',
+    revision        INTEGER NOT NULL DEFAULT 0,
+    sender_address  TEXT NOT NULL,
+    sender_domain   TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_emails_timeline ON emails (sort_ts, id);
+CREATE INDEX IF NOT EXISTS idx_emails_category_key ON emails (lower(trim(category)), sort_ts, id);
+CREATE INDEX IF NOT EXISTS idx_emails_sender_address ON emails (sender_address, sort_ts, id);
+CREATE INDEX IF NOT EXISTS idx_emails_sender_domain ON emails (sender_domain, sort_ts, id);
+CREATE INDEX IF NOT EXISTS idx_emails_revision ON emails (revision);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Full-text index over the emails table (external content: the text is not stored
+# twice). Triggers keep it in sync; REPLACE fires the delete trigger because the
+# connection enables recursive_triggers.
+_SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5(
+    subject, sender, body, content='emails', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS emails_fts_insert AFTER INSERT ON emails BEGIN
+    INSERT INTO emails_fts (rowid, subject, sender, body) VALUES (new.rowid, new.subject, new.sender, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS emails_fts_delete AFTER DELETE ON emails BEGIN
+    INSERT INTO emails_fts (emails_fts, rowid, subject, sender, body)
+    VALUES ('delete', old.rowid, old.subject, old.sender, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS emails_fts_update AFTER UPDATE OF subject, sender, body ON emails BEGIN
+    INSERT INTO emails_fts (emails_fts, rowid, subject, sender, body)
+    VALUES ('delete', old.rowid, old.subject, old.sender, old.body);
+    INSERT INTO emails_fts (rowid, subject, sender, body) VALUES (new.rowid, new.subject, new.sender, new.body);
+END;
+"""
+
+# bm25() column weights for subject, sender, body (same as the JSON store's index).
+_FTS_WEIGHTS = "2.0, 1.0, 1.0"
+
+_COLUMNS = (
+    "id", "sender", "subject", "timestamp", "sort_ts", "body", "category", "category_source",
+    "action_items", "drafts", "summary", "revision", "sender_address", "sender_domain",
+)
+_JSON_COLUMNS = {"action_items", "drafts"}
+
+
+class SqliteInboxStore(InboxStore):
+    """
+    One row per email with indexes on timestamp, category, sender address and domain:
+    - Reads are indexed queries; nothing is held in memory
+    - Each put/update runs in a single transaction and bumps the store revision;
+      every row records the revision that last wrote it, which serves `changes`
+    - WAL mode + write transactions make it safe to share between worker processes
+    """
+
+    name = "sqlite"
+
+    # Seconds a writer waits for another process's transaction before giving up.
+    BUSY_TIMEOUT = 30.0
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(path), timeout=self.BUSY_TIMEOUT, check_same_thread=False, isolation_level=None
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA recursive_triggers=ON")
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript(_SCHEMA)
+            self._create_search_index()
+
+    def _create_search_index(self) -> None:
+        """Create the full-text index, filling it from existing rows the first time."""
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'emails_fts'"
+        ).fetchone()
+        self._conn.executescript(_SEARCH_SCHEMA)
+        if not exists:
+            # Rebuilding re-reads the emails table, so a concurrent first start is harmless.
+            self._conn.execute("INSERT INTO emails_fts (emails_fts) VALUES ('rebuild')")
+
+    @property
+    def revision(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+        return int(row["value"]) if row else 0
+
+    # ---------------------------------------------------------
+    # ROW MAPPING
+    # ---------------------------------------------------------
+    @staticmethod
+    def _to_row(email: Email, revision: int) -> tuple:
+        data = email.to_dict()
+        return (
+            email.id, email.sender, email.subject, data["timestamp"],
+            order_key(email)[0], email.body, email.category, email.category_source,
+            json.dumps(email.action_items), json.dumps(email.drafts), email.summary, revision,
+            sender_address(email.sender), sender_domain(email.sender),
+        )
+
+    @staticmethod
+    def _from_row(row: sqlite3.Row) -> Email:
+        data = dict(row)
+        for column in _JSON_COLUMNS:
+            data[column] = json.loads(data[column])
+        return Email.from_dict(data)
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Email]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    # ---------------------------------------------------------
+    # QUERIES
+    # ---------------------------------------------------------
+    def get(self, email_id: str) -> Optional[Email]:
+        emails = self._query("SELECT * FROM emails WHERE id = ?", (email_id,))
+        return emails[0] if emails else None
+
+    def list_all(self) -> List[Email]:
+        return self._query("SELECT * FROM emails ORDER BY sort_ts DESC, id DESC")
+
+    def filter(
+        self,
+        categories: Sequence[str] = (),
+        senders: Sequence[str] = (),
+        domains: Sequence[str] = (),
+        limit: Optional[int] = None,
+        before: Optional[OrderKey] = None,
+    ) -> List[Email]:
+        clauses: List[str] = []
+        params: List[object] = []
+        for column, values in (
+            ("lower(trim(category))", [category.strip().lower() for category in categories]),
+            ("sender_address", [sender_address(sender) for sender in senders]),
+            ("sender_domain", [domain.strip().lstrip("@").lower() for domain in domains]),
+        ):
+            if values:
+                clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+                params += values
+        if before is not None:
+            clauses.append("(sort_ts, id) < (?, ?)")
+            params += before
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        sql = f"SELECT * FROM emails {where}ORDER BY sort_ts DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self._query(sql, tuple(params))
+
+    def page(self, limit: int, before: Optional[OrderKey] = None, after: Optional[OrderKey] = None) -> List[Email]:
+        if after is not None:
+            emails = self._query(
+                "SELECT * FROM emails WHERE (sort_ts, id) > (?, ?) ORDER BY sort_ts, id LIMIT ?",
+                (*after, limit),
+            )
+            return emails[::-1]
+        if before is not None:
+            return self._query(
+                "SELECT * FROM emails WHERE (sort_ts, id) < (?, ?) ORDER BY sort_ts DESC, id DESC LIMIT ?",
+                (*before, limit),
+            )
+        return self._query("SELECT * FROM emails ORDER BY sort_ts DESC, id DESC LIMIT ?", (limit,))
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[Email, float]]:
+        match = _fts_query(query)
+        if not match:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT emails.*, bm25(emails_fts, {_FTS_WEIGHTS}) AS score FROM emails_fts "
+                "JOIN emails ON emails.rowid = emails_fts.rowid "
+                "WHERE emails_fts MATCH ? ORDER BY score LIMIT ?",
+                (match, limit),
+            ).fetchall()
+        # bm25() is negated so that lower is better; report it like the JSON store.
+        return [(self._from_row(row), -row["score"]) for row in rows]
+
+    def changes(self, since: int, limit: int) -> Optional[ChangeSet]:
+        # Rows are never deleted, so the row revisions cover the whole history.
+        with self._lock:
+            # One read transaction: the revision and the rows come from the same snapshot.
+            self._conn.execute("BEGIN")
+            try:
+                row = self._conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+                revision = int(row["value"]) if row else 0
+                rows = self._conn.execute(
+                    "SELECT * FROM emails WHERE revision > ? ORDER BY revision DESC LIMIT ?",
+                    (since, limit + 1),
+                ).fetchall()
+            finally:
+                self._conn.execute("COMMIT")
+        if since > revision or len(rows) > limit:
+            return None
+        return revision, [self._from_row(row) for row in rows]
+
+    # ---------------------------------------------------------
+    # MUTATIONS
+    # ---------------------------------------------------------
+    def _next_revision(self, count: int) -> int:
+        """Reserve `count` revisions inside the current transaction; return the first."""
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+        current = int(row["value"]) if row else 0
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('revision', ?)", (str(current + count),)
+        )
+        return current + 1
+
+    def put(self, emails: Iterable[Email]) -> None:
+        emails = list(emails)
+        if not emails:
+            return
+        placeholders = ", ".join("?" for _ in _COLUMNS)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                first = self._next_revision(len(emails))
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO emails ({', '.join(_COLUMNS)}) VALUES ({placeholders})",
+                    [self._to_row(email, first + i) for i, email in enumerate(emails)],
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def update(self, changes: Dict[str, Dict[str, object]]) -> Dict[str, Email]:
+        _check_fields(changes)
+        if not changes:
+            return {}
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                revision = self._next_revision(len(changes))
+                for email_id, fields in changes.items():
+                    fields = self._resolve_callables(email_id, fields)
+                    assignments = [f"{name} = ?" for name in fields] + ["revision = ?"]
+                    values = [
+                        json.dumps(value) if name in _JSON_COLUMNS else value
+                        for name, value in fields.items()
+                    ]
+                    cursor = self._conn.execute(
+                        f"UPDATE emails SET {', '.join(assignments)} WHERE id = ?",
+                        (*values, revision, email_id),
+                    )
+                    if cursor.rowcount == 0:
+                        raise KeyError(f"Email {email_id} not found")
+                    revision += 1
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+        ids = list(changes)
+        marks = ", ".join("?" for _ in ids)
+        return {email.id: email for email in self._query(f"SELECT * FROM emails WHERE id IN ({marks})", tuple(ids))}
+
+    def _resolve_callables(self, email_id: str, fields: Dict[str, object]) -> Dict[str, object]:
+        """Apply callable values to the row's current values (inside the write transaction)."""
+        if not any(callable(value) for value in fields.values()):
+            return fields
+        row = self._conn.execute("SELECT * FROM emails WHERE id = ?", (email_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"Email {email_id} not found")
+        current = self._from_row(row)
+        return {
+            name: value(getattr(current, name)) if callable(value) else value
+            for name, value in fields.items()
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _fts_query(query: str) -> str:
+    """Translate the search syntax into an FTS5 MATCH expression of quoted tokens."""
+    return " ".join(
+        f'"{" ".join(part.tokens)}"' + ("*" if part.prefix else "")
+        for part in parse_query(query)
+    )
+
+
+# ---------------------------------------------------------
+#   FACTORY
+# ---------------------------------------------------------
+def open_inbox_store(path: Path, **options) -> InboxStore:
+    """Open a store by file type: `.db` / `.sqlite` is SQLite, anything else JSON."""
+    if path.suffix in (".db", ".sqlite", ".sqlite3"):
+        return SqliteInboxStore(path)
+    return JsonInboxStore(path, **options)
+
+
+def create_inbox_store(data_dir: Path, backend: Optional[str] = None) -> InboxStore:
+    """Build the store selected by INBOX_BACKEND (json|sqlite) from environment settings."""
+    backend = (backend or os.getenv("INBOX_BACKEND", "json")).lower()
+    if backend == "sqlite":
+        return SqliteInboxStore(Path(os.getenv("INBOX_DB_PATH", str(data_dir / "inbox.db"))))
+    if backend == "json":
+        return JsonInboxStore(
+            data_dir / "inbox.json",
+            compact_every=int(os.getenv("INBOX_COMPACT_EVERY", "1000")),
+            fsync=os.getenv("INBOX_JOURNAL_FSYNC", "0") == "1",
+            write_behind=os.getenv("INBOX_WRITE_BEHIND", "0") == "1",
+            shared=os.getenv("SHARED_STATE", "0") == "1",
+            flush_every=int(os.getenv("INBOX_FLUSH_EVERY", "256")),
+            flush_interval=float(os.getenv("INBOX_FLUSH_INTERVAL", "1.0")),
+            lazy_bodies=os.getenv("INBOX_LAZY_BODIES", "1") == "1",
+        )
+    raise ValueError(f"Unknown INBOX_BACKEND '{backend}'. Use 'json' or 'sqlite'.")
+
+
+def migrate_json_to_sqlite(json_path: Path, db_path: Path) -> int:
+    """Import an inbox.json snapshot (plus its journal) into a SQLite store; returns the count."""
+    # Read-only: migrating must leave the source files exactly as they were.
+    source = JsonInboxStore(json_path, read_only=True, lazy_bodies=False)
+    try:
+        target = SqliteInboxStore(db_path)
+        try:
+            emails = source.list_all()
+            target.put(emails)
+            return len(emails)
+        finally:
+            target.close()
+    finally:
+        source.close()
+
+
+# ---------------------------------------------------------
+#   CLI: python -m backend.services.inbox_store migrate [inbox.json] [inbox.db]
+# ---------------------------------------------------------
+if __name__ == "__main__":
+    base_dir = Path(__file__).resolve().parent.parent.parent
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print("Usage: python -m backend.services.inbox_store migrate [inbox.json] [inbox.db]")
+        sys.exit(2)
+    json_path = Path(sys.argv[2]) if len(sys.argv) > 2 else base_dir / "data" / "inbox.json"
+    db_path = Path(sys.argv[3]) if len(sys.argv) > 3 else base_dir / "data" / "inbox.db"
+    count = migrate_json_to_sqlite(json_path, db_path)
+    print(f"Imported {count} emails from {json_path} into {db_path}")
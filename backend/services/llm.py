@@ -1,81 +1,198 @@
 from __future__ import annotations
+import asyncio
 import os
 import json
-from typing import Dict, Any, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Iterator, Optional, Union
 
-import google.generativeai as genai
 from dotenv import load_dotenv
 
+from backend.services.llm_cache import LLMResponseCache
+from backend.services.llm_metrics import LLMMetrics
+from backend.services.llm_providers import LLMProvider, create_provider
+from backend.services.prompt_template import CompiledTemplate, compile_template
+from backend.services.rate_limiter import AdaptiveRateLimiter
+
 # Load .env file from project root
 load_dotenv()
 
-# Read Google API key
-API_KEY = os.getenv("Email_key")
-if not API_KEY:
-    raise ValueError(
-        "Gemini API key not found. Make sure your `.env` file contains:\n\n"
-        "Email_key=YOUR_KEY_HERE\n"
-    )
+# Response cache: LLM_CACHE_SIZE=0 disables the memory tier,
+# LLM_CACHE_DIR enables the on-disk tier.
+_cache_dir = os.getenv("LLM_CACHE_DIR")
+_cache = LLMResponseCache(
+    max_entries=int(os.getenv("LLM_CACHE_SIZE", "512")),
+    disk_dir=Path(_cache_dir) if _cache_dir else None,
+)
+
+LLM_ERROR_PREFIX = "LLM error:"
+
+
+class LLMError(RuntimeError):
+    """Raised when the provider still fails after the limiter's retries."""
+
+    def __init__(self, detail: str) -> None:
+        super().__init__(f"{LLM_ERROR_PREFIX} {detail}")
+
+
+# Shared token bucket / concurrency cap / retry policy for every provider call.
+_limiter = AdaptiveRateLimiter.from_env()
+
+# Bounded worker pool so blocking Gemini calls never run on the event loop.
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("LLM_MAX_WORKERS", "8")),
+    thread_name_prefix="llm",
+)
+
+
+# Per-intent latency / token / error counters (served on /api/metrics).
+_metrics = LLMMetrics()
+
+
+# Active backend (LLM_PROVIDER=gemini|stub), created on first use so the
+# app can be imported without a Gemini key.
+_provider: Optional[LLMProvider] = None
+
+
+def get_provider() -> LLMProvider:
+    """Return the active LLM provider, creating it from the environment if needed."""
+    global _provider
+    if _provider is None:
+        _provider = create_provider()
+    return _provider
+
+
+def set_provider(provider: LLMProvider) -> None:
+    """Swap the LLM backend at runtime (tests, benchmarks, provider migrations)."""
+    global _provider
+    _provider = provider
+
+
+def get_cache_stats() -> Dict[str, int]:
+    """Expose response cache hit/miss counters."""
+    return _cache.stats()
+
 
-# Configure Gemini client
-genai.configure(api_key=API_KEY)  # type: ignore
+def get_limiter_stats() -> Dict[str, float]:
+    """Expose rate limiter queue-wait, retry and throttle counters."""
+    return _limiter.stats()
 
-# Default LLM model
-MODEL_NAME = "models/gemini-2.5-flash"
 
+def get_metrics() -> LLMMetrics:
+    """Expose per-intent LLM latency, token, error and fallback metrics."""
+    return _metrics
 
 
 # ---------------------------------------------------------
 #  HIGH-LEVEL LLM FUNCTION
 # ---------------------------------------------------------
-def _run_llm(system_prompt: str, user_prompt: str) -> str:
+def _run_llm(system_prompt: str, user_prompt: str, intent: str = "generic") -> str:
     """
-    Core wrapper that sends structured instructions to Gemini.
-    Returns clean text, with safe fallback on API failure.
+    Core wrapper that sends structured instructions to the active provider.
+    Calls go through the shared rate limiter (with retries); successful
+    completions are cached by (intent, prompts, model).
+    Raises LLMError if the provider keeps failing.
     """
 
+    provider = get_provider()
+    cache_key = LLMResponseCache.make_key(intent, system_prompt, user_prompt, provider.model_name)
+    cached = _cache.get(cache_key)
+    if cached is not None:
+        _metrics.observe_cache_hit(intent)
+        return cached
+
+    started = time.monotonic()
     try:
-        model = genai.GenerativeModel(MODEL_NAME)  # type: ignore
+        result = _limiter.call(lambda: provider.generate(system_prompt, user_prompt, intent))
+    except Exception as e:
+        _metrics.observe_error(intent, time.monotonic() - started)
+        raise LLMError(str(e)) from e
+
+    _metrics.observe_call(intent, time.monotonic() - started, system_prompt + user_prompt, result)
+    _cache.put(cache_key, result)
+    return result
 
-        # Gemini does NOT use role/content dicts.
-        # We just send a single combined text prompt.
-        full_prompt = f"{system_prompt.strip()}\n\nUSER INPUT:\n{user_prompt.strip()}"
 
-        # You can pass a plain string directly:
-        response = model.generate_content(full_prompt)
+def _run_llm_stream(system_prompt: str, user_prompt: str, intent: str = "generic") -> Iterator[str]:
+    """
+    Streaming counterpart of `_run_llm`.
+    Yields text chunks as the provider produces them; a cache hit is yielded
+    as a single chunk and a completed stream is written back to the cache.
+    Only opening the stream (up to the first chunk) is retried; the limiter's concurrency
+    slot is held until the stream is exhausted, fails or is closed by the consumer.
+    """
 
-        if response and getattr(response, "text", None):
-            return response.text.strip()
+    provider = get_provider()
+    cache_key = LLMResponseCache.make_key(intent, system_prompt, user_prompt, provider.model_name)
+    cached = _cache.get(cache_key)
+    if cached is not None:
+        _metrics.observe_cache_hit(intent)
+        yield cached
+        return
 
-        return "LLM error: empty response."
+    def open_stream():
+        chunks = iter(provider.stream(system_prompt, user_prompt, intent))
+        return next(chunks, None), chunks
 
+    started = time.monotonic()
+    try:
+        (first, chunks), release = _limiter.call_held(open_stream)
     except Exception as e:
-        return f"LLM error: {str(e)}"
+        _metrics.observe_error(intent, time.monotonic() - started)
+        raise LLMError(str(e)) from e
+
+    try:
+        if not first or not first.strip():
+            _metrics.observe_error(intent, time.monotonic() - started)
+            raise LLMError("empty response.")
+
+        parts = [first.lstrip()]
+        yield parts[0]
+        try:
+            for text in chunks:
+                parts.append(text)
+                yield text
+        except Exception as e:
+            _metrics.observe_error(intent, time.monotonic() - started)
+            raise LLMError(str(e)) from e
+    finally:
+        release()
+
+    result = "".join(parts).strip()
+    _metrics.observe_call(intent, time.monotonic() - started, system_prompt + user_prompt, result)
+    _cache.put(cache_key, result)
 
 
 # ---------------------------------------------------------
 #  PUBLIC FUNCTION CALLED BY YOUR SERVICES
 # ---------------------------------------------------------
-def generate_llm_output(prompt_template: str, context: Dict[str, object]) -> str:
+def generate_llm_output(prompt_template: Union[str, CompiledTemplate], context: Dict[str, object]) -> str:
     """
     Main bridge for services:
-    - Fills template with email/user data
+    - Fills the (precompiled) template with email/user data
     - Selects LLM mode via `_intent`
     - Executes with safety fallbacks
     """
 
     intent = context.get("_intent", "generic")
 
-    # Safely inject template variables
-    final_prompt = prompt_template.format_map(_SafeDict(context))
+    # Inject template variables (missing ones render empty)
+    final_prompt = _render(prompt_template, context)
 
     # Dispatch based on intent
     if intent == "categorize":
         return _categorize(final_prompt)
 
+    elif intent == "categorize_batch":
+        return _categorize_batch(final_prompt)
+
     elif intent == "actions":
         return _extract_actions(final_prompt)
 
+    elif intent == "triage":
+        return _triage(final_prompt)
+
     elif intent == "draft":
         return _generate_draft(final_prompt)
 
@@ -86,7 +203,32 @@ def generate_llm_output(prompt_template: str, context: Dict[str, object]) -> str
         return _agent_chat(final_prompt)
 
     # fallback generic LLM call
-    return _run_llm("You are a helpful assistant.", final_prompt)
+    return _run_llm(_GENERIC_SYSTEM_PROMPT, final_prompt, str(intent))
+
+
+async def agenerate_llm_output(prompt_template: Union[str, CompiledTemplate], context: Dict[str, object]) -> str:
+    """
+    Async variant of `generate_llm_output` for the FastAPI routes.
+    Runs the blocking call on the bounded LLM worker pool so the event
+    loop stays free while Gemini is working.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, generate_llm_output, prompt_template, context)
+
+
+def stream_llm_output(prompt_template: Union[str, CompiledTemplate], context: Dict[str, object]) -> Iterator[str]:
+    """
+    Streaming bridge for free-text intents (draft, custom_draft, agent).
+    Structured intents need the full output for post-processing and
+    cannot be streamed.
+    """
+    intent = str(context.get("_intent", "generic"))
+    if intent in ("categorize", "categorize_batch", "actions", "triage"):
+        raise ValueError(f"Intent '{intent}' does not support streaming.")
+
+    final_prompt = _render(prompt_template, context)
+    system_prompt = _SYSTEM_PROMPTS.get(intent, _GENERIC_SYSTEM_PROMPT)
+    return _run_llm_stream(system_prompt, final_prompt, intent)
 
 
 # ---------------------------------------------------------
@@ -96,6 +238,8 @@ def generate_llm_output(prompt_template: str, context: Dict[str, object]) -> str
 def _categorize(prompt: str) -> str:
     """
     Categorization handler — expects a single category word as output.
+    Returns the first allowed category named in the output, else the normalized output
+    itself ("" if empty); callers decide what an unmatched answer is saved as.
     """
     system_prompt = (
         "You are an email categorization AI. "
@@ -104,7 +248,7 @@ def _categorize(prompt: str) -> str:
         "Valid categories: important, newsletter, spam, to-do, meeting, follow-up, personal, other."
     )
 
-    result = _run_llm(system_prompt, prompt)
+    result = _run_llm(system_prompt, prompt, "categorize")
 
     # Normalize
     result = result.lower().strip()
@@ -119,7 +263,36 @@ def _categorize(prompt: str) -> str:
         if cat in result:
             return cat.replace(" ", "-")
 
-    return "other"  # safe fallback
+    _metrics.observe_fallback("categorize", "unknown_category")
+    return result
+
+
+def _categorize_batch(prompt: str) -> str:
+    """
+    Batch categorization handler — expects a JSON object of email id -> category.
+    Returns a JSON string ("{}" if the output cannot be parsed).
+    """
+    system_prompt = (
+        "You are an email categorization AI. You will receive several emails, each "
+        "introduced by an 'Email id:' line. "
+        "Respond ONLY with a JSON object mapping each email id to a single category word. "
+        "Valid categories: important, newsletter, spam, to-do, meeting, follow-up, personal, other."
+    )
+
+    raw = _run_llm(system_prompt, prompt, "categorize_batch")
+
+    # Clean off markdown fences (```json) and whitespace
+    cleaned = raw.strip("` \n")
+    if cleaned.startswith("json"):
+        cleaned = cleaned[len("json"):].strip()
+
+    try:
+        if isinstance(json.loads(cleaned), dict):
+            return cleaned
+    except Exception:
+        pass
+    _metrics.observe_fallback("categorize_batch", "json_parse")
+    return "{}"
 
 
 def _extract_actions(prompt: str) -> str:
@@ -134,7 +307,7 @@ def _extract_actions(prompt: str) -> str:
         "If no tasks found, return an empty list []."
     )
 
-    raw = _run_llm(system_prompt, prompt)
+    raw = _run_llm(system_prompt, prompt, "actions")
 
     # Clean off markdown fences (```json) and whitespace
     cleaned = raw.strip("` \n")
@@ -148,49 +321,94 @@ def _extract_actions(prompt: str) -> str:
     except Exception:
         # If parsing fails, return an empty JSON list as a robust fallback.
         # This prevents the raw, unformatted text from being passed to ActionItemService.
+        _metrics.observe_fallback("actions", "json_parse")
         return "[]"
 
 
-def _generate_draft(prompt: str) -> str:
+def _triage(prompt: str) -> str:
     """
-    Generate a reply draft using user's auto-reply prompt.
+    Combined triage handler — category, action items and summary in one call.
+    Returns a JSON object string ("{}" if the output cannot be parsed).
     """
     system_prompt = (
-        "You are an AI email assistant. Generate a natural, polite, well-structured reply. "
-        "Include:\n- Subject line\n- Body\n- Signature\n"
-        "Do NOT send the email, only draft it."
+        "You triage emails. Respond ONLY with a JSON object with keys "
+        "\"category\" (one of: important, newsletter, spam, to-do, meeting, follow-up, personal, other), "
+        "\"action_items\" (a list of {\"task\": \"...\", \"deadline\": \"...\"} objects, [] if none) and "
+        "\"summary\" (one or two sentences). No markdown, no explanation."
     )
 
-    return _run_llm(system_prompt, prompt)
+    raw = _run_llm(system_prompt, prompt, "triage")
+
+    # Clean off markdown fences (```json) and whitespace
+    cleaned = raw.strip("` \n")
+    if cleaned.startswith("json"):
+        cleaned = cleaned[len("json"):].strip()
+
+    try:
+        if isinstance(json.loads(cleaned), dict):
+            return cleaned
+    except Exception:
+        pass
+    _metrics.observe_fallback("triage", "json_parse")
+    return "{}"
+
+
+def _generate_draft(prompt: str) -> str:
+    """
+    Generate a reply draft using user's auto-reply prompt.
+    """
+    return _run_llm(_DRAFT_SYSTEM_PROMPT, prompt, "draft")
 
 
 def _generate_custom_draft(prompt: str) -> str:
     """
     Handle user-specified instructions for drafts.
     """
-    system_prompt = "You draft emails based on custom user instructions. Provide ONLY the draft content."
-
-    return _run_llm(system_prompt, prompt)
+    return _run_llm(_CUSTOM_DRAFT_SYSTEM_PROMPT, prompt, "custom_draft")
 
 
 def _agent_chat(prompt: str) -> str:
     """
     Phase 2: Email agent chatbot.
     """
-    system_prompt = (
-        "You are an Email Agent that can: summarize emails, show urgent tasks, "
-        "find follow-ups, and explain inbox state. "
-        "Always answer clearly, concisely, and based on the given context."
-    )
+    return _run_llm(_AGENT_SYSTEM_PROMPT, prompt, "agent")
+
+
+# ---------------------------------------------------------
+#   FREE-TEXT SYSTEM PROMPTS (shared by blocking + streaming paths)
+# ---------------------------------------------------------
+
+_GENERIC_SYSTEM_PROMPT = "You are a helpful assistant."
+
+_DRAFT_SYSTEM_PROMPT = (
+    "You are an AI email assistant. Generate a natural, polite, well-structured reply. "
+    "Include:\n- Subject line\n- Body\n- Signature\n"
+    "Do NOT send the email, only draft it."
+)
+
+_CUSTOM_DRAFT_SYSTEM_PROMPT = (
+    "You draft emails based on custom user instructions. Provide ONLY the draft content."
+)
+
+_AGENT_SYSTEM_PROMPT = (
+    "You are an Email Agent that can: summarize emails, show urgent tasks, "
+    "find follow-ups, and explain inbox state. "
+    "Always answer clearly, concisely, and based on the given context."
+)
 
-    return _run_llm(system_prompt, prompt)
+_SYSTEM_PROMPTS = {
+    "draft": _DRAFT_SYSTEM_PROMPT,
+    "custom_draft": _CUSTOM_DRAFT_SYSTEM_PROMPT,
+    "agent": _AGENT_SYSTEM_PROMPT,
+}
 
 
 # ---------------------------------------------------------
-#   SAFE TEMPLATE DICT
+#   TEMPLATE RENDERING
 # ---------------------------------------------------------
 
-class _SafeDict(dict):
-    """Dict that avoids KeyError during template formatting."""
-    def __missing__(self, key: str) -> str:
-        return "{" + key + "}"
+def _render(prompt_template: Union[str, CompiledTemplate], context: Dict[str, object]) -> str:
+    """Render a compiled template; raw strings are compiled once and memoized."""
+    if isinstance(prompt_template, str):
+        prompt_template = compile_template(prompt_template)
+    return prompt_template.render(context)
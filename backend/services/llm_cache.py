@@ -0,0 +1,133 @@
+"""Content-addressed response cache for LLM calls."""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache for LLM completions:
+    - An in-memory LRU keyed by a content hash of the request
+    - An optional on-disk tier (one JSON file per entry) that survives restarts
+    """
+
+    def __init__(self, max_entries: int = 512, disk_dir: Optional[Path] = None) -> None:
+        self._max_entries = max_entries
+        self._disk_dir = disk_dir
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+        if self._disk_dir is not None:
+            self._disk_dir.mkdir(parents=True, exist_ok=True)
+
+    # ---------------------------------------------------------
+    # KEYING
+    # ---------------------------------------------------------
+    @staticmethod
+    def make_key(intent: str, system_prompt: str, user_prompt: str, model_name: str) -> str:
+        """Hash every input that can change the completion into a stable key."""
+        payload = json.dumps(
+            [intent, system_prompt, user_prompt, model_name],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # ---------------------------------------------------------
+    # LOOKUP + STORE
+    # ---------------------------------------------------------
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached completion, promoting disk entries into memory."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return self._entries[key]
+
+        value = self._read_disk(key)
+
+        with self._lock:
+            if value is None:
+                self._misses += 1
+                return None
+            self._disk_hits += 1
+            self._remember(key, value)
+            return value
+
+    def put(self, key: str, value: str) -> None:
+        """Store a completion in memory and, when enabled, on disk."""
+        with self._lock:
+            self._remember(key, value)
+        self._write_disk(key, value)
+
+    def clear(self) -> None:
+        """Drop all in-memory entries and reset counters (disk tier is kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._disk_hits = self._misses = self._evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters for monitoring."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self._max_entries,
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+    # ---------------------------------------------------------
+    # INTERNALS
+    # ---------------------------------------------------------
+    def _remember(self, key: str, value: str) -> None:
+        """Insert into the LRU and evict the oldest entries (lock held)."""
+        if self._max_entries <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def _disk_path(self, key: str) -> Path:
+        assert self._disk_dir is not None
+        return self._disk_dir / key[:2] / f"{key}.json"
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        if self._disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))["value"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, key: str, value: str) -> None:
+        if self._disk_dir is None:
+            return
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # A unique temp file per write: threads and workers may store the same key at once.
+            fd, tmp_name = tempfile.mkstemp(prefix=f"{key}.", suffix=".tmp", dir=path.parent)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                    json.dump({"value": value}, handle)
+                os.replace(tmp_name, path)
+            except BaseException:
+                Path(tmp_name).unlink(missing_ok=True)
+                raise
+        except OSError as e:
+            print(f"WARNING: Could not write LLM cache entry {key}. Error: {e}")
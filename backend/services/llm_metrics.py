@@ -0,0 +1,167 @@
+"""Per-intent LLM instrumentation, exported in Prometheus text format."""
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+# Latency histogram bucket upper bounds, in seconds.
+LATENCY_BUCKETS: Tuple[float, ...] = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), same heuristic as batch planning."""
+    return (len(text) + 3) // 4
+
+
+class _Histogram:
+    """Cumulative-bucket histogram matching Prometheus semantics."""
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+class LLMMetrics:
+    """
+    Thread-safe counters keyed by intent:
+    - Provider latency histogram (including limiter queueing and retries)
+    - Estimated input/output tokens per completed call
+    - Cache hits, errors (LLMError raised) and safe-fallback outputs by reason
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._latency: Dict[str, _Histogram] = defaultdict(_Histogram)
+        self._input_tokens: Dict[str, int] = defaultdict(int)
+        self._output_tokens: Dict[str, int] = defaultdict(int)
+        self._calls: Dict[str, int] = defaultdict(int)
+        self._cache_hits: Dict[str, int] = defaultdict(int)
+        self._errors: Dict[str, int] = defaultdict(int)
+        self._fallbacks: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    # ---------------------------------------------------------
+    # RECORDING
+    # ---------------------------------------------------------
+    def observe_call(self, intent: str, seconds: float, prompt: str, output: str) -> None:
+        """Record a completed provider call."""
+        with self._lock:
+            self._latency[intent].observe(seconds)
+            self._calls[intent] += 1
+            self._input_tokens[intent] += estimate_tokens(prompt)
+            self._output_tokens[intent] += estimate_tokens(output)
+
+    def observe_cache_hit(self, intent: str) -> None:
+        with self._lock:
+            self._cache_hits[intent] += 1
+
+    def observe_error(self, intent: str, seconds: float) -> None:
+        """Record a call that raised LLMError (latency still counts)."""
+        with self._lock:
+            self._latency[intent].observe(seconds)
+            self._errors[intent] += 1
+
+    def observe_fallback(self, intent: str, reason: str) -> None:
+        """Record output that was replaced by a safe default (e.g. reason="json_parse")."""
+        with self._lock:
+            self._fallbacks[(intent, reason)] += 1
+
+    # ---------------------------------------------------------
+    # EXPORT
+    # ---------------------------------------------------------
+    def snapshot(self) -> Dict[str, object]:
+        """Plain-dict view of the counters, keyed by intent."""
+        with self._lock:
+            return {
+                "calls": dict(self._calls),
+                "cache_hits": dict(self._cache_hits),
+                "errors": dict(self._errors),
+                "fallbacks": {f"{intent}:{reason}": n for (intent, reason), n in self._fallbacks.items()},
+                "input_tokens": dict(self._input_tokens),
+                "output_tokens": dict(self._output_tokens),
+                "latency_seconds_sum": {intent: h.total for intent, h in self._latency.items()},
+            }
+
+    def render_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            lines += _header("llm_request_duration_seconds", "histogram",
+                             "LLM provider call latency per intent, including queueing and retries.")
+            for intent, hist in sorted(self._latency.items()):
+                for bound, count in zip(LATENCY_BUCKETS, hist.counts):
+                    lines.append(_sample("llm_request_duration_seconds_bucket", count, intent=intent, le=_fmt(bound)))
+                lines.append(_sample("llm_request_duration_seconds_bucket", hist.count, intent=intent, le="+Inf"))
+                lines.append(_sample("llm_request_duration_seconds_sum", hist.total, intent=intent))
+                lines.append(_sample("llm_request_duration_seconds_count", hist.count, intent=intent))
+
+            for name, kind, help_text, values in (
+                ("llm_calls_total", "counter", "Completed LLM provider calls.", self._calls),
+                ("llm_cache_hits_total", "counter", "Calls answered from the response cache.", self._cache_hits),
+                ("llm_errors_total", "counter", "Calls that failed after retries (LLM error).", self._errors),
+                ("llm_input_tokens_total", "counter", "Estimated prompt tokens sent (chars/4).", self._input_tokens),
+                ("llm_output_tokens_total", "counter", "Estimated completion tokens received (chars/4).", self._output_tokens),
+            ):
+                lines += _header(name, kind, help_text)
+                lines += [_sample(name, n, intent=intent) for intent, n in sorted(values.items())]
+
+            lines += _header("llm_fallbacks_total", "counter",
+                             "Outputs replaced by a safe default, by reason (json_parse, unknown_category).")
+            for (intent, reason), n in sorted(self._fallbacks.items()):
+                lines.append(_sample("llm_fallbacks_total", n, intent=intent, reason=reason))
+        return "\n".join(lines) + "\n"
+
+
+def render_stats(
+    prefix: str, stats: Mapping[str, float], help_text: str, counters: Iterable[str] = ()
+) -> str:
+    """
+    Render a flat stats dict (cache, limiter, ...) in Prometheus text format:
+    - Keys listed in `counters` only ever grow; they become counters named `<prefix>_<key>_total`
+    - Every other key is a point-in-time value, rendered as a gauge
+    """
+    counters = set(counters)
+    lines = []
+    for key, value in sorted(stats.items()):
+        if key in counters:
+            name = f"{prefix}_{key}" if key.endswith("_total") else f"{prefix}_{key}_total"
+            lines += _header(name, "counter", help_text)
+        else:
+            name = f"{prefix}_{key}"
+            lines += _header(name, "gauge", help_text)
+        lines.append(_sample(name, value))
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------------------
+#   FORMATTING HELPERS
+# ---------------------------------------------------------
+def _header(name: str, kind: str, help_text: str) -> List[str]:
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+
+
+def _sample(name: str, value: float, **labels: str) -> str:
+    if labels:
+        label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+        return f"{name}{{{label_text}}} {_fmt(value)}"
+    return f"{name} {_fmt(value)}"
+
+
+def _fmt(value: float) -> str:
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
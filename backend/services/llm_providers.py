@@ -0,0 +1,232 @@
+"""LLM provider backends used by the LLM wrapper in `llm.py`."""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Default Gemini model
+GEMINI_MODEL_NAME = "models/gemini-2.5-flash"
+
+
+class LLMProvider:
+    """
+    Interface every LLM backend implements.
+    Providers raise on failure. After the rate limiter's retries, the wrapper in
+    `llm.py` re-raises the exception as `LLMError`, which the API answers with a 503
+    response (or an SSE error event when streaming) instead of a fallback output.
+    """
+
+    name = "base"
+    model_name = ""
+
+    def generate(self, system_prompt: str, user_prompt: str, intent: str) -> str:
+        """Return the full completion text."""
+        raise NotImplementedError
+
+    def stream(self, system_prompt: str, user_prompt: str, intent: str) -> Iterator[str]:
+        """Yield completion text chunk by chunk (defaults to a single chunk)."""
+        yield self.generate(system_prompt, user_prompt, intent)
+
+    @staticmethod
+    def combine_prompts(system_prompt: str, user_prompt: str) -> str:
+        """Single text prompt for backends without role/content messages."""
+        return f"{system_prompt.strip()}\n\nUSER INPUT:\n{user_prompt.strip()}"
+
+
+# ---------------------------------------------------------
+#   GEMINI
+# ---------------------------------------------------------
+class GeminiProvider(LLMProvider):
+    """Google Gemini backend (configured on first use, not at import)."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None, model_name: str = GEMINI_MODEL_NAME) -> None:
+        self.model_name = model_name
+        self._api_key = api_key or os.getenv("Email_key")
+        self._genai = None
+        self._lock = threading.Lock()
+
+    def _client(self):
+        """Import and configure the Gemini SDK lazily."""
+        with self._lock:
+            if self._genai is None:
+                if not self._api_key:
+                    raise ValueError(
+                        "Gemini API key not found. Make sure your `.env` file contains:\n\n"
+                        "Email_key=YOUR_KEY_HERE\n"
+                    )
+                import google.generativeai as genai
+
+                genai.configure(api_key=self._api_key)  # type: ignore
+                self._genai = genai
+            return self._genai
+
+    def generate(self, system_prompt: str, user_prompt: str, intent: str) -> str:
+        model = self._client().GenerativeModel(self.model_name)  # type: ignore
+
+        # Gemini does NOT use role/content dicts.
+        # We just send a single combined text prompt.
+        response = model.generate_content(self.combine_prompts(system_prompt, user_prompt))
+
+        if response and getattr(response, "text", None):
+            return response.text.strip()
+        raise ValueError("empty response.")
+
+    def stream(self, system_prompt: str, user_prompt: str, intent: str) -> Iterator[str]:
+        model = self._client().GenerativeModel(self.model_name)  # type: ignore
+        full_prompt = self.combine_prompts(system_prompt, user_prompt)
+
+        for chunk in model.generate_content(full_prompt, stream=True):
+            text = getattr(chunk, "text", None)
+            if text:
+                yield text
+
+
+# ---------------------------------------------------------
+#   DETERMINISTIC LOCAL STUB
+# ---------------------------------------------------------
+class StubProviderError(RuntimeError):
+    """Simulated provider failure injected by `StubProvider`."""
+
+    def __init__(self, message: str, status_code: int = 503, retry_after: Optional[float] = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class StubProvider(LLMProvider):
+    """
+    Offline backend for load tests, benchmarks and CI:
+    - Outputs are a pure function of the prompt (plus canned per-intent text)
+    - Latency, error rate (503) and throttle rate (429) are configurable;
+      failures follow a seeded sequence
+    """
+
+    name = "stub"
+    model_name = "stub"
+
+    CATEGORIES = ["important", "newsletter", "spam", "to-do", "meeting", "follow-up", "personal", "other"]
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        seed: int = 0,
+        responses: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.responses = responses or {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "StubProvider":
+        """Build a stub from LLM_STUB_* environment variables."""
+        responses: Dict[str, str] = {}
+        responses_path = os.getenv("LLM_STUB_RESPONSES")
+        if responses_path:
+            responses = json.loads(Path(responses_path).read_text(encoding="utf-8"))
+        return cls(
+            latency_ms=float(os.getenv("LLM_STUB_LATENCY_MS", "0")),
+            jitter_ms=float(os.getenv("LLM_STUB_JITTER_MS", "0")),
+            error_rate=float(os.getenv("LLM_STUB_ERROR_RATE", "0")),
+            throttle_rate=float(os.getenv("LLM_STUB_THROTTLE_RATE", "0")),
+            seed=int(os.getenv("LLM_STUB_SEED", "0")),
+            responses=responses,
+        )
+
+    def generate(self, system_prompt: str, user_prompt: str, intent: str) -> str:
+        self._simulate_call()
+        return self._respond(user_prompt, intent)
+
+    def stream(self, system_prompt: str, user_prompt: str, intent: str) -> Iterator[str]:
+        self._simulate_call()
+        words = self._respond(user_prompt, intent).split(" ")
+        for i, word in enumerate(words):
+            yield word if i == 0 else f" {word}"
+
+    # ---------------------------------------------------------
+    # INTERNALS
+    # ---------------------------------------------------------
+    def _simulate_call(self) -> None:
+        """Sleep for the configured latency and maybe raise an injected error."""
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+            roll = self._rng.random()
+        delay = max(0.0, self.latency_ms + jitter) / 1000
+        if delay:
+            time.sleep(delay)
+        if roll < self.throttle_rate:
+            raise StubProviderError("stub provider injected throttling", status_code=429, retry_after=0.1)
+        if roll < self.throttle_rate + self.error_rate:
+            raise StubProviderError("stub provider injected failure")
+
+    def _respond(self, user_prompt: str, intent: str) -> str:
+        """Canned output if configured, otherwise a deterministic default per intent."""
+        if intent in self.responses:
+            return self.responses[intent]
+
+        digest = self._digest(user_prompt)
+
+        if intent == "categorize":
+            return self.CATEGORIES[digest % len(self.CATEGORIES)]
+        if intent == "categorize_batch":
+            return json.dumps({
+                email_id: self.CATEGORIES[self._digest(block) % len(self.CATEGORIES)]
+                for email_id, block in self._split_batch(user_prompt)
+            })
+        if intent == "actions":
+            return json.dumps([{"task": f"Follow up on request #{digest % 1000}", "deadline": ""}])
+        if intent == "triage":
+            return json.dumps({
+                "category": self.CATEGORIES[digest % len(self.CATEGORIES)],
+                "action_items": [{"task": f"Follow up on request #{digest % 1000}", "deadline": ""}],
+                "summary": f"Stub summary {digest % 10000}.",
+            })
+        if intent in ("draft", "custom_draft"):
+            return (
+                "Subject: Re: your email\n\n"
+                "Hi,\n\nThank you for your message. I will get back to you shortly.\n\n"
+                f"Best regards,\nEmail Agent (ref {digest % 10000})"
+            )
+        return f"Stub response {digest % 10000} for intent '{intent}'."
+
+    @staticmethod
+    def _digest(text: str) -> int:
+        return int(hashlib.sha256(text.encode("utf-8")).hexdigest(), 16)
+
+    @staticmethod
+    def _split_batch(user_prompt: str) -> List[Tuple[str, str]]:
+        """Split a batch prompt into (email id, text block) pairs."""
+        matches = list(re.finditer(r"^Email id: (.+)$", user_prompt, flags=re.MULTILINE))
+        ends = [match.start() for match in matches[1:]] + [len(user_prompt)]
+        return [
+            (match.group(1).strip(), user_prompt[match.start():end])
+            for match, end in zip(matches, ends)
+        ]
+
+
+# ---------------------------------------------------------
+#   FACTORY
+# ---------------------------------------------------------
+def create_provider(name: Optional[str] = None) -> LLMProvider:
+    """Create the provider selected by `name` or the LLM_PROVIDER env variable."""
+    name = (name or os.getenv("LLM_PROVIDER", "gemini")).lower()
+    if name == "gemini":
+        return GeminiProvider(model_name=os.getenv("LLM_MODEL_NAME", GEMINI_MODEL_NAME))
+    if name == "stub":
+        return StubProvider.from_env()
+    raise ValueError(f"Unknown LLM provider '{name}'. Expected 'gemini' or 'stub'.")
@@ -0,0 +1,248 @@
+"""Local learned categorizer trained from LLM-labeled inbox history."""
+from __future__ import annotations
+
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from backend.models.email import Email
+
+# Category sources that count as LLM labels. Emails without a source (imported, or
+# categorized before sources were tracked) are not labels: most just carry the default.
+LLM_LABEL_SOURCES = {"llm", "llm-batch", "llm-triage"}
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9'\-]*")
+
+Features = Dict[int, float]
+
+
+class LocalCategoryClassifier:
+    """
+    Hashed n-gram features + multinomial logistic regression, in pure Python:
+    - Trains on categories the LLM already assigned (no network needed)
+    - Predicts in-process; callers fall back to the LLM below `threshold`
+    - Reports accuracy and coverage on a held-out slice of LLM labels
+    """
+
+    DIM = 1 << 18
+    BODY_CHARS = 4000
+    MIN_SAMPLES = 20
+    HOLDOUT_FRACTION = 0.2
+    EPOCHS = 12
+    LEARNING_RATE = 0.5
+
+    def __init__(self, model_path: Path, threshold: float = 0.85) -> None:
+        self._path = model_path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._classes: List[str] = []
+        self._weights: Dict[int, List[float]] = {}
+        self._bias: List[float] = []
+        self._report: Dict[str, object] = {"trained": False}
+        self._load()
+
+    # ---------------------------------------------------------
+    # LOAD + SAVE
+    # ---------------------------------------------------------
+    def _load(self) -> None:
+        """Load a previously trained model, if any."""
+        if not self._path.exists():
+            return
+        try:
+            payload = json.loads(self._path.read_text(encoding="utf-8"))
+            self._classes = payload["classes"]
+            self._bias = payload["bias"]
+            self._weights = {int(idx): w for idx, w in payload["weights"].items()}
+            self._report = payload.get("report", {"trained": True})
+        except (ValueError, KeyError) as e:
+            print(f"WARNING: Corrupted classifier model {self._path}. Error: {e}. Starting untrained.")
+
+    def _persist(self) -> None:
+        """Persist the model weights and last training report."""
+        data = {
+            "classes": self._classes,
+            "bias": self._bias,
+            "weights": {str(idx): [round(v, 6) for v in w] for idx, w in self._weights.items()},
+            "report": self._report,
+        }
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp_path, self._path)
+
+    # ---------------------------------------------------------
+    # PREDICTION
+    # ---------------------------------------------------------
+    @property
+    def is_trained(self) -> bool:
+        return bool(self._classes)
+
+    def predict(self, email: Email) -> Optional[Tuple[str, float]]:
+        """Return (category, confidence), or None if no model is trained."""
+        with self._lock:
+            classes, weights, bias = self._classes, self._weights, self._bias
+        if not classes:
+            return None
+        probs = self._predict_proba(self._features(email), weights, bias)
+        best = max(range(len(classes)), key=probs.__getitem__)
+        return classes[best], probs[best]
+
+    def report(self) -> Dict[str, object]:
+        """Return the last training report (accuracy/coverage on held-out labels)."""
+        return {**self._report, "threshold": self.threshold}
+
+    # ---------------------------------------------------------
+    # TRAINING
+    # ---------------------------------------------------------
+    def retrain(self, emails: Iterable[Email]) -> Dict[str, object]:
+        """
+        Retrain from LLM-labeled emails:
+        - Fit on ~80% and measure accuracy/coverage on the held-out ~20%
+        - Refit on everything and persist the deployed model
+        CPU-bound pure Python: about samples x features per email x classes x EPOCHS x 2
+        multiply-adds (~15 s for 3,000 labels in 8 categories), holding the GIL throughout.
+        """
+        labeled = [
+            (self._features(email), email.category)
+            for email in emails
+            if email.category and email.category_source in LLM_LABEL_SOURCES
+        ]
+        classes = sorted({label for _, label in labeled})
+        if len(labeled) < self.MIN_SAMPLES or len(classes) < 2:
+            return {
+                "trained": False,
+                "samples": len(labeled),
+                "reason": f"Need at least {self.MIN_SAMPLES} LLM-labeled emails across 2+ categories.",
+            }
+
+        rng = random.Random(0)
+        shuffled = labeled[:]
+        rng.shuffle(shuffled)
+        split = max(1, int(len(shuffled) * self.HOLDOUT_FRACTION))
+        holdout, train = shuffled[:split], shuffled[split:]
+
+        weights, bias = self._fit(train, classes)
+        report = self._evaluate(holdout, classes, weights, bias)
+        report.update({
+            "trained": True,
+            "samples": len(labeled),
+            "classes": classes,
+            "trained_at": datetime.utcnow().isoformat(),
+        })
+
+        weights, bias = self._fit(labeled, classes)
+        with self._lock:
+            self._classes, self._weights, self._bias = classes, weights, bias
+            self._report = report
+        self._persist()
+        return self.report()
+
+    def _fit(self, samples: List[Tuple[Features, str]], classes: List[str]) -> Tuple[Dict[int, List[float]], List[float]]:
+        """Plain SGD on softmax cross-entropy over sparse features."""
+        index = {label: k for k, label in enumerate(classes)}
+        weights: Dict[int, List[float]] = {}
+        bias = [0.0] * len(classes)
+        rng = random.Random(1)
+        order = list(range(len(samples)))
+
+        for epoch in range(self.EPOCHS):
+            rng.shuffle(order)
+            lr = self.LEARNING_RATE / (1 + epoch * 0.3)
+            for i in order:
+                features, label = samples[i]
+                probs = self._predict_proba(features, weights, bias)
+                grads = [p - (1.0 if k == index[label] else 0.0) for k, p in enumerate(probs)]
+                for k, g in enumerate(grads):
+                    bias[k] -= lr * g
+                for idx, value in features.items():
+                    w = weights.setdefault(idx, [0.0] * len(classes))
+                    for k, g in enumerate(grads):
+                        w[k] -= lr * g * value
+        return weights, bias
+
+    def _evaluate(
+        self,
+        holdout: List[Tuple[Features, str]],
+        classes: List[str],
+        weights: Dict[int, List[float]],
+        bias: List[float],
+    ) -> Dict[str, object]:
+        """Accuracy overall, coverage at the threshold, and accuracy on covered emails."""
+        correct = covered = covered_correct = 0
+        for features, label in holdout:
+            probs = self._predict_proba(features, weights, bias)
+            best = max(range(len(classes)), key=probs.__getitem__)
+            hit = classes[best] == label
+            correct += hit
+            if probs[best] >= self.threshold:
+                covered += 1
+                covered_correct += hit
+        return {
+            "holdout": len(holdout),
+            "accuracy": round(correct / len(holdout), 4),
+            "coverage": round(covered / len(holdout), 4),
+            "covered_accuracy": round(covered_correct / covered, 4) if covered else None,
+        }
+
+    # ---------------------------------------------------------
+    # FEATURES + MATH
+    # ---------------------------------------------------------
+    def _features(self, email: Email) -> Features:
+        """Field-prefixed unigrams + bigrams, hashed, log-scaled and L2-normalized."""
+        counts: Dict[int, float] = {}
+
+        def add(token: str) -> None:
+            idx = zlib.crc32(token.encode("utf-8")) % self.DIM
+            counts[idx] = counts.get(idx, 0.0) + 1.0
+
+        local, _, domain = email.sender.lower().rpartition("@")
+        add(f"d:{domain}")
+        add(f"u:{local}")
+        for field, text in (("s", email.subject), ("b", email.body[:self.BODY_CHARS])):
+            tokens = _TOKEN_RE.findall(text.lower())
+            for token in tokens:
+                add(f"{field}:{token}")
+            for first, second in zip(tokens, tokens[1:]):
+                add(f"{field}:{first} {second}")
+
+        scaled = {idx: 1.0 + math.log(count) for idx, count in counts.items()}
+        norm = math.sqrt(sum(v * v for v in scaled.values())) or 1.0
+        return {idx: v / norm for idx, v in scaled.items()}
+
+    @staticmethod
+    def _predict_proba(features: Features, weights: Dict[int, List[float]], bias: List[float]) -> List[float]:
+        scores = bias[:]
+        for idx, value in features.items():
+            w = weights.get(idx)
+            if w is not None:
+                for k, wk in enumerate(w):
+                    scores[k] += wk * value
+        top = max(scores)
+        exps = [math.exp(s - top) for s in scores]
+        total = sum(exps)
+        return [e / total for e in exps]
+
+
+# ---------------------------------------------------------
+#   CLI: python -m backend.services.local_classifier [inbox.json|inbox.db] [model.json]
+# ---------------------------------------------------------
+if __name__ == "__main__":
+    base_dir = Path(__file__).resolve().parent.parent.parent
+    inbox_path = Path(sys.argv[1]) if len(sys.argv) > 1 else base_dir / "data" / "inbox.json"
+    model_path = Path(sys.argv[2]) if len(sys.argv) > 2 else base_dir / "data" / "category_model.json"
+
+    from backend.services.inbox_service import InboxService
+    from backend.services.inbox_store import open_inbox_store
+
+    classifier = LocalCategoryClassifier(
+        model_path, threshold=float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.85"))
+    )
+    print(json.dumps(classifier.retrain(InboxService(open_inbox_store(inbox_path)).list_emails()), indent=2))
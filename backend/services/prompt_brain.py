@@ -2,27 +2,64 @@
 from __future__ import annotations
 
 import json
+import os
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterator, List
 
 from backend.models.prompt import Prompt
+from backend.services.file_lock import FileLock, FileSignature, file_signature
+from backend.services.prompt_template import CompiledTemplate
 
 
 class PromptBrain:
-    """Stores user-defined prompts and exposes helpers to retrieve them."""
+    """
+    Stores user-defined prompts and exposes helpers to retrieve them.
+    With `shared`, edits are made under `prompts.lock` and every worker process
+    reloads prompts.json when another one changes it.
+    `revision` counts saved edits; it is stored in prompts.json so it keeps
+    increasing across restarts and worker processes.
+    """
 
     REQUIRED_PROMPT_IDS = {
         "categorize",
+        "categorize_batch",
         "actions",
         "draft",
         "agent",
+        "triage",
     }
 
-    def __init__(self, prompt_path: Path) -> None:
+    # Variables each built-in prompt is rendered with; user-defined prompts may use any of them.
+    TEMPLATE_VARIABLES = {
+        "categorize": {"email_body", "subject"},
+        "categorize_batch": {"emails"},
+        "actions": {"email_body", "subject"},
+        "draft": {"email_body", "subject", "sender", "persona", "instructions"},
+        "agent": {"emails", "query_type", "context_description"},
+        "triage": {"email_body", "subject", "sender"},
+    }
+
+    # Placeholders a built-in prompt cannot work without.
+    REQUIRED_VARIABLES = {
+        "categorize": {"email_body"},
+        "categorize_batch": {"emails"},
+        "actions": {"email_body"},
+        "draft": {"email_body"},
+        "agent": {"emails", "query_type"},
+        "triage": {"email_body"},
+    }
+
+    def __init__(self, prompt_path: Path, shared: bool = False) -> None:
         self._path = prompt_path
         self._prompts: Dict[str, Prompt] = {}
-        self._load_prompts()
-        self._ensure_required_prompts_exist()
+        self._compiled: Dict[str, CompiledTemplate] = {}
+        self._signature: FileSignature = None
+        self._revision = 0
+        self._file_lock = FileLock(prompt_path.with_suffix(".lock")) if shared else None
+        with self._exclusive():
+            self._load_prompts()
+            self._ensure_required_prompts_exist()
 
     # ---------------------------------------------------------
     # LOAD + SAVE
@@ -41,27 +78,61 @@ class PromptBrain:
                     payload = json.loads(content)
             except json.JSONDecodeError as e:
                 print(f"WARNING: Corrupted prompts.json file. Error: {e}. Loading empty state.")
-            
+        self._signature = file_signature(self._path)
+
         # Ensure payload is a dictionary and has the 'prompts' key before loading
         if not isinstance(payload, dict):
             payload = {"prompts": []}
 
+        self._revision = int(payload.get("revision", 0))
         self._prompts = {
             item["id"]: Prompt.from_dict(item)
             for item in payload.get("prompts", [])
         }
+        self._compiled = {
+            prompt_id: self._compile_stored(prompt)
+            for prompt_id, prompt in self._prompts.items()
+        }
 
     def _persist(self) -> None:
-        """Persist current prompts to disk."""
-        data = {"prompts": [prompt.to_dict() for prompt in self._prompts.values()]}
-        with self._path.open("w", encoding="utf-8") as handle:
+        """Persist current prompts to disk atomically (temp file + rename), bumping the revision."""
+        self._revision += 1
+        data = {
+            "revision": self._revision,
+            "prompts": [prompt.to_dict() for prompt in self._prompts.values()],
+        }
+        tmp_path = self._path.with_suffix(".json.tmp")
+        with tmp_path.open("w", encoding="utf-8") as handle:
             json.dump(data, handle, indent=2)
+        os.replace(tmp_path, self._path)
+        self._signature = file_signature(self._path)
+
+    # ---------------------------------------------------------
+    # MULTI-WORKER SYNC
+    # ---------------------------------------------------------
+    def _reload_if_changed(self) -> None:
+        """Shared mode: pick up prompts.json if another worker rewrote it."""
+        if self._file_lock is not None and file_signature(self._path) != self._signature:
+            with self._file_lock:
+                if file_signature(self._path) != self._signature:
+                    self._load_prompts()
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        """Shared mode: hold the cross-process lock on fresh state while editing."""
+        if self._file_lock is None:
+            yield
+            return
+        with self._file_lock:
+            if file_signature(self._path) != self._signature:
+                self._load_prompts()
+            yield
 
     # ---------------------------------------------------------
     # ENSURE DEFAULT PROMPTS EXIST
     # ---------------------------------------------------------
     def _ensure_required_prompts_exist(self) -> None:
-        """Ensure categorization, actions, draft, and agent prompts exist."""
+        """Ensure categorization (single and batch), actions, draft, agent, and triage prompts exist."""
         defaults = {
             "categorize": (
                 "Read the email body and subject:\n"
@@ -70,10 +141,17 @@ class PromptBrain:
                 "important, newsletter, spam, to-do, meeting, follow-up, personal, other.\n"
                 "Return only the category name."
             ),
+            "categorize_batch": (
+                "Categorize each email below into one of these categories ONLY:\n"
+                "important, newsletter, spam, to-do, meeting, follow-up, personal, other.\n"
+                "Return STRICT JSON: an object mapping every email id to its category, "
+                "e.g. {{\"E001\": \"meeting\"}}.\n\n"
+                "{emails}"
+            ),
             "actions": (
                 "Extract clear action items from this email:\n{email_body}\n\n"
                 "Return STRICT JSON list format:\n"
-                "[ {\"task\": \"...\", \"deadline\": \"...\"} ]\n"
+                "[ {{\"task\": \"...\", \"deadline\": \"...\"}} ]\n"
                 "If there are no actions, return an empty list []."
             ),
             "draft": (
@@ -98,6 +176,16 @@ class PromptBrain:
                 "INBOX CONTEXT:\n{emails}\n\n"
                 "USER QUERY: {query_type}"
             ),
+            "triage": (
+                "Triage this email in one pass.\n\n"
+                "Subject: {subject}\n"
+                "From: {sender}\n"
+                "Body:\n{email_body}\n\n"
+                "Return STRICT JSON with exactly these keys:\n"
+                "{{\"category\": \"one of: important, newsletter, spam, to-do, meeting, follow-up, personal, other\", "
+                "\"action_items\": [{{\"task\": \"...\", \"deadline\": \"...\"}}], "
+                "\"summary\": \"one or two sentences\"}}"
+            ),
         }
 
         changed = False
@@ -110,6 +198,7 @@ class PromptBrain:
                     description=f"Default autogenerated {prompt_id} prompt.",
                     template=defaults[prompt_id],
                 )
+                self._compiled[prompt_id] = self.compile(self._prompts[prompt_id])
                 changed = True
 
         if changed:
@@ -118,24 +207,77 @@ class PromptBrain:
     # ---------------------------------------------------------
     # ACCESSORS
     # ---------------------------------------------------------
+    @property
+    def revision(self) -> int:
+        """Revision of the latest saved prompt edit."""
+        self._reload_if_changed()
+        return self._revision
+
     def list_prompts(self) -> List[Prompt]:
         """Return all prompts."""
+        self._reload_if_changed()
         return list(self._prompts.values())
 
     def get_template(self, prompt_id: str) -> str:
         """Return the raw template text for a given prompt id."""
-        if prompt_id not in self._prompts:
+        return self.get_compiled(prompt_id).source
+
+    def get_compiled(self, prompt_id: str) -> CompiledTemplate:
+        """Return the precompiled template for a given prompt id."""
+        self._reload_if_changed()
+        compiled = self._compiled.get(prompt_id)
+        if compiled is None:
             raise KeyError(f"Prompt '{prompt_id}' not found.")
-        return self._prompts[prompt_id].template.strip()
+        return compiled
+
+    def get_version(self, prompt_id: str) -> str:
+        """Return a short content hash identifying the current template revision."""
+        return self.get_compiled(prompt_id).version
+
+    # ---------------------------------------------------------
+    # COMPILE + VALIDATE
+    # ---------------------------------------------------------
+    @classmethod
+    def compile(cls, prompt: Prompt) -> CompiledTemplate:
+        """
+        Parse a prompt's template and check its placeholders:
+        - Built-in prompts may only use their own variables and must use the required ones
+        - User-defined prompts may use any known variable
+        Raises ValueError describing typos or missing variables.
+        """
+        compiled = CompiledTemplate(prompt.template.strip())
+        all_variables = set().union(*cls.TEMPLATE_VARIABLES.values())
+        compiled.validate(
+            cls.TEMPLATE_VARIABLES.get(prompt.id, all_variables),
+            cls.REQUIRED_VARIABLES.get(prompt.id, ()),
+        )
+        return compiled
+
+    def _compile_stored(self, prompt: Prompt) -> CompiledTemplate:
+        """Compile a prompt loaded from disk, warning instead of failing startup."""
+        try:
+            return self.compile(prompt)
+        except ValueError as e:
+            print(f"WARNING: Prompt '{prompt.id}' in prompts.json is invalid. Error: {e}")
+        try:
+            return CompiledTemplate(prompt.template.strip())
+        except ValueError:
+            return CompiledTemplate.literal(prompt.template.strip())
 
     # ---------------------------------------------------------
     # UPSERT
     # ---------------------------------------------------------
     def upsert_prompt(self, payload: dict) -> Prompt:
-        """Update an existing prompt or insert a new one."""
+        """
+        Update an existing prompt or insert a new one.
+        Raises ValueError (nothing is saved) if the template does not validate.
+        """
         prompt = Prompt.from_dict(payload)
-        self._prompts[prompt.id] = prompt
-        self._persist()
+        compiled = self.compile(prompt)
+        with self._exclusive():
+            self._prompts[prompt.id] = prompt
+            self._compiled[prompt.id] = compiled
+            self._persist()
         return prompt
 
     # ---------------------------------------------------------
@@ -145,9 +287,14 @@ class PromptBrain:
         """
         Removes a prompt by ID from memory and persists the change.
         Returns True if the prompt was found and deleted, False otherwise.
+        Raises ValueError for the built-in prompts (REQUIRED_PROMPT_IDS); edit those instead.
         """
-        if prompt_id in self._prompts:
-            del self._prompts[prompt_id]
-            self._persist()
-            return True
+        if prompt_id in self.REQUIRED_PROMPT_IDS:
+            raise ValueError(f"Prompt '{prompt_id}' is built in and cannot be deleted; edit its template instead.")
+        with self._exclusive():
+            if prompt_id in self._prompts:
+                del self._prompts[prompt_id]
+                self._compiled.pop(prompt_id, None)
+                self._persist()
+                return True
         return False
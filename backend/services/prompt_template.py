@@ -0,0 +1,87 @@
+"""Precompiled prompt templates with placeholder validation."""
+from __future__ import annotations
+
+import hashlib
+import re
+from functools import lru_cache
+from string import Formatter
+from typing import FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class CompiledTemplate:
+    """
+    A prompt template parsed once into (literal, placeholder) segments:
+    - `placeholders` lists every variable the template uses
+    - `render` is a plain join over the segments (no re-parsing)
+    - `version` is a stable content hash usable as a prompt version
+    Placeholders must be simple names; `{{` / `}}` are literal braces.
+    """
+
+    __slots__ = ("source", "placeholders", "version", "_segments")
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self._segments: Tuple[Tuple[str, Optional[str]], ...] = tuple(self._parse(source))
+        self.placeholders: FrozenSet[str] = frozenset(
+            field for _, field in self._segments if field is not None
+        )
+        self.version = hashlib.sha256(source.encode("utf-8")).hexdigest()[:12]
+
+    @classmethod
+    def literal(cls, text: str) -> "CompiledTemplate":
+        """Compile `text` as plain text with no placeholders (for unparseable templates)."""
+        return cls(text.replace("{", "{{").replace("}", "}}"))
+
+    @staticmethod
+    def _parse(source: str) -> List[Tuple[str, Optional[str]]]:
+        """Split into segments, rejecting syntax `render` cannot honor."""
+        segments: List[Tuple[str, Optional[str]]] = []
+        for literal, field, spec, conversion in Formatter().parse(source):
+            if field is None:
+                segments.append((literal, None))
+                continue
+            if not _IDENTIFIER.match(field):
+                raise ValueError(
+                    f"Invalid placeholder '{{{field}}}': use simple names like {{email_body}} "
+                    "(write {{ and }} for literal braces)."
+                )
+            if spec or conversion:
+                raise ValueError(f"Placeholder '{{{field}}}' must not use format specs or conversions.")
+            segments.append((literal, field))
+        return segments
+
+    def validate(self, allowed: Iterable[str], required: Iterable[str] = ()) -> None:
+        """Raise ValueError for unknown (typo) or missing required placeholders."""
+        allowed_set, required_set = set(allowed), set(required)
+        unknown = sorted(self.placeholders - allowed_set)
+        missing = sorted(required_set - self.placeholders)
+
+        problems = []
+        if unknown:
+            problems.append(
+                "unknown placeholder(s) " + ", ".join(f"{{{name}}}" for name in unknown)
+                + " (allowed: " + ", ".join(f"{{{name}}}" for name in sorted(allowed_set)) + ")"
+            )
+        if missing:
+            problems.append("missing required placeholder(s) " + ", ".join(f"{{{name}}}" for name in missing))
+        if problems:
+            raise ValueError("Invalid template: " + "; ".join(problems) + ".")
+
+    def render(self, context: Mapping[str, object]) -> str:
+        """Fill placeholders from `context`; variables the caller does not supply render empty."""
+        parts: List[str] = []
+        for literal, field in self._segments:
+            parts.append(literal)
+            if field is not None:
+                value = context.get(field)
+                if value is not None:
+                    parts.append(str(value))
+        return "".join(parts)
+
+
+@lru_cache(maxsize=128)
+def compile_template(source: str) -> CompiledTemplate:
+    """Compile (and memoize) a template given as raw text."""
+    return CompiledTemplate(source)
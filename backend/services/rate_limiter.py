@@ -0,0 +1,214 @@
+"""Adaptive rate limiting and retry policy shared by all LLM provider calls."""
+from __future__ import annotations
+
+import os
+import random
+import re
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying; 429 additionally means "slow down".
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+THROTTLE_STATUS = 429
+
+# google.api_core exception class names, for errors that carry no usable code.
+_STATUS_BY_CLASS_NAME = {
+    "ResourceExhausted": 429,
+    "TooManyRequests": 429,
+    "InternalServerError": 500,
+    "BadGateway": 502,
+    "ServiceUnavailable": 503,
+    "DeadlineExceeded": 504,
+    "GatewayTimeout": 504,
+}
+
+# Gemini 429 messages carry hints like "Please retry in 37.4s" or
+# "retry_delay { seconds: 37 }".
+_RETRY_AFTER_PATTERNS = [
+    re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE),
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+]
+
+
+def classify_error(exc: BaseException) -> Tuple[Optional[int], Optional[float]]:
+    """Return (HTTP status if known, retry-after seconds if hinted) for a provider error."""
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    if not isinstance(status, int):
+        status = _STATUS_BY_CLASS_NAME.get(type(exc).__name__)
+
+    retry_after = getattr(exc, "retry_after", None)
+    if retry_after is None:
+        message = str(exc)
+        for pattern in _RETRY_AFTER_PATTERNS:
+            match = pattern.search(message)
+            if match:
+                retry_after = float(match.group(1))
+                break
+    return status, retry_after
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket + concurrency cap with retries:
+    - Exponential backoff with full jitter, never shorter than a retry-after hint
+    - AIMD rate control: halve the rate on throttling, creep back up on success
+    - Counters for queue wait, retries and throttles to help size quota
+    """
+
+    def __init__(
+        self,
+        rate_per_sec: float = 5.0,
+        burst: int = 10,
+        max_concurrency: int = 8,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        min_rate_per_sec: float = 0.2,
+    ) -> None:
+        self.max_rate = rate_per_sec
+        self.min_rate = min(min_rate_per_sec, rate_per_sec)
+        self.burst = max(1, burst)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._rate = rate_per_sec
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._max_concurrency = max(1, max_concurrency)
+
+        self._stats: Dict[str, float] = {
+            "calls": 0,
+            "retries": 0,
+            "throttled": 0,
+            "failures": 0,
+            "in_flight": 0,
+            "queue_wait_seconds_total": 0.0,
+            "queue_wait_seconds_max": 0.0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "AdaptiveRateLimiter":
+        """Build a limiter from LLM_* environment variables."""
+        return cls(
+            rate_per_sec=float(os.getenv("LLM_RATE_PER_SEC", "5")),
+            burst=int(os.getenv("LLM_BURST", "10")),
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+            base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(os.getenv("LLM_RETRY_MAX_DELAY", "30")),
+        )
+
+    # ---------------------------------------------------------
+    # PUBLIC API
+    # ---------------------------------------------------------
+    def call(self, fn: Callable[[], T]) -> T:
+        """Run `fn` under the limiter, retrying retryable failures."""
+        result, release = self.call_held(fn)
+        release()
+        return result
+
+    def call_held(self, fn: Callable[[], T]) -> Tuple[T, Callable[[], None]]:
+        """
+        Like `call`, but the concurrency slot stays taken after `fn` succeeds, until the
+        returned `release` is called: a stream opened by `fn` counts until it is consumed.
+        """
+        attempt = 0
+        while True:
+            held = ExitStack()
+            held.enter_context(self.slot())
+            try:
+                result = fn()
+            except Exception as exc:
+                held.close()
+                status, retry_after = classify_error(exc)
+                if status == THROTTLE_STATUS:
+                    self._on_throttle()
+                if status not in RETRYABLE_STATUS or attempt >= self.max_retries:
+                    self._bump("failures")
+                    raise
+                attempt += 1
+                self._bump("retries")
+                time.sleep(self._backoff(attempt, retry_after))
+                continue
+
+            self._on_success()
+            return result, held.close
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Wait for a concurrency slot and a rate token, recording queue time."""
+        started = time.monotonic()
+        self._slots.acquire()
+        try:
+            self._take_token()
+            waited = time.monotonic() - started
+            with self._lock:
+                self._stats["calls"] += 1
+                self._stats["in_flight"] += 1
+                self._stats["queue_wait_seconds_total"] += waited
+                self._stats["queue_wait_seconds_max"] = max(self._stats["queue_wait_seconds_max"], waited)
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self._stats["in_flight"] -= 1
+        finally:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, float]:
+        """Return limiter counters and the current adaptive rate."""
+        with self._lock:
+            return {
+                **self._stats,
+                "rate_per_sec": self._rate,
+                "max_rate_per_sec": self.max_rate,
+                "max_concurrency": self._max_concurrency,
+            }
+
+    # ---------------------------------------------------------
+    # INTERNALS
+    # ---------------------------------------------------------
+    def _take_token(self) -> None:
+        """Block until the bucket has a token at the current rate."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self._rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        """Full-jitter exponential backoff, floored by the server's retry-after hint."""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay = random.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def _on_throttle(self) -> None:
+        """Multiplicative decrease; also drain the bucket so bursts stop immediately."""
+        with self._lock:
+            self._stats["throttled"] += 1
+            self._rate = max(self.min_rate, self._rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+
+    def _on_success(self) -> None:
+        """Additive increase back towards the configured rate."""
+        with self._lock:
+            if self._rate < self.max_rate:
+                self._rate = min(self.max_rate, self._rate + self.max_rate * 0.05)
+
+    def _bump(self, counter: str) -> None:
+        with self._lock:
+            self._stats[counter] += 1
@@ -0,0 +1,577 @@
+"""Incremental full-text index with BM25 ranking for the in-memory inbox store."""
+from __future__ import annotations
+
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import zlib
+from bisect import bisect_left, insort
+from operator import itemgetter
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from backend.models.email import Email
+from backend.services.body_store import random_access
+
+# Words are runs of letters/digits, lowercased ("Re: Q3-Budget" -> re, q3, budget).
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# A query is a sequence of "quoted phrases" and bare words (a trailing * makes a prefix).
+QUERY_RE = re.compile(r'"([^"]*)"(\*?)|(\S+)')
+
+# Indexed fields in position order, with their BM25F weights (a subject hit counts double).
+FIELD_WEIGHTS: Tuple[Tuple[str, float], ...] = (("subject", 2.0), ("sender", 1.0), ("body", 1.0))
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Most vocabulary terms a prefix expands to (the most frequent win).
+MAX_PREFIX_TERMS = 64
+
+# Cached per-term weights are dropped once the average document length drifts this much.
+WEIGHT_CACHE_DRIFT = 0.05
+
+# Layout of the saved index (see `save`); files written with another layout are rebuilt.
+FORMAT_VERSION = 1
+
+# {email id -> ascending token positions} for one term.
+Postings = Dict[str, List[int]]
+
+# Postings of a term, decoded at most once per query (see `SearchIndex._lookup`).
+Lookup = Callable[[str], Postings]
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+class QueryPart(NamedTuple):
+    """One query term or phrase: consecutive tokens; `prefix` applies to the last one."""
+
+    tokens: Tuple[str, ...]
+    prefix: bool
+
+
+def parse_query(query: str) -> List[QueryPart]:
+    """
+    Split a search query into parts that must all match:
+    - `budget` a word, `bud*` a prefix, `"quarterly budget"` a phrase, `"q3 bud"*` a phrase prefix
+    - Punctuation inside a word splits it into a phrase (`e-mail` == `"e mail"`)
+    """
+    parts = []
+    for match in QUERY_RE.finditer(query):
+        phrase, phrase_star, word = match.groups()
+        text, prefix = (phrase, bool(phrase_star)) if word is None else (word, word.endswith("*"))
+        tokens = tuple(tokenize(text))
+        if tokens:
+            parts.append(QueryPart(tokens, prefix))
+    return parts
+
+
+class _Doc(NamedTuple):
+    length: float  # weighted token count (BM25 document length)
+    bounds: Tuple[int, ...]  # first position of each field after the first
+    checksum: int  # of the indexed text, to skip re-indexing unchanged emails
+
+
+class PreparedDoc(NamedTuple):
+    """An email tokenized by `SearchIndex.prepare`, ready to `commit`."""
+
+    email_id: str
+    doc: _Doc
+    positions: Dict[str, List[int]]
+
+
+def _restrict(ids: Optional[Set[str]], postings: Postings) -> Set[str]:
+    """Ids in both (all posting ids if `ids` is None), iterating the smaller side."""
+    if ids is None:
+        return set(postings)
+    if len(ids) <= len(postings):
+        return {email_id for email_id in ids if email_id in postings}
+    return {email_id for email_id in postings if email_id in ids}
+
+
+class SearchIndex:
+    """
+    Positional inverted index over subject, sender and body:
+    - `add` / `remove` keep it current one email at a time (unchanged text is skipped)
+    - Word, prefix and phrase queries; all parts must match, ranked by BM25F
+    - `save` / `load` persist it next to the inbox snapshot; `sync` then re-indexes only
+      emails whose text differs
+    Postings of a loaded or saved index stay in its file: only each term's offset is kept,
+    and a query decodes the postings it needs through mmap. Emails indexed since are
+    held in memory, and their older saved postings are skipped, until the next `save`.
+    Not thread-safe: the owning store calls it under its own lock.
+    """
+
+    def __init__(self) -> None:
+        self._docs: Dict[str, _Doc] = {}
+        # The saved file, and ids whose postings in it are outdated (re-indexed or removed).
+        self._saved: Optional[_SavedPostings] = None
+        self._stale: Set[str] = set()
+        # Postings of emails indexed since the file was saved, and each one's terms.
+        self._postings: Dict[str, Postings] = {}
+        self._doc_terms: Dict[str, Tuple[str, ...]] = {}
+        self._vocabulary: List[str] = []  # sorted, for prefix lookups
+        self._total_length = 0.0
+        # term -> {email id -> BM25 term weight before idf}, filled by queries and
+        # dropped whenever the term's postings change.
+        self._weights: Dict[str, Dict[str, float]] = {}
+        self._weights_average = 0.0
+        # The latest `snapshot`, and ids indexed or removed since it was taken.
+        self._snapshot: Optional[IndexSnapshot] = None
+        self._since_snapshot: Set[str] = set()
+        # Inbox revision of the loaded file (None until `load` succeeds).
+        self.revision: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _get(self, term: str) -> Postings:
+        """Current postings of `term`: the saved ones still valid, plus those indexed since."""
+        postings = self._saved.get(term, self._stale) if self._saved is not None else {}
+        recent = self._postings.get(term)
+        if recent:
+            postings.update(recent)
+        return postings
+
+    def _lookup(self) -> Lookup:
+        """`_get` that decodes each term once, for the duration of one query."""
+        decoded: Dict[str, Postings] = {}
+
+        def get(term: str) -> Postings:
+            postings = decoded.get(term)
+            if postings is None:
+                postings = decoded[term] = self._get(term)
+            return postings
+
+        return get
+
+    def _df(self, term: str) -> int:
+        """Number of emails containing `term`, without decoding its postings (saved
+        postings since outdated are still counted, so this is an upper bound)."""
+        df = self._saved.df(term) if self._saved is not None else 0
+        recent = self._postings.get(term)
+        return df + len(recent) if recent else df
+
+    # ---------------------------------------------------------
+    # MAINTENANCE
+    # ---------------------------------------------------------
+    def add(self, email: Email) -> None:
+        """Index an email, replacing any previous version of it."""
+        prepared = self.prepare(email)
+        if prepared is not None:
+            self.commit(prepared)
+
+    def prepare(self, email: Email) -> Optional[PreparedDoc]:
+        """
+        Tokenize an email without touching the index (so a bad email fails here, before
+        its owner changes anything); None if it is already indexed with the same text.
+        """
+        texts = [getattr(email, name) for name, _ in FIELD_WEIGHTS]
+        # surrogatepass: bodies may carry lone surrogates (see BodyFile.append).
+        checksum = zlib.crc32("\x00".join(texts).encode("utf-8", "surrogatepass"))
+        old = self._docs.get(email.id)
+        if old is not None and old.checksum == checksum:
+            return None
+
+        positions: Dict[str, List[int]] = {}
+        bounds: List[int] = []
+        length = 0.0
+        offset = 0
+        for text, (_, weight) in zip(texts, FIELD_WEIGHTS):
+            if offset:
+                # Leave a one-position gap so phrases never span two fields.
+                offset += 1
+                bounds.append(offset)
+            tokens = tokenize(text)
+            for i, token in enumerate(tokens):
+                positions.setdefault(token, []).append(offset + i)
+            offset += len(tokens)
+            length += weight * len(tokens)
+        return PreparedDoc(email.id, _Doc(length, tuple(bounds), checksum), positions)
+
+    def commit(self, prepared: PreparedDoc) -> None:
+        """Apply a `prepare` result, replacing any previous version of the email."""
+        email_id = prepared.email_id
+        self.remove(email_id)
+        for term, term_positions in prepared.positions.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                if not self._is_saved(term):
+                    insort(self._vocabulary, term)
+            postings[email_id] = term_positions
+            self._weights.pop(term, None)
+        self._doc_terms[email_id] = tuple(prepared.positions)
+        self._docs[email_id] = prepared.doc
+        self._total_length += prepared.doc.length
+        self._since_snapshot.add(email_id)
+
+    def sync(self, emails: Iterable[Email], check_text: bool = True) -> None:
+        """
+        Make the index cover exactly `emails`, re-indexing only those that changed.
+        Without `check_text`, emails already indexed are taken to be unchanged, so their
+        text (and body file pages) are not read.
+        """
+        seen = set()
+        for email in emails:
+            if check_text or email.id not in self._docs:
+                self.add(email)
+            seen.add(email.id)
+        for email_id in [email_id for email_id in self._docs if email_id not in seen]:
+            self.remove(email_id)
+
+    def remove(self, email_id: str) -> None:
+        doc = self._docs.pop(email_id, None)
+        if doc is None:
+            return
+        self._total_length -= doc.length
+        self._since_snapshot.add(email_id)
+        terms = self._doc_terms.pop(email_id, None)
+        if terms is None:
+            # Only in the saved file: skip it there from now on. Its terms are not kept in
+            # memory, so every cached weight goes (text rarely changes once indexed).
+            self._stale.add(email_id)
+            self._weights = {}
+            return
+        for term in terms:
+            postings = self._postings[term]
+            del postings[email_id]
+            self._weights.pop(term, None)
+            if not postings:
+                del self._postings[term]
+                if not self._is_saved(term):
+                    del self._vocabulary[bisect_left(self._vocabulary, term)]
+
+    def _is_saved(self, term: str) -> bool:
+        return self._saved is not None and term in self._saved.terms
+
+    # ---------------------------------------------------------
+    # QUERIES
+    # ---------------------------------------------------------
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float]]:
+        """(email id, score) of the best `limit` matches, best first."""
+        parts = parse_query(query)
+        if not parts or not self._docs:
+            return []
+
+        get = self._lookup()
+        expanded = [self._expand(part) for part in parts]
+        if any(not alternatives for _, alternatives in expanded):
+            return []
+        if len(expanded) == 1 and expanded[0] == ((), expanded[0][1][:1]):
+            # A single word: rank its cached weights directly (idf is the same for all).
+            term = expanded[0][1][0]
+            weights = self._term_weights(term, get)
+            idf = self._idf(len(weights))
+            top = heapq.nlargest(limit, weights.items(), key=itemgetter(1))
+            return [(email_id, idf * weight) for email_id, weight in top]
+        # Candidates come from the rarest part; every other part filters them.
+        order = sorted(range(len(parts)), key=lambda i: self._part_size(expanded[i]))
+        matched: Optional[Set[str]] = None
+        for i in order:
+            matched = self._match(expanded[i], matched, get)
+            if not matched:
+                return []
+
+        terms = {term for fixed, alternatives in expanded for term in (*fixed, *alternatives)}
+        scores = self._score(matched, terms, get)
+        return heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+
+    def _expand(self, part: QueryPart) -> Tuple[Tuple[str, ...], List[str]]:
+        """(leading tokens, alternatives for the last token) of a part."""
+        *fixed, last = part.tokens
+        if not part.prefix:
+            return tuple(fixed), [last] if self._df(last) else []
+        vocabulary = self._vocabulary
+        candidates = []
+        position = bisect_left(vocabulary, last)
+        while position < len(vocabulary) and vocabulary[position].startswith(last):
+            candidates.append(vocabulary[position])
+            position += 1
+        if len(candidates) > MAX_PREFIX_TERMS:
+            candidates = heapq.nlargest(MAX_PREFIX_TERMS, candidates, key=self._df)
+        return tuple(fixed), candidates
+
+    def _part_size(self, expanded: Tuple[Tuple[str, ...], List[str]]) -> int:
+        fixed, alternatives = expanded
+        sizes = [self._df(term) for term in fixed]
+        sizes.append(sum(self._df(term) for term in alternatives))
+        return min(sizes)
+
+    def _match(self, expanded: Tuple[Tuple[str, ...], List[str]], within: Optional[Set[str]], get: Lookup) -> Set[str]:
+        """Ids of emails containing the part (restricted to `within` when given)."""
+        fixed, alternatives = expanded
+        if not fixed:
+            docs: Set[str] = set()
+            for term in alternatives:
+                docs.update(_restrict(within, get(term)))
+            return docs
+
+        lists = [get(term) for term in fixed]
+        if not all(lists):
+            return set()
+        lists.sort(key=len)
+        docs = _restrict(within, lists[0])
+        for postings in lists[1:]:
+            docs = _restrict(docs, postings)
+        return {email_id for email_id in docs if self._has_phrase(email_id, fixed, alternatives, get)}
+
+    def _has_phrase(self, email_id: str, fixed: Tuple[str, ...], alternatives: List[str], get: Lookup) -> bool:
+        """Whether the fixed tokens occur consecutively, followed by one of the alternatives."""
+        followers: Set[int] = set()
+        for term in alternatives:
+            followers.update(get(term).get(email_id, ()))
+        if not followers:
+            return False
+        rest = [set(get(term)[email_id]) for term in fixed[1:]]
+        last = len(fixed)
+        for start in get(fixed[0])[email_id]:
+            if all(start + i + 1 in positions for i, positions in enumerate(rest)) and start + last in followers:
+                return True
+        return False
+
+    def _score(self, email_ids: Set[str], terms: Iterable[str], get: Lookup) -> Dict[str, float]:
+        """BM25F: sum of idf * cached term weight over the query terms."""
+        scores = dict.fromkeys(email_ids, 0.0)
+        for term in terms:
+            weights = self._term_weights(term, get)
+            if not weights:
+                continue
+            idf = self._idf(len(weights))
+            for email_id in _restrict(email_ids, weights):
+                scores[email_id] += idf * weights[email_id]
+        return scores
+
+    def _idf(self, df: int) -> float:
+        count = len(self._docs)
+        return math.log(1 + (count - df + 0.5) / (df + 0.5))
+
+    def _term_weights(self, term: str, get: Lookup) -> Dict[str, float]:
+        """Field-weighted, length-normalized BM25 term frequency of `term` in each email."""
+        count = len(self._docs)
+        average = (self._total_length / count if count else 0.0) or 1.0
+        if abs(average - self._weights_average) > WEIGHT_CACHE_DRIFT * self._weights_average:
+            self._weights = {}
+            self._weights_average = average
+        weights = self._weights.get(term)
+        if weights is not None:
+            return weights
+
+        postings = get(term)
+        field_weights = [weight for _, weight in FIELD_WEIGHTS]
+        docs = self._docs
+        weights = {}
+        for email_id, positions in postings.items():
+            doc = docs[email_id]
+            # Field-weighted count: positions split at the field bounds.
+            tf = 0.0
+            start = 0
+            for weight, bound in zip(field_weights, doc.bounds):
+                end = bisect_left(positions, bound, start)
+                tf += weight * (end - start)
+                start = end
+            tf += field_weights[-1] * (len(positions) - start)
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * doc.length / self._weights_average)
+            weights[email_id] = tf * (BM25_K1 + 1) / (tf + norm)
+        self._weights[term] = weights
+        return weights
+
+    # ---------------------------------------------------------
+    # PERSISTENCE
+    # ---------------------------------------------------------
+    # Line format: a JSON header, one JSON array per document, then one
+    # "term<TAB>df<TAB>postings JSON" line per term, sorted (terms never contain tabs).
+    def save(self, path: Path, revision: int) -> None:
+        """Write the index atomically; `revision` records which inbox revision it reflects."""
+        snapshot = self.snapshot(revision)
+        self.rebase(snapshot, snapshot.write(path))
+
+    def snapshot(self, revision: int) -> "IndexSnapshot":
+        """
+        A copy of the index as it is now, to `write` once the owner's lock is released:
+        - Documents, the saved file and position lists are never mutated, so only containers are copied
+        - Postings indexed since the last save are copied per term
+        """
+        snapshot = IndexSnapshot(
+            revision,
+            dict(self._docs),
+            self._saved,
+            set(self._stale),
+            {term: dict(postings) for term, postings in self._postings.items()},
+            list(self._vocabulary),
+        )
+        self._snapshot = snapshot
+        self._since_snapshot = set()
+        return snapshot
+
+    def rebase(self, snapshot: "IndexSnapshot", saved: "_SavedPostings") -> None:
+        """
+        Read postings from the file `snapshot` was just written to (`saved`, from its `write`):
+        those it contains are dropped from memory; emails indexed since it was taken stay,
+        and their postings in it are skipped.
+        """
+        if snapshot is not self._snapshot:
+            return  # a later snapshot was taken; rebasing is left to its write
+        self._snapshot = None
+        for email_id in [email_id for email_id in self._doc_terms if email_id not in self._since_snapshot]:
+            for term in self._doc_terms.pop(email_id):
+                postings = self._postings[term]
+                del postings[email_id]
+                if not postings:
+                    del self._postings[term]
+        self._saved = saved
+        self._stale = set(self._since_snapshot)
+        vocabulary = list(saved.terms)  # written in sorted order
+        for term in self._postings:
+            if term not in saved.terms:
+                insort(vocabulary, term)
+        self._vocabulary = vocabulary
+
+    def load(self, path: Path) -> bool:
+        """Replace the index with a saved one; False (index untouched) if there is none usable."""
+        try:
+            handle = path.open("rb")
+        except FileNotFoundError:
+            return False
+        with handle:
+            try:
+                header = json.loads(handle.readline() or b"{}")
+                if header.get("version") != FORMAT_VERSION:
+                    return False
+                revision = int(header["revision"])
+                docs = {}
+                for _ in range(header["docs"]):
+                    email_id, length, bounds, checksum = json.loads(handle.readline())
+                    docs[email_id] = _Doc(float(length), tuple(bounds), int(checksum))
+                saved = _SavedPostings.read(handle)
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"WARNING: Search index {path} is unreadable; rebuilding it. Error: {e}")
+                return False
+        self._docs = docs
+        self._saved = saved
+        self._stale = set()
+        self._postings = {}
+        self._doc_terms = {}
+        self._weights = {}
+        self._vocabulary = sorted(saved.terms)
+        self._total_length = sum(doc.length for doc in docs.values())
+        self._snapshot = None
+        self._since_snapshot = set()
+        self.revision = revision
+        return True
+
+
+class _SavedPostings:
+    """
+    The term lines of a saved index, left in the file: `terms` maps each term to its
+    document frequency and where its postings JSON is, decoded from an mmap on demand.
+    """
+
+    __slots__ = ("terms", "_map")
+
+    def __init__(self, handle: BinaryIO, terms: Dict[str, Tuple[int, int, int]]) -> None:
+        self.terms = terms  # term -> (df, offset, length), in file (sorted) order
+        self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        random_access(self._map)
+
+    @classmethod
+    def read(cls, handle: BinaryIO) -> "_SavedPostings":
+        """Locate the term lines from the handle's position to the end of the file."""
+        terms = {}
+        offset = handle.tell()
+        for line in handle:
+            if not line.endswith(b"\n"):
+                raise ValueError("the last term line is truncated")
+            term, df, _ = line.split(b"\t", 2)
+            start = offset + len(term) + len(df) + 2
+            offset += len(line)
+            terms[term.decode("utf-8", "surrogatepass")] = (int(df), start, offset - 1 - start)
+        return cls(handle, terms)
+
+    def df(self, term: str) -> int:
+        entry = self.terms.get(term)
+        return entry[0] if entry else 0
+
+    def raw(self, term: str) -> Optional[Tuple[int, bytes]]:
+        """(df, postings JSON) of a term, undecoded."""
+        entry = self.terms.get(term)
+        if entry is None:
+            return None
+        df, offset, length = entry
+        return df, self._map[offset:offset + length]
+
+    def get(self, term: str, skip: Set[str]) -> Postings:
+        """Decoded postings of a term, without the ids in `skip`."""
+        raw = self.raw(term)
+        if raw is None:
+            return {}
+        postings = json.loads(raw[1])
+        for email_id in _restrict(skip, postings) if skip else ():
+            del postings[email_id]
+        return postings
+
+
+class IndexSnapshot:
+    """A point-in-time copy of a SearchIndex (see `SearchIndex.snapshot`), serialized by `write`."""
+
+    __slots__ = ("revision", "docs", "saved", "stale", "postings", "terms")
+
+    def __init__(
+        self,
+        revision: int,
+        docs: Dict[str, _Doc],
+        saved: Optional[_SavedPostings],
+        stale: Set[str],
+        postings: Dict[str, Postings],
+        terms: List[str],
+    ) -> None:
+        self.revision = revision
+        self.docs = docs
+        self.saved = saved  # the file saved before, with `stale` ids to skip in it
+        self.stale = stale
+        self.postings = postings  # indexed since
+        self.terms = terms  # sorted
+
+    def write(self, path: Path) -> _SavedPostings:
+        """
+        Write atomically (temp file + fsync + rename), one term at a time; a term's saved
+        postings are copied undecoded when nothing changed them. Returns the new file's
+        postings, for `SearchIndex.rebase`.
+        """
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("w+b") as handle:
+            header = {"version": FORMAT_VERSION, "revision": self.revision, "docs": len(self.docs)}
+            handle.write(json.dumps(header).encode() + b"\n")
+            for email_id, doc in self.docs.items():
+                handle.write(json.dumps([email_id, doc.length, doc.bounds, doc.checksum]).encode() + b"\n")
+            offset = handle.tell()
+            terms: Dict[str, Tuple[int, int, int]] = {}
+            for term in self.terms:
+                df, data = self._postings_of(term)
+                if not df:
+                    continue
+                prefix = f"{term}\t{df}\t".encode("utf-8", "surrogatepass")
+                handle.write(prefix + data + b"\n")
+                terms[term] = (df, offset + len(prefix), len(data))
+                offset += len(prefix) + len(data) + 1
+            handle.flush()
+            os.fsync(handle.fileno())
+            saved = _SavedPostings(handle, terms)
+        os.replace(tmp_path, path)
+        return saved
+
+    def _postings_of(self, term: str) -> Tuple[int, bytes]:
+        """(df, postings JSON) of a term as of the snapshot."""
+        recent = self.postings.get(term)
+        if self.saved is not None and not self.stale and not recent:
+            raw = self.saved.raw(term)
+            if raw is not None:
+                return raw
+        postings = self.saved.get(term, self.stale) if self.saved is not None else {}
+        if recent:
+            postings.update(recent)
+        return len(postings), json.dumps(postings, separators=(",", ":")).encode()
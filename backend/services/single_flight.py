@@ -0,0 +1,81 @@
+"""In-flight request coalescing for duplicate LLM work."""
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time:
+    - The first caller (leader) does the work
+    - Callers arriving while it runs wait for and share its result or error
+    Works for both thread-pool callers (`do`) and event-loop callers (`do_async`).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self._stats = {"leaders": 0, "shared": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Run `fn` once for concurrent callers with the same key (blocking)."""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run the coroutine factory `fn` once for concurrent callers with the same key."""
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+
+        try:
+            result = await fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        """Return how many calls ran vs. were served from an in-flight call."""
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._calls)}
+
+    # ---------------------------------------------------------
+    # INTERNALS
+    # ---------------------------------------------------------
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        """Return the in-flight future for `key` and whether the caller leads it."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._stats["shared"] += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self._stats["leaders"] += 1
+            return future, True
+
+    def _finish(self, key: Hashable, future: Future, result: Any = None, error: BaseException | None = None) -> None:
+        """Unregister the call, then release every waiter."""
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
@@ -0,0 +1,112 @@
+"""Service that triages an email (category + actions + summary) in one LLM call."""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from backend.models.email import Email
+from backend.services.action_item_service import format_action_items
+from backend.services.categorization_service import CategorizationService
+from backend.services.inbox_service import InboxService
+from backend.services.prompt_brain import PromptBrain
+from backend.services.prompt_template import CompiledTemplate
+from backend.services.llm import LLMError, agenerate_llm_output, generate_llm_output
+from backend.services.single_flight import SingleFlight
+
+
+class TriageService:
+    """Replaces separate categorize/actions calls with a single combined request."""
+
+    def __init__(
+        self,
+        inbox_service: InboxService,
+        prompt_brain: PromptBrain,
+        categorization_service: CategorizationService,
+    ) -> None:
+        self._inbox = inbox_service
+        self._prompts = prompt_brain
+        self._categorizer = categorization_service
+        self._inflight = SingleFlight()
+
+    def triage(self, email_id: str) -> Dict[str, Any]:
+        """
+        Triage one email using the stored "triage" prompt:
+        - Category (normalized like the categorize path)
+        - Structured action items, stored as UI strings
+        - A short summary
+        All three are saved with a single inbox write.
+        """
+        return self._inflight.do(self._flight_key(email_id), lambda: self._triage(email_id))
+
+    async def triage_async(self, email_id: str) -> Dict[str, Any]:
+        """Same as `triage`, without blocking the event loop."""
+        return await self._inflight.do_async(
+            self._flight_key(email_id), lambda: self._triage_async(email_id)
+        )
+
+    def _prepare(self, email_id: str) -> Tuple[Email, CompiledTemplate, Dict[str, Any]]:
+        """The email, the stored "triage" template and its context."""
+        email = self._inbox.get_email(email_id)
+        return email, self._prompts.get_compiled("triage"), self._build_context(email)
+
+    def _triage(self, email_id: str) -> Dict[str, Any]:
+        email, template, context = self._prepare(email_id)
+
+        raw_json = generate_llm_output(template, context)
+        return self._save(email, raw_json)
+
+    async def _triage_async(self, email_id: str) -> Dict[str, Any]:
+        # Store reads/writes run in the threadpool, the LLM call on the LLM worker pool.
+        email, template, context = await run_in_threadpool(self._prepare, email_id)
+
+        raw_json = await agenerate_llm_output(template, context)
+        return await run_in_threadpool(self._save, email, raw_json)
+
+    def _flight_key(self, email_id: str) -> tuple:
+        """In-flight dedup key: (operation, email id, prompt version)."""
+        return ("triage", email_id, self._prompts.get_version("triage"))
+
+    @staticmethod
+    def _build_context(email: Email) -> Dict[str, Any]:
+        """Template variables for the triage prompt."""
+        return {
+            "email_body": email.body,
+            "subject": email.subject,
+            "sender": email.sender,
+            "_intent": "triage",
+        }
+
+    def _save(self, email: Email, raw_json: str) -> Dict[str, Any]:
+        """
+        Validate the combined JSON and persist every field in one write.
+        Output without a recognizable category saves nothing and raises LLMError (503):
+        a made-up "other" tagged "llm-triage" would train the local classifier.
+        """
+        try:
+            parsed = json.loads(raw_json)
+        except Exception:
+            parsed = {}
+        if not isinstance(parsed, dict):
+            parsed = {}
+
+        category = self._categorizer.match_category(str(parsed.get("category") or ""))
+        if category is None:
+            raise LLMError("triage output had no valid category; nothing was saved.")
+
+        raw_actions = parsed.get("action_items")
+        if isinstance(raw_actions, list):
+            actions: List[str] = format_action_items(raw_actions)
+        else:
+            actions = ["Extraction failed: LLM output was not valid JSON."]
+
+        summary = str(parsed.get("summary") or "").strip()
+
+        self._inbox.save_triage(email.id, category, "llm-triage", actions, summary)
+        return {
+            "email_id": email.id,
+            "category": category,
+            "action_items": actions,
+            "summary": summary,
+        }
@@ -5,7 +5,7 @@ from typing import Dict, Any, List, Optional
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
-from frontend.utils.api import agent_query, load_inbox
+from frontend.utils.api import agent_query, load_inbox_list, stream_agent_query
 
 st.set_page_config(page_title="Agent Chat", layout="wide")
 
@@ -33,7 +33,7 @@ if "chat_history" not in st.session_state:
 
 # Load inbox
 try:
-    emails: List[Dict[str, Any]] = load_inbox()
+    emails: List[Dict[str, Any]] = load_inbox_list()
 except Exception as e:
     st.error(f"Failed to load inbox: {str(e)}")
     emails = []
@@ -113,13 +113,16 @@ if user_input:
         query_type = "tasks"
 
     try:
-        with st.spinner("Thinking..."):
-            # This call requires the API update in frontend/utils/api.py
-            result = agent_query(query_type, email_id=st.session_state.selected_email_id_for_chat) 
-            
-            st.session_state.chat_history.append(
-                {"role": "assistant", "content": result["response"]}
+        with chat_container:
+            # Show the question immediately, then render the answer as it streams in
+            st.markdown(f"<div class='chat-bubble-user'>{user_input}</div>", unsafe_allow_html=True)
+            response = st.write_stream(
+                stream_agent_query(query_type, email_id=st.session_state.selected_email_id_for_chat)
             )
+
+        st.session_state.chat_history.append(
+            {"role": "assistant", "content": response}
+        )
         st.rerun()
     except Exception as e:
         st.session_state.chat_history.append(
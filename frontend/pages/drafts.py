@@ -5,7 +5,7 @@ from typing import Dict, Any, List
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
-from frontend.utils.api import draft_email, generate_reply, load_inbox, delete_draft
+from frontend.utils.api import load_inbox, delete_draft, stream_draft_email, stream_reply
 
 st.set_page_config(page_title="Draft Center", layout="wide")
 
@@ -107,7 +107,7 @@ try:
                 )
                 if st.button("Generate Auto Reply", key=f"auto_{email['id']}"):
                     try:
-                        generate_reply(email["id"], persona)
+                        st.write_stream(stream_reply(email["id"], persona))
                         st.success("Draft generated! Refresh to see it.")
                         st.rerun()
                     except Exception as e:
@@ -124,7 +124,7 @@ try:
                         st.warning("Please provide instructions.")
                     else:
                         try:
-                            draft_email(email["id"], instructions)
+                            st.write_stream(stream_draft_email(email["id"], instructions))
                             st.success("Draft created!")
                             st.rerun()
                         except Exception as e:
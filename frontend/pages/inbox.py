@@ -12,10 +12,13 @@ if "email_id" in params:
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 from frontend.utils.api import (
-    categorize_email,
+    categorize_batch,
     extract_actions,
-    generate_reply,
-    load_inbox,
+    filter_emails,
+    get_email,
+    load_inbox_list,
+    search_emails,
+    stream_reply,
 )
 
 st.set_page_config(page_title="Inbox Viewer", layout="wide")
@@ -75,14 +78,11 @@ def category_badge(cat: str) -> str:
 
 
 # ------------------ Load Inbox ------------------
-@st.cache_data(ttl=1)  # Cache for 1 second to allow refresh
-def get_inbox_data():
-    """Load inbox with short cache to allow refresh after updates."""
-    return load_inbox()
-
+# load_inbox_list keeps a local copy and fetches only the emails changed since the
+# last run, so updates show up immediately without re-downloading the inbox.
 try:
     with st.spinner("Loading inbox..."):
-        emails: List[Dict[str, Any]] = get_inbox_data()
+        emails: List[Dict[str, Any]] = load_inbox_list()
         
         # Auto-categorize emails that don't have a category (only once per session)
         if "emails_categorized" not in st.session_state:
@@ -95,17 +95,15 @@ try:
         ]
         
         if uncategorized:
-            # Categorize uncategorized emails in background
-            for email in uncategorized:
-                try:
-                    categorize_email(email["id"])
-                    st.session_state.emails_categorized.add(email["id"])
-                except Exception:
-                    # Silently continue if categorization fails
-                    pass
-            # Clear cache and reload
-            get_inbox_data.clear()
-            emails = get_inbox_data()
+            # Categorize all uncategorized emails in batched LLM calls
+            try:
+                result = categorize_batch([e["id"] for e in uncategorized])
+                st.session_state.emails_categorized.update(result.get("categories", {}))
+            except Exception:
+                # Silently continue if categorization fails
+                pass
+            # Reload
+            emails = load_inbox_list()
 
     if not emails:
         st.info("Your inbox is empty.")
@@ -117,6 +115,23 @@ try:
     with col1:
         st.markdown("<h3 style='margin-bottom: 0.2rem; margin-top: 0;'>Emails</h3>", unsafe_allow_html=True)
 
+        # Search and filters are answered by the backend's full-text / category / sender-domain indexes
+        search_query = st.text_input("Search", key="search_query", placeholder='e.g. invoice "due date" meet*').strip()
+        categories = sorted({e["category"] for e in emails if e.get("category")})
+        filter_category = st.selectbox("Category", ["All", *categories], key="filter_category")
+        filter_domain = st.text_input("Sender domain", key="filter_domain", placeholder="e.g. zoom.com").strip()
+        if search_query:
+            emails = search_emails(search_query)
+            if not emails:
+                st.caption("No emails match this search.")
+        elif filter_category != "All" or filter_domain:
+            emails = filter_emails(
+                category=filter_category if filter_category != "All" else None,
+                domain=filter_domain or None,
+            )
+            if not emails:
+                st.caption("No emails match these filters.")
+
         for email in emails:
             email: Dict[str, Any]
 
@@ -165,15 +180,13 @@ try:
     with col2:
         st.subheader("Email Details")
 
-        selected_email: Optional[Dict[str, Any]] = next(
-            (e for e in emails if e["id"] == st.session_state.selected_email_id),
-            None,
-        )
-
-        if not selected_email:
+        if not any(e["id"] == st.session_state.selected_email_id for e in emails):
             st.info("Select an email from the list")
             st.stop()
 
+        # The list only carries summaries; fetch the full email for the detail pane
+        selected_email: Dict[str, Any] = get_email(st.session_state.selected_email_id)
+
         # Email Header
         st.markdown(
             f"""
@@ -222,7 +235,6 @@ try:
                 try:
                     with st.spinner("Extracting..."):
                         extract_actions(selected_email["id"])
-                    get_inbox_data.clear()
                     st.session_state.selected_email_id = selected_email["id"]
                     st.success("Action items extracted")
                     st.rerun()
@@ -230,16 +242,17 @@ try:
                     st.error(f"Error: {str(e)}")
 
         with colB:
-            if st.button("Generate Reply", key="reply_btn"):
-                try:
-                    with st.spinner("Generating..."):
-                        generate_reply(selected_email["id"])
-                    get_inbox_data.clear()
-                    st.session_state.selected_email_id = selected_email["id"]
-                    st.success("Draft created in Draft Center")
-                    st.rerun()
-                except Exception as e:
-                    st.error(f"Error: {str(e)}")
+            reply_clicked = st.button("Generate Reply", key="reply_btn")
+
+        if reply_clicked:
+            try:
+                # Render the draft token-by-token; the backend saves it when the stream ends
+                st.write_stream(stream_reply(selected_email["id"]))
+                st.session_state.selected_email_id = selected_email["id"]
+                st.success("Draft created in Draft Center")
+                st.rerun()
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
 
         # Drafts
         drafts = selected_email.get("drafts", [])
@@ -27,11 +27,9 @@ if 'message' not in st.session_state:
 
 # --- UTILITY FUNCTIONS ---
 
-def fetch_prompts(clear_cache: bool = False):
-    """Fetches prompts and updates session state."""
+def fetch_prompts():
+    """Fetches prompts (revalidated against the backend's ETag) and updates session state."""
     try:
-        if clear_cache:
-            list_prompts.clear() 
         data = list_prompts()
         st.session_state.prompts_data = data
         return data
@@ -50,7 +48,7 @@ def handle_save(prompt_id, name, description, template):
     try:
         update_prompt(prompt_id, updated) 
         st.session_state['message'] = (f"success", f"Prompt '{name}' saved successfully.")
-        fetch_prompts(clear_cache=True) 
+        fetch_prompts()
         st.rerun()
     except Exception as e:
         st.session_state['message'] = ("error", f"Error saving prompt: {str(e)}")
@@ -64,8 +62,7 @@ def handle_delete(prompt_id, name):
         
         st.session_state['message'] = ("success", f"✅ Prompt '{name}' deleted successfully.")
         
-        # CRITICAL FIX: Clear cache after deletion to force UI reload
-        fetch_prompts(clear_cache=True)
+        fetch_prompts()
         st.rerun()
     except Exception as e:
         # NOTE: We keep the exception handler here to catch non-404 errors (like API connection errors)
@@ -97,7 +94,7 @@ if st.session_state['message']:
 
 if not st.session_state.prompts_data:
     with st.spinner("Loading prompts..."):
-        fetch_prompts(clear_cache=False) 
+        fetch_prompts() 
 
 prompts = st.session_state.prompts_data
 
@@ -1,23 +1,42 @@
 """API helper functions for communicating with the backend FastAPI server."""
 from __future__ import annotations
 
+import json
 import os
-from typing import Any, Dict, List, Optional
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import requests
-import streamlit as st # Ensure streamlit is imported for caching
 
 # Base URL for backend (can be overridden via environment variable)
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
 
+# Listings fetched with `_conditional_get`: (endpoint, params) -> (ETag, decoded body).
+# Bounded so a long session of distinct searches cannot grow it without limit.
+_REVALIDATE_CACHE: "OrderedDict[Tuple[str, str], Tuple[str, Any]]" = OrderedDict()
+_REVALIDATE_CACHE_SIZE = 256
+_revalidate_lock = threading.Lock()
+
+# Local copies of the inbox kept current through /api/inbox/changes, one per field set:
+# fields -> {"revision": int, "emails": {id: row}, "rows": newest-first list or None}.
+_INBOX_COPIES: Dict[str, Dict[str, Any]] = {}
+_inbox_copies_lock = threading.Lock()
+
 
 def _make_request(method: str, endpoint: str, **kwargs) -> Any:
     """Perform a backend API request with error handling."""
+    return _send(method, endpoint, **kwargs).json()
+
+
+def _send(method: str, endpoint: str, **kwargs) -> requests.Response:
+    """Perform a backend API request and return the response (2xx/304), raising readable errors."""
     url = f"{API_BASE_URL}{endpoint}"
     try:
         response = requests.request(method, url, **kwargs)
         response.raise_for_status()
-        return response.json()
+        return response
     except requests.exceptions.ConnectionError as e:
         raise Exception(f"Cannot connect to backend at {url}. Is the server running? Error: {str(e)}")
     except requests.exceptions.HTTPError as e:
@@ -26,25 +45,167 @@ def _make_request(method: str, endpoint: str, **kwargs) -> Any:
         raise Exception(f"API request failed: {str(e)}")
 
 
+def _stream_request(endpoint: str, payload: Dict[str, Any]) -> Iterator[str]:
+    """POST to a Server-Sent Events endpoint and yield text deltas as they arrive."""
+    url = f"{API_BASE_URL}{endpoint}"
+    try:
+        with requests.post(url, json=payload, stream=True) as response:
+            response.raise_for_status()
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    event = None
+                elif line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[len("data:"):])
+                    if event == "error":
+                        raise Exception(data.get("detail", "Streaming failed"))
+                    if event != "done":
+                        yield data.get("delta", "")
+    except requests.exceptions.ConnectionError as e:
+        raise Exception(f"Cannot connect to backend at {url}. Is the server running? Error: {str(e)}")
+    except requests.exceptions.HTTPError as e:
+        raise Exception(f"HTTP error {response.status_code}: {response.text}")
+    except requests.exceptions.RequestException as e:
+        raise Exception(f"API request failed: {str(e)}")
+
+
+def _conditional_get(endpoint: str, params: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    GET a listing, revalidating the last copy instead of refetching it:
+    - Sends the cached ETag as If-None-Match; a 304 reuses the cached body
+    - Every call reaches the backend, so writes from any page (or worker) show up at once
+    """
+    key = (endpoint, json.dumps(params or {}, sort_keys=True))
+    with _revalidate_lock:
+        cached = _REVALIDATE_CACHE.get(key)
+    headers = {"If-None-Match": cached[0]} if cached else {}
+    response = _send("GET", endpoint, params=params, headers=headers)
+    if response.status_code == 304 and cached:
+        with _revalidate_lock:
+            if key in _REVALIDATE_CACHE:
+                _REVALIDATE_CACHE.move_to_end(key)
+        return cached[1]
+
+    data = response.json()
+    etag = response.headers.get("ETag")
+    if etag:
+        with _revalidate_lock:
+            _REVALIDATE_CACHE[key] = (etag, data)
+            _REVALIDATE_CACHE.move_to_end(key)
+            while len(_REVALIDATE_CACHE) > _REVALIDATE_CACHE_SIZE:
+                _REVALIDATE_CACHE.popitem(last=False)
+    return data
+
+
+def _timeline_key(row: Dict[str, Any]) -> Tuple[datetime, str]:
+    """Newest-first sort key matching the backend's (timestamps compared in naive UTC)."""
+    ts = datetime.fromisoformat(row["timestamp"])
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts, row["id"]
+
+
+def sync_inbox(fields: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    The inbox, newest first, from a local copy that only downloads what changed:
+    - Sends the copy's revision to /api/inbox/changes and applies the upserted emails
+    - Replaces the copy when the backend answers with a resync (first call, or too far behind)
+    `fields` must include `timestamp` (used to keep the copy in order).
+    """
+    key = fields or ""
+    with _inbox_copies_lock:
+        copy = _INBOX_COPIES.get(key)
+        since = copy["revision"] if copy else None
+    params: Dict[str, Any] = {"fields": fields} if fields else {}
+    if since is not None:
+        params["since"] = since
+    data = _make_request("GET", "/api/inbox/changes", params=params)
+
+    with _inbox_copies_lock:
+        copy = _INBOX_COPIES.get(key)
+        current = copy["revision"] if copy else None
+        if data["resync"]:
+            # Keep a newer copy stored by a concurrent sync, unless the copy is still the one we
+            # asked about (then the backend was reset and its revisions started over).
+            if current is None or data["revision"] >= current or current == since:
+                copy = _INBOX_COPIES[key] = {
+                    "revision": data["revision"],
+                    "emails": {row["id"]: row for row in data["upserts"]},
+                    "rows": data["upserts"],
+                }
+        elif data["revision"] >= current:
+            emails = copy["emails"]
+            for row in data["upserts"]:
+                emails[row["id"]] = row
+            copy["revision"] = data["revision"]
+            if data["upserts"]:
+                copy["rows"] = None
+        if copy["rows"] is None:
+            copy["rows"] = sorted(copy["emails"].values(), key=_timeline_key, reverse=True)
+        return copy["rows"]
+
+
 # ------------------ Inbox ------------------
-@st.cache_data(ttl=5)
 def load_inbox() -> List[Dict[str, Any]]:
-    """Fetch inbox emails. Ensures consistent list return type."""
-    data = _make_request("GET", "/api/load_inbox")
+    """Fetch inbox emails (kept in sync incrementally, see `sync_inbox`)."""
+    return sync_inbox()
+
+
+# Fields the list views render; bodies and drafts are fetched per email with `get_email`.
+INBOX_LIST_FIELDS = "id,sender,subject,timestamp,category"
+
+
+def load_inbox_list() -> List[Dict[str, Any]]:
+    """Fetch the lightweight inbox listing (list-view fields only, no bodies or drafts)."""
+    return sync_inbox(INBOX_LIST_FIELDS)
+
+
+def filter_emails(category: Optional[str] = None, domain: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Fetch the list-view fields of emails with this category and/or sender domain."""
+    params = {"fields": INBOX_LIST_FIELDS}
+    if category:
+        params["category"] = category
+    if domain:
+        params["domain"] = domain
+    data = _conditional_get("/api/emails", params=params)
     return data if isinstance(data, list) else []
 
 
+def search_emails(query: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """Full-text search (no LLM call); list-view fields of the best matches first."""
+    params = {"q": query, "limit": limit, "fields": INBOX_LIST_FIELDS}
+    data = _conditional_get("/api/search", params=params)
+    return data if isinstance(data, list) else []
+
+
+def get_email(email_id: str) -> Dict[str, Any]:
+    """Fetch one email with its full body, action items and drafts."""
+    return _conditional_get(f"/api/emails/{email_id}")
+
+
 # ------------------ Email Processing ------------------
 def categorize_email(email_id: str) -> Dict[str, Any]:
     """Categorize an email by ID."""
     return _make_request("POST", "/api/categorize", json={"email_id": email_id})
 
 
+def categorize_batch(email_ids: List[str]) -> Dict[str, Any]:
+    """Categorize several emails in as few LLM calls as possible."""
+    return _make_request("POST", "/api/categorize_batch", json={"email_ids": email_ids})
+
+
 def extract_actions(email_id: str) -> Dict[str, Any]:
     """Extract action items from an email."""
     return _make_request("POST", "/api/extract_actions", json={"email_id": email_id})
 
 
+def triage_email(email_id: str) -> Dict[str, Any]:
+    """Categorize, extract actions and summarize an email in one call."""
+    return _make_request("POST", "/api/triage", json={"email_id": email_id})
+
+
 def generate_reply(email_id: str, persona: Optional[str] = None) -> Dict[str, Any]:
     """Generate a reply draft for an email."""
     payload = {"email_id": email_id}
@@ -62,11 +223,26 @@ def draft_email(email_id: str, instructions: str) -> Dict[str, Any]:
     )
 
 
+def stream_reply(email_id: str, persona: Optional[str] = None) -> Iterator[str]:
+    """Stream a reply draft for an email; the backend saves it when complete."""
+    payload = {"email_id": email_id}
+    if persona:
+        payload["persona"] = persona
+    return _stream_request("/api/generate_reply/stream", payload)
+
+
+def stream_draft_email(email_id: str, instructions: str) -> Iterator[str]:
+    """Stream a custom draft; the backend saves it when complete."""
+    return _stream_request(
+        "/api/draft_email/stream",
+        {"email_id": email_id, "instructions": instructions},
+    )
+
+
 # ------------------ Prompt Brain ------------------
-@st.cache_data(ttl=60)
 def list_prompts() -> List[Dict[str, Any]]:
     """Retrieve all prompt templates."""
-    data = _make_request("GET", "/api/prompts")
+    data = _conditional_get("/api/prompts")
     return data if isinstance(data, list) else []
 
 
@@ -89,6 +265,14 @@ def agent_query(query_type: str, email_id: Optional[str] = None) -> Dict[str, An
     return _make_request("POST", "/api/agent_query", json=payload)
 
 
+def stream_agent_query(query_type: str, email_id: Optional[str] = None) -> Iterator[str]:
+    """Stream the agent's answer as it is generated."""
+    payload = {"query_type": query_type}
+    if email_id:
+        payload["email_id"] = email_id
+    return _stream_request("/api/agent_query/stream", payload)
+
+
 def delete_draft(email_id: str, draft_index: int) -> Dict[str, Any]:
     """Delete a specific draft by index."""
     return _make_request(
@@ -0,0 +1,51 @@
+"""Shared fixtures: a throwaway inbox + prompt store and a scripted stub LLM."""
+from __future__ import annotations
+
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Iterator
+
+import pytest
+
+# Configure the LLM layer before it is imported: no response cache (each test scripts
+# its own answers) and the offline stub backend.
+os.environ.setdefault("LLM_CACHE_SIZE", "0")
+os.environ.setdefault("LLM_PROVIDER", "stub")
+
+from backend.services import llm  # noqa: E402
+from backend.services.inbox_service import InboxService  # noqa: E402
+from backend.services.inbox_store import JsonInboxStore  # noqa: E402
+from backend.services.llm_providers import StubProvider  # noqa: E402
+from backend.services.prompt_brain import PromptBrain  # noqa: E402
+
+REPO_DATA = Path(__file__).resolve().parent.parent / "data"
+
+
+@pytest.fixture
+def inbox(tmp_path: Path) -> Iterator[InboxService]:
+    """The sample inbox, copied so tests can write to it."""
+    shutil.copy(REPO_DATA / "inbox.json", tmp_path / "inbox.json")
+    store = JsonInboxStore(tmp_path / "inbox.json")
+    yield InboxService(store)
+    store.close()
+
+
+@pytest.fixture
+def prompts(tmp_path: Path) -> PromptBrain:
+    """A fresh prompt store holding only the built-in prompts."""
+    return PromptBrain(tmp_path / "prompts.json")
+
+
+@pytest.fixture
+def stub_llm() -> Iterator[callable]:
+    """Call with {intent: raw output} to script what the LLM answers."""
+    previous = llm.get_provider()
+
+    def script(responses: Dict[str, str]) -> StubProvider:
+        provider = StubProvider(responses=responses)
+        llm.set_provider(provider)
+        return provider
+
+    yield script
+    llm.set_provider(previous)
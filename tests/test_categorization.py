@@ -0,0 +1,27 @@
+"""Single-email categorization: what gets saved for matched and unmatched LLM output."""
+from __future__ import annotations
+
+from backend.services.categorization_service import CategorizationService
+from backend.services.local_classifier import LLM_LABEL_SOURCES
+
+
+def test_unparseable_output_is_saved_as_fallback(inbox, prompts, stub_llm):
+    stub_llm({"categorize": "I am not sure what this email is about!"})
+    service = CategorizationService(inbox, prompts)
+    email_id = inbox.list_emails()[0].id
+
+    assert service.categorize_email(email_id) == "other"
+
+    email = inbox.get_email(email_id)
+    assert email.category == "other"
+    assert email.category_source == CategorizationService.FALLBACK_SOURCE
+    assert email.category_source not in LLM_LABEL_SOURCES
+
+
+def test_matched_output_is_saved_as_llm_label(inbox, prompts, stub_llm):
+    stub_llm({"categorize": "Meeting."})
+    service = CategorizationService(inbox, prompts)
+    email_id = inbox.list_emails()[0].id
+
+    assert service.categorize_email(email_id) == "meeting"
+    assert inbox.get_email(email_id).category_source == "llm"
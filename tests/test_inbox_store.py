@@ -0,0 +1,72 @@
+"""JSON inbox store: bodies live in a persistent body file that snapshots reference."""
+from __future__ import annotations
+
+import json
+import shutil
+from pathlib import Path
+
+from backend.models.email import Email
+from backend.services.inbox_store import JsonInboxStore
+from backend.services.search_index import SearchIndex
+
+REPO_DATA = Path(__file__).resolve().parent.parent / "data"
+
+
+def _body_files(directory: Path):
+    return sorted(path.name for path in directory.glob("inbox.bodies.*"))
+
+
+def _copy_inbox(tmp_path: Path) -> Path:
+    path = tmp_path / "inbox.json"
+    shutil.copy(REPO_DATA / "inbox.json", path)
+    return path
+
+
+def test_snapshot_references_bodies_and_restart_reads_none(tmp_path, monkeypatch):
+    path = _copy_inbox(tmp_path)
+    bodies = {email.id: email.body for email in JsonInboxStore(path, read_only=True).list_all()}
+    JsonInboxStore(path).close()
+
+    records = json.loads(path.read_text())["emails"]
+    assert all("body" not in record and "body_ref" in record for record in records if bodies[record["id"]])
+    assert _body_files(tmp_path) == ["inbox.bodies.1"]
+
+    size = (tmp_path / "inbox.bodies.1").stat().st_size
+    # The saved search index matches the snapshot, so no email text is tokenized again.
+    monkeypatch.setattr(SearchIndex, "prepare", lambda self, email: _fail_reindex(email))
+    store = JsonInboxStore(path)
+    assert (tmp_path / "inbox.bodies.1").stat().st_size == size
+    assert {email.id: email.body for email in store.list_all()} == bodies
+
+
+def test_compaction_repacks_bodies_into_a_new_generation(tmp_path):
+    path = _copy_inbox(tmp_path)
+    store = JsonInboxStore(path)
+    for i in range(30):
+        email = store.get("E001").copy()
+        email.body = f"draft {i} of the zebra{i} memo " * 40
+        store.put([email])
+    store.update({"E002": {"category": "spam"}})
+    expected = {email.id: (email.body, email.category) for email in store.list_all()}
+    store.close()
+
+    assert _body_files(tmp_path) == ["inbox.bodies.2"]
+    store = JsonInboxStore(path)
+    assert {email.id: (email.body, email.category) for email in store.list_all()} == expected
+    assert [email.id for email, _ in store.search("zebra29")] == ["E001"]
+    assert store.search("zebra28") == []
+
+
+def test_journal_records_reference_bodies(tmp_path):
+    path = _copy_inbox(tmp_path)
+    store = JsonInboxStore(path)
+    store.put([Email("N1", "new@example.com", "Hello", "2025-03-01T10:00:00", "a body kept on disk")])
+    journal = (tmp_path / "inbox.journal").read_text()
+    assert "a body kept on disk" not in journal and "body_ref" in journal
+
+    del store  # no close: the next start replays the journal
+    assert JsonInboxStore(path).get("N1").body == "a body kept on disk"
+
+
+def _fail_reindex(email: Email) -> None:
+    raise AssertionError(f"{email.id} was re-indexed")
@@ -0,0 +1,26 @@
+"""Streaming LLM calls hold a rate limiter slot for as long as the stream is open."""
+from __future__ import annotations
+
+from backend.services import llm
+
+
+def test_stream_holds_limiter_slot_until_closed(stub_llm):
+    stub_llm({"draft": "Thanks for the update, see you Monday."})
+    in_flight = llm.get_limiter_stats()["in_flight"]
+
+    stream = llm.stream_llm_output("{body}", {"body": "hello", "_intent": "draft"})
+    assert next(stream) == "Thanks"
+    assert llm.get_limiter_stats()["in_flight"] == in_flight + 1
+
+    stream.close()
+    assert llm.get_limiter_stats()["in_flight"] == in_flight
+
+
+def test_exhausted_stream_releases_slot(stub_llm):
+    stub_llm({"draft": "Sounds good."})
+    in_flight = llm.get_limiter_stats()["in_flight"]
+
+    text = "".join(llm.stream_llm_output("{body}", {"body": "hi", "_intent": "draft"}))
+
+    assert text == "Sounds good."
+    assert llm.get_limiter_stats()["in_flight"] == in_flight
@@ -0,0 +1,23 @@
+"""Local categorizer: only categories the LLM actually assigned are training labels."""
+from __future__ import annotations
+
+from backend.models.email import Email
+from backend.services.local_classifier import LocalCategoryClassifier
+
+
+def _email(i: int, category: str, source: str) -> Email:
+    return Email.from_dict({
+        "id": f"E{i}", "sender": f"user{i}@example.com", "subject": f"{category} #{i}",
+        "body": f"about {category}", "category": category, "category_source": source,
+    })
+
+
+def test_emails_without_a_source_are_not_labels(tmp_path):
+    classifier = LocalCategoryClassifier(tmp_path / "model.json")
+    defaults = [_email(i, "Other", "") for i in range(40)]
+    labeled = [_email(100 + i, "meeting" if i % 2 else "spam", "llm") for i in range(10)]
+
+    report = classifier.retrain(defaults + labeled)
+
+    assert report["trained"] is False
+    assert report["samples"] == 10
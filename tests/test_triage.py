@@ -0,0 +1,38 @@
+"""Triage: one LLM answer saved as category, action items and summary."""
+from __future__ import annotations
+
+import json
+
+from backend.services.action_item_service import ActionItemService
+from backend.services.categorization_service import CategorizationService
+from backend.services.triage_service import TriageService
+
+
+def test_null_deadline_is_saved_without_one(inbox, prompts, stub_llm):
+    stub_llm({"triage": json.dumps({
+        "category": "to-do",
+        "action_items": [
+            {"task": "Send the signed contract", "deadline": None},
+            {"task": "Book the venue", "deadline": "Friday"},
+            {"task": None, "deadline": None},
+        ],
+        "summary": None,
+    })})
+    service = TriageService(inbox, prompts, CategorizationService(inbox, prompts))
+    email_id = inbox.list_emails()[0].id
+
+    result = service.triage(email_id)
+
+    expected = ["Send the signed contract", "Book the venue (deadline: Friday)"]
+    assert result["action_items"] == expected
+    assert result["summary"] == ""
+    email = inbox.get_email(email_id)
+    assert (email.category, email.category_source) == ("to-do", "llm-triage")
+    assert list(email.action_items) == expected
+
+
+def test_action_items_with_null_deadline(inbox, prompts, stub_llm):
+    stub_llm({"actions": json.dumps([{"task": "Reply to Ann", "deadline": None}])})
+    email_id = inbox.list_emails()[0].id
+
+    assert ActionItemService(inbox, prompts).extract(email_id) == ["Reply to Ann"]